@@ -6,6 +6,7 @@ from sqlalchemy import pool
 from alembic import context
 
 # Import config e models
+import re
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
@@ -13,6 +14,7 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from app.config import get_settings
 from app.database import Base
 from app import models  # Import tutti i models
+from app.services.partizioni import TABELLE_PARTIZIONATE
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -31,6 +33,15 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 target_metadata = Base.metadata
 
+# Partizioni mensili (attive, di default o staccate come archivio): gestite
+# da app/services/partizioni.py, non sono tabelle dei models
+PARTIZIONE = re.compile(rf"^({'|'.join(TABELLE_PARTIZIONATE)})_(p\d{{4}}_\d{{2}}|default)$")
+
+
+def include_name(name, type_, parent_names):
+    """Esclude le partizioni dal confronto autogenerate."""
+    return not (type_ == "table" and PARTIZIONE.match(name))
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -53,6 +64,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -76,7 +88,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_name=include_name
         )
 
         with context.begin_transaction():
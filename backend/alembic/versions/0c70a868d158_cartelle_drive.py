@@ -0,0 +1,37 @@
+"""cartelle drive cache
+
+Revision ID: 0c70a868d158
+Revises: 29e23150227c
+Create Date: 2026-10-19 11:45:21.443030
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c70a868d158'
+down_revision: Union[str, None] = '29e23150227c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('cartelle_drive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('percorso', sa.String(length=1000), nullable=False),
+    sa.Column('folder_id', sa.String(length=255), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('verificata_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_cartelle_drive_id'), 'cartelle_drive', ['id'], unique=False)
+    op.create_index(op.f('ix_cartelle_drive_percorso'), 'cartelle_drive', ['percorso'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_cartelle_drive_percorso'), table_name='cartelle_drive')
+    op.drop_index(op.f('ix_cartelle_drive_id'), table_name='cartelle_drive')
+    op.drop_table('cartelle_drive')
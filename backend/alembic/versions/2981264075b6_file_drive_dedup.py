@@ -0,0 +1,40 @@
+"""file drive dedup
+
+Revision ID: 2981264075b6
+Revises: 0c70a868d158
+Create Date: 2026-10-19 11:46:49.148153
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2981264075b6'
+down_revision: Union[str, None] = '0c70a868d158'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('file_drive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('drive_file_id', sa.String(length=255), nullable=False),
+    sa.Column('nome', sa.String(length=500), nullable=True),
+    sa.Column('dimensione', sa.BigInteger(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('ultimo_riuso', sa.DateTime(), nullable=True),
+    sa.Column('riusi', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_file_drive_id'), 'file_drive', ['id'], unique=False)
+    op.create_index(op.f('ix_file_drive_sha256'), 'file_drive', ['sha256'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_file_drive_sha256'), table_name='file_drive')
+    op.drop_index(op.f('ix_file_drive_id'), table_name='file_drive')
+    op.drop_table('file_drive')
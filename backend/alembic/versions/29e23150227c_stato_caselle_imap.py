@@ -0,0 +1,42 @@
+"""stato caselle imap
+
+Revision ID: 29e23150227c
+Revises: e7a3c5d18b62
+Create Date: 2026-10-19 11:39:47.365078
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '29e23150227c'
+down_revision: Union[str, None] = 'e7a3c5d18b62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Il tipo accounttype esiste già (tabella emails)
+    account_type = postgresql.ENUM('NORMALE', 'PEC', name='accounttype', create_type=False)
+
+    op.create_table('stato_caselle',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('account_type', account_type, nullable=False),
+    sa.Column('cartella', sa.String(length=255), nullable=False),
+    sa.Column('uidvalidity', sa.BigInteger(), nullable=True),
+    sa.Column('uidnext', sa.BigInteger(), nullable=True),
+    sa.Column('ultimo_uid', sa.BigInteger(), nullable=True),
+    sa.Column('aggiornato_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('account_type', 'cartella', name='uq_stato_casella')
+    )
+    op.create_index(op.f('ix_stato_caselle_id'), 'stato_caselle', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_stato_caselle_id'), table_name='stato_caselle')
+    op.drop_table('stato_caselle')
@@ -0,0 +1,42 @@
+"""Interpretazione JSONB e indici
+
+Revision ID: 2bd97e486972
+Revises: 75ff98ace72a
+Create Date: 2026-10-19 12:18:01.926862
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '2bd97e486972'
+down_revision: Union[str, None] = '75ff98ace72a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('interpretazioni', 'interpretazione_json',
+               existing_type=postgresql.JSON(astext_type=sa.Text()),
+               type_=postgresql.JSONB(astext_type=sa.Text()),
+               existing_nullable=False,
+               postgresql_using='interpretazione_json::jsonb')
+    op.create_index('ix_interpretazioni_data', 'interpretazioni', [sa.text("(interpretazione_json ->> 'data')")], unique=False)
+    op.create_index('ix_interpretazioni_json', 'interpretazioni', ['interpretazione_json'], unique=False, postgresql_using='gin', postgresql_ops={'interpretazione_json': 'jsonb_path_ops'})
+    op.create_index('ix_interpretazioni_luogo', 'interpretazioni', [sa.text("lower(interpretazione_json ->> 'luogo')")], unique=False)
+    op.create_index('ix_interpretazioni_scuola', 'interpretazioni', [sa.text("lower(interpretazione_json ->> 'scuola')")], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_interpretazioni_scuola', table_name='interpretazioni')
+    op.drop_index('ix_interpretazioni_luogo', table_name='interpretazioni')
+    op.drop_index('ix_interpretazioni_json', table_name='interpretazioni', postgresql_using='gin', postgresql_ops={'interpretazione_json': 'jsonb_path_ops'})
+    op.drop_index('ix_interpretazioni_data', table_name='interpretazioni')
+    op.alter_column('interpretazioni', 'interpretazione_json',
+               existing_type=postgresql.JSONB(astext_type=sa.Text()),
+               type_=postgresql.JSON(astext_type=sa.Text()),
+               existing_nullable=False,
+               postgresql_using='interpretazione_json::json')
@@ -0,0 +1,30 @@
+"""keyset_pagination_indexes
+
+Revision ID: 318e7192561b
+Revises: 471d3e6236bc
+Create Date: 2026-10-19 11:56:30.024610
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '318e7192561b'
+down_revision: Union[str, None] = '471d3e6236bc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_azioni_timestamp_inizio_id', 'azioni', ['timestamp_inizio', 'id'], unique=False)
+    op.create_index('ix_emails_data_ricezione_id', 'emails', ['data_ricezione', 'id'], unique=False)
+    op.create_index('ix_eventi_calendario_data_inizio_id', 'eventi_calendario', ['data_inizio', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_eventi_calendario_data_inizio_id', table_name='eventi_calendario')
+    op.drop_index('ix_emails_data_ricezione_id', table_name='emails')
+    op.drop_index('ix_azioni_timestamp_inizio_id', table_name='azioni')
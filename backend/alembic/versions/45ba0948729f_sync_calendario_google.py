@@ -0,0 +1,51 @@
+"""sync calendario google
+
+Revision ID: 45ba0948729f
+Revises: 2981264075b6
+Create Date: 2026-10-19 11:48:33.728098
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '45ba0948729f'
+down_revision: Union[str, None] = '2981264075b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('stato_calendari',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('calendar_id', sa.String(length=255), nullable=False),
+    sa.Column('sync_token', sa.String(length=500), nullable=True),
+    sa.Column('ultima_sincronizzazione', sa.DateTime(), nullable=True),
+    sa.Column('ultima_completa', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stato_calendari_calendar_id'), 'stato_calendari', ['calendar_id'], unique=True)
+    op.create_index(op.f('ix_stato_calendari_id'), 'stato_calendari', ['id'], unique=False)
+
+    # Eventi importati prima della sincronizzazione per calendario: erano tutti
+    # sul calendario configurato (default "primary"); i duplicati vengono rimossi
+    op.execute(
+        "UPDATE eventi_calendario SET google_calendar_id = 'primary' "
+        "WHERE google_event_id IS NOT NULL AND google_calendar_id IS NULL"
+    )
+    op.execute(
+        "DELETE FROM eventi_calendario a USING eventi_calendario b "
+        "WHERE a.google_calendar_id = b.google_calendar_id "
+        "AND a.google_event_id = b.google_event_id AND a.id > b.id"
+    )
+    op.create_unique_constraint('uq_evento_google', 'eventi_calendario', ['google_calendar_id', 'google_event_id'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_evento_google', 'eventi_calendario', type_='unique')
+    op.drop_index(op.f('ix_stato_calendari_id'), table_name='stato_calendari')
+    op.drop_index(op.f('ix_stato_calendari_calendar_id'), table_name='stato_calendari')
+    op.drop_table('stato_calendari')
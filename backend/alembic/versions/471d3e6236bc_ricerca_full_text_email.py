@@ -0,0 +1,30 @@
+"""ricerca full text email
+
+Revision ID: 471d3e6236bc
+Revises: 45ba0948729f
+Create Date: 2026-10-19 11:53:57.982532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '471d3e6236bc'
+down_revision: Union[str, None] = '45ba0948729f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Colonna generata STORED: PostgreSQL riscrive la tabella e calcola il
+    # tsvector per le email esistenti
+    op.add_column('emails', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed("setweight(to_tsvector('italian'::regconfig, coalesce(oggetto, '')), 'A') || setweight(to_tsvector('simple'::regconfig, coalesce(mittente, '')), 'B') || setweight(to_tsvector('italian'::regconfig, left(coalesce(corpo, ''), 100000)), 'C')", persisted=True), nullable=True))
+    op.create_index('ix_emails_search_vector', 'emails', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_emails_search_vector', table_name='emails', postgresql_using='gin')
+    op.drop_column('emails', 'search_vector')
@@ -0,0 +1,60 @@
+"""search_vector mantenuto da trigger
+
+Revision ID: 5cf38ffb3f4d
+Revises: e4918c6d94c3
+Create Date: 2026-10-19 12:33:04.409687
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5cf38ffb3f4d'
+down_revision: Union[str, None] = 'e4918c6d94c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Con l'archivio freddo il corpo viene tolto dalla riga: per le email
+# archiviate i lessemi del corpo (peso C) restano quelli già indicizzati
+FUNZIONE_SEARCH_VECTOR = """
+CREATE FUNCTION emails_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('italian'::regconfig, coalesce(NEW.oggetto, '')), 'A') ||
+        setweight(to_tsvector('simple'::regconfig, coalesce(NEW.mittente, '')), 'B') ||
+        CASE
+            WHEN TG_OP = 'UPDATE' AND NEW.corpo IS NULL AND NEW.archiviata_at IS NOT NULL
+                THEN ts_filter(coalesce(OLD.search_vector, ''::tsvector), '{c}')
+            ELSE setweight(to_tsvector('italian'::regconfig, left(coalesce(NEW.corpo, ''), 100000)), 'C')
+        END;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    # La colonna resta con i valori e l'indice GIN attuali, solo non più generata
+    op.execute("ALTER TABLE emails ALTER COLUMN search_vector DROP EXPRESSION")
+    op.execute(FUNZIONE_SEARCH_VECTOR)
+    # Trigger sulla tabella partizionata: ereditato dalle partizioni esistenti e future
+    op.execute(
+        "CREATE TRIGGER trg_emails_search_vector "
+        "BEFORE INSERT OR UPDATE OF oggetto, mittente, corpo ON emails "
+        "FOR EACH ROW EXECUTE FUNCTION emails_search_vector()"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_emails_search_vector ON emails")
+    op.execute("DROP FUNCTION IF EXISTS emails_search_vector()")
+    # Di nuovo colonna generata: le email archiviate perdono i lessemi del corpo
+    op.drop_index('ix_emails_search_vector', table_name='emails', postgresql_using='gin')
+    op.drop_column('emails', 'search_vector')
+    op.add_column('emails', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed("setweight(to_tsvector('italian'::regconfig, coalesce(oggetto, '')), 'A') || setweight(to_tsvector('simple'::regconfig, coalesce(mittente, '')), 'B') || setweight(to_tsvector('italian'::regconfig, left(coalesce(corpo, ''), 100000)), 'C')", persisted=True), nullable=True))
+    op.create_index('ix_emails_search_vector', 'emails', ['search_vector'], unique=False, postgresql_using='gin')
@@ -0,0 +1,29 @@
+"""indice dead letter azioni
+
+Revision ID: 69bb2ad0ad1f
+Revises: 5cf38ffb3f4d
+Create Date: 2026-10-19 12:35:17.107528
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '69bb2ad0ad1f'
+down_revision: Union[str, None] = '5cf38ffb3f4d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Fuori transazione: il valore DEAD_LETTER dell'enum deve essere già
+    # committato per comparire nel predicato; CONCURRENTLY non blocca le scritture
+    with op.get_context().autocommit_block():
+        op.create_index('ix_azioni_dead_letter_timestamp_fine_id', 'azioni', ['timestamp_fine', 'id'], unique=False, postgresql_where=sa.text("stato = 'DEAD_LETTER'"), postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_azioni_dead_letter_timestamp_fine_id', table_name='azioni', postgresql_where=sa.text("stato = 'DEAD_LETTER'"))
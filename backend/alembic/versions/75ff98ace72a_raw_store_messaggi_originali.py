@@ -0,0 +1,26 @@
+"""Raw store messaggi originali
+
+Revision ID: 75ff98ace72a
+Revises: f0c285d640bc
+Create Date: 2026-10-19 12:15:46.781145
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '75ff98ace72a'
+down_revision: Union[str, None] = 'f0c285d640bc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('emails', sa.Column('raw_sha256', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('emails', 'raw_sha256')
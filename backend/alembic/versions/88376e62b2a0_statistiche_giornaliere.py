@@ -0,0 +1,125 @@
+"""statistiche_giornaliere
+
+Revision ID: 88376e62b2a0
+Revises: 318e7192561b
+Create Date: 2026-10-19 12:01:48.634637
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '88376e62b2a0'
+down_revision: Union[str, None] = '318e7192561b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Tabella -> (entità, colonna del giorno, dimensioni contate)
+SORGENTI = {
+    'emails': ('email', 'data_ricezione', ('categoria', 'stato', 'account_type')),
+    'azioni': ('azione', 'timestamp_inizio', ('stato', 'tipo')),
+}
+
+# Applica una variazione a un contatore (valori o giorni NULL non contano)
+FUNZIONE_INCREMENTA = """
+CREATE FUNCTION statistiche_incrementa(
+    p_giorno date, p_entita text, p_dimensione text, p_valore text, p_delta integer
+) RETURNS void AS $$
+BEGIN
+    IF p_giorno IS NULL OR p_valore IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO statistiche_giornaliere (giorno, entita, dimensione, valore, conteggio)
+    VALUES (p_giorno, p_entita, p_dimensione, p_valore, p_delta)
+    ON CONFLICT ON CONSTRAINT uq_statistica_bucket
+    DO UPDATE SET conteggio = statistiche_giornaliere.conteggio + EXCLUDED.conteggio;
+END
+$$ LANGUAGE plpgsql
+"""
+
+# Sposta una riga da (giorno, valore) vecchi a nuovi: in INSERT OLD è NULL,
+# in DELETE NEW è NULL; nessuna scrittura se la dimensione non cambia
+FUNZIONE_SPOSTA = """
+CREATE FUNCTION statistiche_sposta(
+    p_entita text, p_dimensione text,
+    p_giorno_old date, p_valore_old text, p_giorno_new date, p_valore_new text
+) RETURNS void AS $$
+BEGIN
+    IF p_giorno_old IS NOT DISTINCT FROM p_giorno_new AND p_valore_old IS NOT DISTINCT FROM p_valore_new THEN
+        RETURN;
+    END IF;
+    PERFORM statistiche_incrementa(p_giorno_old, p_entita, p_dimensione, p_valore_old, -1);
+    PERFORM statistiche_incrementa(p_giorno_new, p_entita, p_dimensione, p_valore_new, 1);
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def _trigger_sql(tabella: str) -> list:
+    entita, giorno, dimensioni = SORGENTI[tabella]
+    corpo = "\n".join(
+        f"    PERFORM statistiche_sposta('{entita}', '{dim}', "
+        f"OLD.{giorno}::date, OLD.{dim}::text, NEW.{giorno}::date, NEW.{dim}::text);"
+        for dim in dimensioni
+    )
+    colonne = ", ".join((giorno,) + dimensioni)
+    return [
+        f"""
+CREATE FUNCTION statistiche_{tabella}() RETURNS trigger AS $$
+BEGIN
+{corpo}
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+""",
+        f"CREATE TRIGGER trg_statistiche_{tabella} "
+        f"AFTER INSERT OR DELETE OR UPDATE OF {colonne} ON {tabella} "
+        f"FOR EACH ROW EXECUTE FUNCTION statistiche_{tabella}()",
+    ]
+
+
+def _backfill_sql(tabella: str) -> str:
+    entita, giorno, dimensioni = SORGENTI[tabella]
+    return "\nUNION ALL\n".join(
+        f"SELECT {giorno}::date, '{entita}', '{dim}', {dim}::text, count(*) FROM {tabella} "
+        f"WHERE {giorno} IS NOT NULL AND {dim} IS NOT NULL GROUP BY 1, 4"
+        for dim in dimensioni
+    )
+
+
+def upgrade() -> None:
+    op.create_table('statistiche_giornaliere',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('giorno', sa.Date(), nullable=False),
+    sa.Column('entita', sa.String(length=20), nullable=False),
+    sa.Column('dimensione', sa.String(length=30), nullable=False),
+    sa.Column('valore', sa.String(length=50), nullable=False),
+    sa.Column('conteggio', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('giorno', 'entita', 'dimensione', 'valore', name='uq_statistica_bucket')
+    )
+    op.create_index(op.f('ix_statistiche_giornaliere_id'), 'statistiche_giornaliere', ['id'], unique=False)
+
+    op.execute(FUNZIONE_INCREMENTA)
+    op.execute(FUNZIONE_SPOSTA)
+    for tabella in SORGENTI:
+        # Contatori dello storico esistente, poi manutenzione incrementale
+        op.execute(
+            "INSERT INTO statistiche_giornaliere (giorno, entita, dimensione, valore, conteggio)\n"
+            + _backfill_sql(tabella)
+        )
+        for statement in _trigger_sql(tabella):
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    for tabella in SORGENTI:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_statistiche_{tabella} ON {tabella}")
+        op.execute(f"DROP FUNCTION IF EXISTS statistiche_{tabella}()")
+    op.execute("DROP FUNCTION IF EXISTS statistiche_sposta(text, text, date, text, date, text)")
+    op.execute("DROP FUNCTION IF EXISTS statistiche_incrementa(date, text, text, text, integer)")
+    op.drop_index(op.f('ix_statistiche_giornaliere_id'), table_name='statistiche_giornaliere')
+    op.drop_table('statistiche_giornaliere')
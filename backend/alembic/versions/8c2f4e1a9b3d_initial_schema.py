@@ -0,0 +1,205 @@
+"""initial schema
+
+Revision ID: 8c2f4e1a9b3d
+Revises:
+Create Date: 2026-10-19 09:12:44.118203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2f4e1a9b3d'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+account_type = sa.Enum('NORMALE', 'PEC', name='accounttype')
+email_category = sa.Enum(
+    'INFO_GENERICHE', 'RICHIESTA_APPUNTAMENTO', 'RICHIESTA_TESSERAMENTO',
+    'CONVOCAZIONE_SCUOLA', 'COMUNICAZIONE_UST_USR', 'COMUNICAZIONE_SCUOLA',
+    'COMUNICAZIONE_SNALS_CENTRALE', 'VARIE',
+    name='emailcategory'
+)
+email_status = sa.Enum(
+    'RICEVUTA', 'IN_ELABORAZIONE', 'CATEGORIZZATA', 'INTERPRETATA',
+    'AZIONE_ESEGUITA', 'ERRORE', 'COMPLETATA',
+    name='emailstatus'
+)
+tipo_azione = sa.Enum(
+    'BOZZA_RISPOSTA', 'BOZZA_APPUNTAMENTO', 'BOZZA_TESSERAMENTO',
+    'EVENTO_CALENDARIO', 'UPLOAD_DRIVE', 'SINTESI', 'INOLTRA', 'NOTIFICA',
+    name='tipoazione'
+)
+stato_azione = sa.Enum(
+    'IN_CODA', 'IN_ESECUZIONE', 'COMPLETATA', 'FALLITA', 'ANNULLATA',
+    name='statoazione'
+)
+ruolo_utente = sa.Enum('ADMIN', 'OPERATORE', 'VISUALIZZATORE', name='ruoloutente')
+livello_log = sa.Enum('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL', name='livellolog')
+
+
+def upgrade() -> None:
+    op.create_table(
+        'utenti',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('nome', sa.String(length=255), nullable=False),
+        sa.Column('hashed_password', sa.String(length=255), nullable=False),
+        sa.Column('ruolo', ruolo_utente, nullable=True),
+        sa.Column('attivo', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('ultimo_accesso', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_utenti_id'), 'utenti', ['id'], unique=False)
+    op.create_index(op.f('ix_utenti_email'), 'utenti', ['email'], unique=True)
+
+    op.create_table(
+        'emails',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('message_id', sa.String(length=255), nullable=False),
+        sa.Column('account_type', account_type, nullable=False),
+        sa.Column('mittente', sa.String(length=255), nullable=False),
+        sa.Column('destinatario', sa.String(length=255), nullable=False),
+        sa.Column('oggetto', sa.String(length=500), nullable=True),
+        sa.Column('corpo', sa.Text(), nullable=True),
+        sa.Column('data_ricezione', sa.DateTime(), nullable=False),
+        sa.Column('data_elaborazione', sa.DateTime(), nullable=True),
+        sa.Column('allegati_path', sa.JSON(), nullable=True),
+        sa.Column('allegati_nomi', sa.JSON(), nullable=True),
+        sa.Column('categoria', email_category, nullable=True),
+        sa.Column('categoria_confidence', sa.Float(), nullable=True),
+        sa.Column('stato', email_status, nullable=True),
+        sa.Column('richiede_revisione', sa.Boolean(), nullable=True),
+        sa.Column('revisionata', sa.Boolean(), nullable=True),
+        sa.Column('priorita', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_emails_id'), 'emails', ['id'], unique=False)
+    op.create_index(op.f('ix_emails_message_id'), 'emails', ['message_id'], unique=True)
+    op.create_index(op.f('ix_emails_mittente'), 'emails', ['mittente'], unique=False)
+    op.create_index(op.f('ix_emails_data_ricezione'), 'emails', ['data_ricezione'], unique=False)
+    op.create_index(op.f('ix_emails_categoria'), 'emails', ['categoria'], unique=False)
+    op.create_index(op.f('ix_emails_stato'), 'emails', ['stato'], unique=False)
+
+    op.create_table(
+        'interpretazioni',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email_id', sa.Integer(), nullable=False),
+        sa.Column('categoria', sa.String(length=100), nullable=False),
+        sa.Column('interpretazione_json', sa.JSON(), nullable=False),
+        sa.Column('confidence', sa.Float(), nullable=True),
+        sa.Column('richiede_revisione', sa.Boolean(), nullable=True),
+        sa.Column('revisionata', sa.Boolean(), nullable=True),
+        sa.Column('revisione_note', sa.Text(), nullable=True),
+        sa.Column('revisore_user_id', sa.Integer(), nullable=True),
+        sa.Column('timestamp_creazione', sa.DateTime(), nullable=True),
+        sa.Column('timestamp_revisione', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['email_id'], ['emails.id']),
+        sa.ForeignKeyConstraint(['revisore_user_id'], ['utenti.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email_id')
+    )
+    op.create_index(op.f('ix_interpretazioni_id'), 'interpretazioni', ['id'], unique=False)
+
+    op.create_table(
+        'azioni',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email_id', sa.Integer(), nullable=False),
+        sa.Column('tipo', tipo_azione, nullable=False),
+        sa.Column('stato', stato_azione, nullable=True),
+        sa.Column('dettagli', sa.JSON(), nullable=True),
+        sa.Column('risultato', sa.JSON(), nullable=True),
+        sa.Column('errore', sa.Text(), nullable=True),
+        sa.Column('timestamp_inizio', sa.DateTime(), nullable=True),
+        sa.Column('timestamp_fine', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['email_id'], ['emails.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_azioni_id'), 'azioni', ['id'], unique=False)
+    op.create_index(op.f('ix_azioni_stato'), 'azioni', ['stato'], unique=False)
+
+    op.create_table(
+        'eventi_calendario',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email_id', sa.Integer(), nullable=True),
+        sa.Column('titolo', sa.String(length=500), nullable=False),
+        sa.Column('descrizione', sa.Text(), nullable=True),
+        sa.Column('data_inizio', sa.DateTime(), nullable=False),
+        sa.Column('data_fine', sa.DateTime(), nullable=True),
+        sa.Column('all_day', sa.Boolean(), nullable=True),
+        sa.Column('luogo', sa.String(length=500), nullable=True),
+        sa.Column('link_videocall', sa.String(length=500), nullable=True),
+        sa.Column('scuola', sa.String(length=255), nullable=True),
+        sa.Column('tipo_convocazione', sa.String(length=100), nullable=True),
+        sa.Column('assegnatario_id', sa.Integer(), nullable=True),
+        sa.Column('google_calendar_id', sa.String(length=255), nullable=True),
+        sa.Column('google_event_id', sa.String(length=255), nullable=True),
+        sa.Column('sincronizzato', sa.Boolean(), nullable=True),
+        sa.Column('allegati', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['email_id'], ['emails.id']),
+        sa.ForeignKeyConstraint(['assegnatario_id'], ['utenti.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_eventi_calendario_id'), 'eventi_calendario', ['id'], unique=False)
+    op.create_index(op.f('ix_eventi_calendario_data_inizio'), 'eventi_calendario', ['data_inizio'], unique=False)
+    op.create_index(op.f('ix_eventi_calendario_scuola'), 'eventi_calendario', ['scuola'], unique=False)
+
+    op.create_table(
+        'regole',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('nome', sa.String(length=255), nullable=False),
+        sa.Column('descrizione', sa.Text(), nullable=True),
+        sa.Column('attivo', sa.Boolean(), nullable=True),
+        sa.Column('priorita', sa.Integer(), nullable=True),
+        sa.Column('condizioni', sa.JSON(), nullable=False),
+        sa.Column('azioni', sa.JSON(), nullable=False),
+        sa.Column('volte_applicata', sa.Integer(), nullable=True),
+        sa.Column('ultima_applicazione', sa.DateTime(), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_regole_id'), 'regole', ['id'], unique=False)
+    op.create_index(op.f('ix_regole_attivo'), 'regole', ['attivo'], unique=False)
+    op.create_index(op.f('ix_regole_priorita'), 'regole', ['priorita'], unique=False)
+
+    op.create_table(
+        'log_sistema',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.Column('livello', livello_log, nullable=False),
+        sa.Column('componente', sa.String(length=100), nullable=True),
+        sa.Column('messaggio', sa.Text(), nullable=False),
+        sa.Column('extra', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_log_sistema_id'), 'log_sistema', ['id'], unique=False)
+    op.create_index(op.f('ix_log_sistema_timestamp'), 'log_sistema', ['timestamp'], unique=False)
+    op.create_index(op.f('ix_log_sistema_livello'), 'log_sistema', ['livello'], unique=False)
+    op.create_index(op.f('ix_log_sistema_componente'), 'log_sistema', ['componente'], unique=False)
+    op.create_index('idx_log_timestamp_livello', 'log_sistema', ['timestamp', 'livello'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_table('log_sistema')
+    op.drop_table('regole')
+    op.drop_table('eventi_calendario')
+    op.drop_table('azioni')
+    op.drop_table('interpretazioni')
+    op.drop_table('emails')
+    op.drop_table('utenti')
+
+    for enum_type in (livello_log, ruolo_utente, stato_azione, tipo_azione,
+                      email_status, email_category, account_type):
+        enum_type.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,38 @@
+"""outbox creazione azioni
+
+Revision ID: acd224ffeefc
+Revises: df312285b154
+Create Date: 2026-10-19 12:53:36.778402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'acd224ffeefc'
+down_revision: Union[str, None] = 'df312285b154'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('outbox_azioni', sa.Column('email_id', sa.Integer(), nullable=True))
+    op.alter_column('outbox_azioni', 'azione_id',
+               existing_type=sa.INTEGER(),
+               nullable=True)
+    op.create_check_constraint(
+        'ck_outbox_azione_o_email', 'outbox_azioni', '(azione_id IS NULL) <> (email_id IS NULL)'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('ck_outbox_azione_o_email', 'outbox_azioni', type_='check')
+    # Le richieste di creazione azioni non hanno un equivalente nello schema precedente
+    op.execute("DELETE FROM outbox_azioni WHERE azione_id IS NULL")
+    op.alter_column('outbox_azioni', 'azione_id',
+               existing_type=sa.INTEGER(),
+               nullable=False)
+    op.drop_column('outbox_azioni', 'email_id')
@@ -0,0 +1,45 @@
+"""outbox azioni
+
+Revision ID: b41d7e2c9f05
+Revises: 8c2f4e1a9b3d
+Create Date: 2026-10-19 10:03:27.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d7e2c9f05'
+down_revision: Union[str, None] = '8c2f4e1a9b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'outbox_azioni',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('azione_id', sa.Integer(), nullable=False),
+        sa.Column('creato_at', sa.DateTime(), nullable=False),
+        sa.Column('inviato_at', sa.DateTime(), nullable=True),
+        sa.Column('tentativi_invio', sa.Integer(), nullable=True),
+        sa.Column('ultimo_errore', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['azione_id'], ['azioni.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_outbox_azioni_id'), 'outbox_azioni', ['id'], unique=False)
+    op.create_index(op.f('ix_outbox_azioni_azione_id'), 'outbox_azioni', ['azione_id'], unique=False)
+    op.create_index(
+        'idx_outbox_non_inviati', 'outbox_azioni', ['creato_at'], unique=False,
+        postgresql_where=sa.text('inviato_at IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_outbox_non_inviati', table_name='outbox_azioni')
+    op.drop_index(op.f('ix_outbox_azioni_azione_id'), table_name='outbox_azioni')
+    op.drop_index(op.f('ix_outbox_azioni_id'), table_name='outbox_azioni')
+    op.drop_table('outbox_azioni')
@@ -0,0 +1,139 @@
+"""partizionamento mensile
+
+Revision ID: d79a54e062b4
+Revises: 88376e62b2a0
+Create Date: 2026-10-19 12:15:40.512377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd79a54e062b4'
+down_revision: Union[str, None] = '88376e62b2a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partizioni create in anticipo oltre al mese corrente (PARTITION_MONTHS_AHEAD)
+MESI_AVANTI = 3
+
+# Tabelle con foreign key verso emails.id, non ammesse verso una tabella
+# partizionata (la chiave univoca dovrebbe includere data_ricezione)
+FK_EMAILS = ('interpretazioni', 'azioni', 'eventi_calendario')
+
+
+def _ricrea(tabella: str, partizione_su: Union[str, None]) -> None:
+    """
+    Ricrea la tabella copiandone struttura e righe, partizionata o no.
+
+    Indici, vincoli e trigger vanno ricreati dal chiamante.
+    """
+    nuova = f"{tabella}_nuova"
+    partition_by = f" PARTITION BY RANGE ({partizione_su})" if partizione_su else ""
+    op.execute(
+        f"CREATE TABLE {nuova} (LIKE {tabella} INCLUDING DEFAULTS INCLUDING GENERATED)"
+        f"{partition_by}"
+    )
+
+    if partizione_su:
+        # Una partizione per ogni mese con dati, più i prossimi mesi;
+        # le date anomale finiscono nella partizione di default
+        op.execute(f"""
+            DO $$
+            DECLARE mese date;
+            BEGIN
+                FOR mese IN
+                    SELECT date_trunc('month', {partizione_su})::date FROM {tabella}
+                    WHERE {partizione_su} >= now() - interval '20 years'
+                      AND {partizione_su} < now() + interval '{MESI_AVANTI + 1} months'
+                    UNION
+                    SELECT (date_trunc('month', now()) + make_interval(months => n))::date
+                    FROM generate_series(0, {MESI_AVANTI}) n
+                LOOP
+                    EXECUTE format(
+                        'CREATE TABLE %I PARTITION OF {nuova} FOR VALUES FROM (%L) TO (%L)',
+                        '{tabella}_p' || to_char(mese, 'YYYY_MM'), mese, mese + interval '1 month'
+                    );
+                END LOOP;
+            END
+            $$
+        """)
+        op.execute(f"CREATE TABLE {tabella}_default PARTITION OF {nuova} DEFAULT")
+
+    op.execute(f"""
+        DO $$
+        DECLARE colonne text;
+        BEGIN
+            SELECT string_agg(quote_ident(column_name), ', ' ORDER BY ordinal_position) INTO colonne
+            FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = '{tabella}' AND is_generated = 'NEVER';
+            EXECUTE format('INSERT INTO {nuova} (%s) SELECT %s FROM {tabella}', colonne, colonne);
+        END
+        $$
+    """)
+
+    # La sequenza dell'id passa alla nuova tabella
+    op.execute(f"ALTER SEQUENCE {tabella}_id_seq OWNED BY NONE")
+    op.execute(f"DROP TABLE {tabella}")
+    op.execute(f"ALTER TABLE {nuova} RENAME TO {tabella}")
+    op.execute(f"ALTER SEQUENCE {tabella}_id_seq OWNED BY {tabella}.id")
+
+
+def _indici_emails(message_id_univoco: bool) -> None:
+    op.create_index(op.f('ix_emails_id'), 'emails', ['id'], unique=False)
+    op.create_index(op.f('ix_emails_message_id'), 'emails', ['message_id'], unique=message_id_univoco)
+    op.create_index(op.f('ix_emails_mittente'), 'emails', ['mittente'], unique=False)
+    op.create_index(op.f('ix_emails_data_ricezione'), 'emails', ['data_ricezione'], unique=False)
+    op.create_index(op.f('ix_emails_categoria'), 'emails', ['categoria'], unique=False)
+    op.create_index(op.f('ix_emails_stato'), 'emails', ['stato'], unique=False)
+    op.create_index('ix_emails_search_vector', 'emails', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_emails_data_ricezione_id', 'emails', ['data_ricezione', 'id'], unique=False)
+    op.execute(
+        "CREATE TRIGGER trg_statistiche_emails "
+        "AFTER INSERT OR DELETE OR UPDATE OF data_ricezione, categoria, stato, account_type ON emails "
+        "FOR EACH ROW EXECUTE FUNCTION statistiche_emails()"
+    )
+
+
+def _indici_log_sistema() -> None:
+    op.create_index(op.f('ix_log_sistema_id'), 'log_sistema', ['id'], unique=False)
+    op.create_index(op.f('ix_log_sistema_timestamp'), 'log_sistema', ['timestamp'], unique=False)
+    op.create_index(op.f('ix_log_sistema_livello'), 'log_sistema', ['livello'], unique=False)
+    op.create_index(op.f('ix_log_sistema_componente'), 'log_sistema', ['componente'], unique=False)
+    op.create_index('idx_log_timestamp_livello', 'log_sistema', ['timestamp', 'livello'], unique=False)
+
+
+def upgrade() -> None:
+    for tabella in FK_EMAILS:
+        op.drop_constraint(f'{tabella}_email_id_fkey', tabella, type_='foreignkey')
+    # Le join azioni -> email non hanno più l'indice implicito della FK
+    op.create_index(op.f('ix_azioni_email_id'), 'azioni', ['email_id'], unique=False)
+
+    _ricrea('emails', 'data_ricezione')
+    op.create_primary_key('emails_pkey', 'emails', ['id', 'data_ricezione'])
+    op.create_unique_constraint('uq_emails_message_id_data', 'emails', ['message_id', 'data_ricezione'])
+    _indici_emails(message_id_univoco=False)
+
+    _ricrea('log_sistema', 'timestamp')
+    op.create_primary_key('log_sistema_pkey', 'log_sistema', ['id', 'timestamp'])
+    _indici_log_sistema()
+
+
+def downgrade() -> None:
+    # Le partizioni staccate (archivio) non vengono reintegrate: se azioni o
+    # interpretazioni puntano a email archiviate le foreign key falliscono,
+    # vanno riattaccate prima del downgrade
+    _ricrea('log_sistema', None)
+    op.create_primary_key('log_sistema_pkey', 'log_sistema', ['id'])
+    _indici_log_sistema()
+
+    _ricrea('emails', None)
+    op.create_primary_key('emails_pkey', 'emails', ['id'])
+    _indici_emails(message_id_univoco=True)
+
+    op.drop_index(op.f('ix_azioni_email_id'), table_name='azioni')
+    for tabella in FK_EMAILS:
+        op.create_foreign_key(f'{tabella}_email_id_fkey', tabella, 'emails', ['email_id'], ['id'])
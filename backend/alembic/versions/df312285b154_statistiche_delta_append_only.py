@@ -0,0 +1,83 @@
+"""statistiche_delta append-only
+
+Revision ID: df312285b154
+Revises: 69bb2ad0ad1f
+Create Date: 2026-10-19 12:46:48.281474
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'df312285b154'
+down_revision: Union[str, None] = '69bb2ad0ad1f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# I trigger accodano variazioni invece di aggiornare i contatori condivisi:
+# due transazioni che spostano righe in direzioni opposte bloccavano la
+# stessa coppia di bucket in ordine inverso (deadlock)
+FUNZIONE_INCREMENTA = """
+CREATE OR REPLACE FUNCTION statistiche_incrementa(
+    p_giorno date, p_entita text, p_dimensione text, p_valore text, p_delta integer
+) RETURNS void AS $$
+BEGIN
+    IF p_giorno IS NULL OR p_valore IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO statistiche_delta (giorno, entita, dimensione, valore, delta)
+    VALUES (p_giorno, p_entita, p_dimensione, p_valore, p_delta);
+END
+$$ LANGUAGE plpgsql
+"""
+
+FUNZIONE_INCREMENTA_PRECEDENTE = """
+CREATE OR REPLACE FUNCTION statistiche_incrementa(
+    p_giorno date, p_entita text, p_dimensione text, p_valore text, p_delta integer
+) RETURNS void AS $$
+BEGIN
+    IF p_giorno IS NULL OR p_valore IS NULL THEN
+        RETURN;
+    END IF;
+    INSERT INTO statistiche_giornaliere (giorno, entita, dimensione, valore, conteggio)
+    VALUES (p_giorno, p_entita, p_dimensione, p_valore, p_delta)
+    ON CONFLICT ON CONSTRAINT uq_statistica_bucket
+    DO UPDATE SET conteggio = statistiche_giornaliere.conteggio + EXCLUDED.conteggio;
+END
+$$ LANGUAGE plpgsql
+"""
+
+CONSOLIDA = """
+WITH consolidati AS (
+    DELETE FROM statistiche_delta RETURNING giorno, entita, dimensione, valore, delta
+)
+INSERT INTO statistiche_giornaliere (giorno, entita, dimensione, valore, conteggio)
+SELECT giorno, entita, dimensione, valore, sum(delta) FROM consolidati
+GROUP BY giorno, entita, dimensione, valore
+ON CONFLICT ON CONSTRAINT uq_statistica_bucket
+DO UPDATE SET conteggio = statistiche_giornaliere.conteggio + EXCLUDED.conteggio
+"""
+
+
+def upgrade() -> None:
+    op.create_table('statistiche_delta',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('giorno', sa.Date(), nullable=False),
+    sa.Column('entita', sa.String(length=20), nullable=False),
+    sa.Column('dimensione', sa.String(length=30), nullable=False),
+    sa.Column('valore', sa.String(length=50), nullable=False),
+    sa.Column('delta', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(FUNZIONE_INCREMENTA)
+
+
+def downgrade() -> None:
+    # Variazioni pendenti nei contatori prima di tornare agli upsert diretti
+    op.execute("LOCK TABLE statistiche_delta IN EXCLUSIVE MODE")
+    op.execute(CONSOLIDA)
+    op.execute(FUNZIONE_INCREMENTA_PRECEDENTE)
+    op.drop_table('statistiche_delta')
@@ -0,0 +1,30 @@
+"""Lease presa in carico azioni
+
+Revision ID: e4918c6d94c3
+Revises: 2bd97e486972
+Create Date: 2026-10-19 12:25:55.433453
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4918c6d94c3'
+down_revision: Union[str, None] = '2bd97e486972'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('azioni', sa.Column('lease_scade', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_azioni_lease_scade'), 'azioni', ['lease_scade'], unique=False)
+    # Azioni rimaste IN_ESECUZIONE da worker precedenti: recuperate dal primo sweep
+    op.execute("UPDATE azioni SET lease_scade = now() WHERE stato = 'IN_ESECUZIONE'")
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_azioni_lease_scade'), table_name='azioni')
+    op.drop_column('azioni', 'lease_scade')
@@ -0,0 +1,42 @@
+"""retry azioni e dead letter
+
+Revision ID: e7a3c5d18b62
+Revises: b41d7e2c9f05
+Create Date: 2026-10-19 11:41:09.372655
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a3c5d18b62'
+down_revision: Union[str, None] = 'b41d7e2c9f05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TYPE statoazione ADD VALUE IF NOT EXISTS 'DEAD_LETTER'")
+
+    op.add_column('azioni', sa.Column('tentativi', sa.Integer(), nullable=True))
+    op.add_column('azioni', sa.Column('max_tentativi', sa.Integer(), nullable=True))
+    op.add_column('azioni', sa.Column('prossimo_tentativo', sa.DateTime(), nullable=True))
+    op.add_column('azioni', sa.Column('tipo_errore', sa.String(length=20), nullable=True))
+    op.create_index(op.f('ix_azioni_prossimo_tentativo'), 'azioni', ['prossimo_tentativo'], unique=False)
+
+    op.execute("UPDATE azioni SET tentativi = 0 WHERE tentativi IS NULL")
+
+
+def downgrade() -> None:
+    # PostgreSQL non permette di rimuovere un valore da un enum:
+    # le azioni in dead letter tornano FALLITA e il valore resta inutilizzato
+    op.execute("UPDATE azioni SET stato = 'FALLITA' WHERE stato = 'DEAD_LETTER'")
+
+    op.drop_index(op.f('ix_azioni_prossimo_tentativo'), table_name='azioni')
+    op.drop_column('azioni', 'tipo_errore')
+    op.drop_column('azioni', 'prossimo_tentativo')
+    op.drop_column('azioni', 'max_tentativi')
+    op.drop_column('azioni', 'tentativi')
@@ -0,0 +1,46 @@
+"""Archivio freddo contenuti email
+
+Revision ID: f0c285d640bc
+Revises: d79a54e062b4
+Create Date: 2026-10-19 12:14:18.037334
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f0c285d640bc'
+down_revision: Union[str, None] = 'd79a54e062b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('archivio_frammenti',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email_id', sa.Integer(), nullable=False),
+    sa.Column('tipo', sa.String(length=20), nullable=False),
+    sa.Column('indice', sa.Integer(), nullable=False),
+    sa.Column('nome', sa.String(length=500), nullable=True),
+    sa.Column('segmento', sa.String(length=50), nullable=False),
+    sa.Column('offset', sa.BigInteger(), nullable=False),
+    sa.Column('lunghezza', sa.Integer(), nullable=False),
+    sa.Column('dimensione', sa.BigInteger(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email_id', 'tipo', 'indice', name='uq_frammento_email')
+    )
+    op.create_index(op.f('ix_archivio_frammenti_email_id'), 'archivio_frammenti', ['email_id'], unique=False)
+    op.create_index(op.f('ix_archivio_frammenti_id'), 'archivio_frammenti', ['id'], unique=False)
+    op.add_column('emails', sa.Column('archiviata_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('emails', 'archiviata_at')
+    op.drop_index(op.f('ix_archivio_frammenti_id'), table_name='archivio_frammenti')
+    op.drop_index(op.f('ix_archivio_frammenti_email_id'), table_name='archivio_frammenti')
+    op.drop_table('archivio_frammenti')
@@ -0,0 +1,197 @@
+"""
+Paginazione keyset (a cursore) per le liste dell'API.
+
+Invece di OFFSET, che fa scorrere al database tutte le righe precedenti,
+ogni pagina riparte dall'ultima chiave di ordinamento restituita
+(es. data_ricezione, id): il costo di una pagina non dipende dalla sua
+profondità. Il cursore è opaco per il client (JSON in base64 URL-safe).
+
+Il totale esatto (COUNT) è opzionale: di default si restituisce la stima
+del planner PostgreSQL, sufficiente per la UI e indipendente dalle
+dimensioni della tabella.
+"""
+import json
+import base64
+from datetime import datetime, date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from sqlalchemy.ext.compiler import compiles
+
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    """
+    Codifica un cursore opaco.
+
+    Args:
+        payload: {"k": valori chiave} per keyset, {"o": offset} per risultati ordinati per rilevanza
+
+    Returns:
+        str: Cursore base64 URL-safe
+    """
+    def default(value):
+        if isinstance(value, datetime):
+            return {'dt': value.isoformat()}
+        if isinstance(value, date):
+            return {'d': value.isoformat()}
+        raise TypeError(f"Valore cursore non serializzabile: {value!r}")
+
+    raw = json.dumps(payload, default=default, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Decodifica un cursore prodotto da encode_cursor.
+
+    Raises:
+        HTTPException: 400 se il cursore non è valido
+    """
+    def hook(obj):
+        if set(obj) == {'dt'}:
+            return datetime.fromisoformat(obj['dt'])
+        if set(obj) == {'d'}:
+            return date.fromisoformat(obj['d'])
+        return obj
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw, object_hook=hook)
+        if not isinstance(payload, dict):
+            raise ValueError(cursor)
+        return payload
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursore non valido")
+
+
+def keyset_page(
+    query: Query,
+    keys: Sequence,
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = True,
+    skip: int = 0
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Restituisce una pagina ordinata per le colonne chiave e il cursore successivo.
+
+    Le colonne devono identificare univocamente la riga (es. data, id) ed
+    essere tutte ordinate nella stessa direzione, così il filtro è un
+    confronto tra tuple che usa l'indice composto.
+
+    Args:
+        query: Query già filtrata (senza ORDER BY)
+        keys: Colonne di ordinamento, l'ultima univoca
+        cursor: Cursore della pagina precedente (None: prima pagina)
+        limit: Righe per pagina
+        descending: Ordine decrescente
+        skip: Offset iniziale se non c'è cursore (compatibilità con skip)
+
+    Returns:
+        Tuple: (righe, cursore pagina successiva o None)
+    """
+    if cursor:
+        valori = decode_cursor(cursor).get('k')
+        if not isinstance(valori, list) or len(valori) != len(keys):
+            raise HTTPException(status_code=400, detail="Cursore non valido")
+        confronto = tuple_(*keys) < tuple_(*valori) if descending else tuple_(*keys) > tuple_(*valori)
+        query = query.filter(confronto)
+
+    ordine = [key.desc() if descending else key.asc() for key in keys]
+    query = query.order_by(*ordine)
+    if skip and not cursor:
+        query = query.offset(skip)
+    righe = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(righe) > limit:
+        righe = righe[:limit]
+        ultima = righe[-1]
+        next_cursor = encode_cursor({'k': [getattr(ultima, key.key) for key in keys]})
+
+    return righe, next_cursor
+
+
+def offset_cursor_page(
+    query: Query,
+    cursor: Optional[str],
+    limit: int,
+    skip: int = 0
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    Pagina con cursore basato su offset, per ordinamenti non keyset (es. rilevanza).
+
+    Args:
+        query: Query già ordinata
+        cursor: Cursore della pagina precedente
+        limit: Righe per pagina
+        skip: Offset iniziale se non c'è cursore (compatibilità con skip)
+
+    Returns:
+        Tuple: (righe, cursore pagina successiva o None)
+    """
+    offset = decode_cursor(cursor).get('o', 0) if cursor else skip
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Cursore non valido")
+
+    righe = query.offset(offset).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(righe) > limit:
+        righe = righe[:limit]
+        next_cursor = encode_cursor({'o': offset + limit})
+
+    return righe, next_cursor
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) di una query, con i parametri gestiti da SQLAlchemy."""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_Explain, 'postgresql')
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def estimate_count(db: Session, query: Query) -> int:
+    """
+    Stima il numero di righe di una query dalle statistiche del planner.
+
+    Non esegue la query: il costo è quello della pianificazione. La stima
+    dipende da ANALYZE/autovacuum ed è approssimata per filtri molto selettivi.
+
+    Args:
+        db: Sessione database
+        query: Query filtrata (senza ORDER BY/LIMIT)
+
+    Returns:
+        int: Righe stimate
+    """
+    plan = db.execute(_Explain(query.statement)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_rows(db: Session, query: Query, exact: bool) -> int:
+    """
+    Totale per la risposta: COUNT esatto su richiesta, altrimenti stima.
+
+    Args:
+        db: Sessione database
+        query: Query filtrata
+        exact: True per il COUNT esatto
+
+    Returns:
+        int: Totale esatto o stimato
+    """
+    if exact:
+        return query.order_by(None).count()
+    return estimate_count(db, query.order_by(None))
@@ -6,11 +6,13 @@ FASE 6: API Complete per Frontend
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
 
 from app.database import get_db
 from app.models.azione import Azione, TipoAzione, StatoAzione
 from app.services.action_executor import ActionExecutor
+from app.services.action_dispatcher import ActionDispatcher
+from app.api.pagination import keyset_page, count_rows
+from app.services.statistiche import contatori
 
 router = APIRouter(prefix="/azioni", tags=["azioni"])
 
@@ -19,16 +21,20 @@ router = APIRouter(prefix="/azioni", tags=["azioni"])
 def list_azioni(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    totale_esatto: bool = False,
     email_id: Optional[int] = None,
     tipo_azione: Optional[str] = None,
     stato: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Lista azioni con filtri e paginazione.
+    Lista azioni con filtri e paginazione a cursore.
 
-    - **skip**: Numero azioni da saltare
+    - **cursor**: next_cursor della pagina precedente (ignora skip)
+    - **skip**: Numero azioni da saltare (compatibilità, preferire cursor)
     - **limit**: Numero massimo azioni da restituire
+    - **totale_esatto**: COUNT esatto invece della stima del planner
     - **email_id**: Filtra per email specifica
     - **tipo_azione**: Filtra per tipo azione
     - **stato**: Filtra per stato
@@ -41,7 +47,7 @@ def list_azioni(
     if tipo_azione:
         try:
             tipo_enum = TipoAzione(tipo_azione)
-            query = query.filter(Azione.tipo_azione == tipo_enum)
+            query = query.filter(Azione.tipo == tipo_enum)
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Tipo azione non valido: {tipo_azione}")
 
@@ -52,17 +58,71 @@ def list_azioni(
         except ValueError:
             raise HTTPException(status_code=400, detail=f"Stato non valido: {stato}")
 
-    total = query.count()
-    azioni = query.order_by(desc(Azione.creata_at)).offset(skip).limit(limit).all()
+    total = count_rows(db, query, totale_esatto)
+
+    azioni, next_cursor = keyset_page(query, [Azione.timestamp_inizio, Azione.id], cursor, limit, skip=skip)
 
     return {
         "total": total,
+        "total_esatto": totale_esatto,
         "skip": skip,
         "limit": limit,
+        "next_cursor": next_cursor,
         "azioni": azioni
     }
 
 
+@router.get("/dead-letter")
+def list_dead_letter(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    totale_esatto: bool = False,
+    tipo_azione: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Lista azioni in dead letter (errori permanenti o tentativi esauriti), più recenti prima.
+
+    - **cursor**: next_cursor della pagina precedente (ignora skip)
+    - **skip**: Numero azioni da saltare (compatibilità, preferire cursor)
+    - **limit**: Numero massimo azioni da restituire
+    - **totale_esatto**: COUNT esatto invece della stima del planner
+    - **tipo_azione**: Filtra per tipo azione
+    """
+    query = db.query(Azione).filter(Azione.stato == StatoAzione.DEAD_LETTER)
+
+    if tipo_azione:
+        try:
+            query = query.filter(Azione.tipo == TipoAzione(tipo_azione))
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Tipo azione non valido: {tipo_azione}")
+
+    total = count_rows(db, query, totale_esatto)
+
+    azioni, next_cursor = keyset_page(query, [Azione.timestamp_fine, Azione.id], cursor, limit, skip=skip)
+
+    return {
+        "total": total,
+        "total_esatto": totale_esatto,
+        "skip": skip,
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "azioni": [
+            {
+                "id": a.id,
+                "email_id": a.email_id,
+                "tipo": a.tipo.value,
+                "tentativi": a.tentativi,
+                "tipo_errore": a.tipo_errore,
+                "errore": a.errore,
+                "timestamp_fine": a.timestamp_fine,
+            }
+            for a in azioni
+        ]
+    }
+
+
 @router.get("/{azione_id}")
 def get_azione(azione_id: int, db: Session = Depends(get_db)):
     """Recupera dettagli azione singola."""
@@ -100,7 +160,8 @@ def retry_azione(azione_id: int, db: Session = Depends(get_db)):
     """
     Ritenta un'azione fallita.
 
-    Resetta lo stato a PENDING e la reinserisce nella coda.
+    Anticipa il prossimo tentativo: rimette l'azione in coda subito,
+    mantenendo il conteggio dei tentativi.
     """
     azione = db.query(Azione).filter(Azione.id == azione_id).first()
 
@@ -110,14 +171,35 @@ def retry_azione(azione_id: int, db: Session = Depends(get_db)):
     if azione.stato != StatoAzione.FALLITA:
         raise HTTPException(status_code=400, detail="Solo azioni fallite possono essere ritentate")
 
-    # Resetta stato
-    azione.stato = StatoAzione.PENDING
-    azione.errore = None
-    db.commit()
+    ActionDispatcher(db).requeue([azione])
 
     return {"message": "Azione reinserita in coda", "azione_id": azione_id}
 
 
+@router.post("/{azione_id}/requeue")
+def requeue_azione(azione_id: int, db: Session = Depends(get_db)):
+    """
+    Rimette in coda un'azione in dead letter o fallita.
+
+    Azzera tentativi ed errore: da usare dopo aver corretto la causa
+    (credenziali, parametri, cartelle).
+    """
+    azione = db.query(Azione).filter(Azione.id == azione_id).first()
+
+    if not azione:
+        raise HTTPException(status_code=404, detail="Azione non trovata")
+
+    if azione.stato not in (StatoAzione.DEAD_LETTER, StatoAzione.FALLITA):
+        raise HTTPException(
+            status_code=400,
+            detail="Solo azioni in dead letter o fallite possono essere rimesse in coda"
+        )
+
+    ActionDispatcher(db).requeue([azione], reset_tentativi=True)
+
+    return {"message": "Azione rimessa in coda", "azione_id": azione_id}
+
+
 @router.delete("/{azione_id}")
 def delete_azione(azione_id: int, db: Session = Depends(get_db)):
     """Elimina azione."""
@@ -137,24 +219,14 @@ def get_azioni_stats(db: Session = Depends(get_db)):
     """
     Statistiche azioni.
 
-    Restituisce conteggi per stato e tipo.
+    Restituisce conteggi per stato e tipo, letti dai contatori precalcolati.
     """
-    from sqlalchemy import func
-
-    # Conta per stato
-    stati = db.query(
-        Azione.stato,
-        func.count(Azione.id).label('count')
-    ).group_by(Azione.stato).all()
-
-    # Conta per tipo
-    tipi = db.query(
-        Azione.tipo_azione,
-        func.count(Azione.id).label('count')
-    ).group_by(Azione.tipo_azione).all()
+    conteggi = contatori(db, 'azione')
+    stati = conteggi.get('stato', {})
+    tipi = conteggi.get('tipo', {})
 
     return {
-        "stati": [{"stato": s.stato.value, "count": s.count} for s in stati],
-        "tipi": [{"tipo": t.tipo_azione.value, "count": t.count} for t in tipi],
-        "total": db.query(Azione).count()
+        "stati": [{"stato": StatoAzione[nome].value, "count": count} for nome, count in stati.items()],
+        "tipi": [{"tipo": TipoAzione[nome].value, "count": count} for nome, count in tipi.items()],
+        "total": sum(tipi.values())
     }
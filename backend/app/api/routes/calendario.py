@@ -3,6 +3,7 @@ API Routes per gestione Calendario.
 
 FASE 6: API Complete per Frontend
 """
+import logging
 from typing import List, Optional
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
@@ -11,7 +12,14 @@ from pydantic import BaseModel
 
 from app.database import get_db
 from app.models.evento import EventoCalendario
-from app.integrations.google_calendar_client import GoogleCalendarClient
+from app.integrations.google_calendar_client import get_calendar_client
+from app.services.calendar_sync import CalendarSync
+from app.services.calendar_index import get_calendar_index
+from app.api.pagination import keyset_page, count_rows
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/calendario", tags=["calendario"])
 
@@ -41,15 +49,19 @@ class EventoUpdate(BaseModel):
 def list_eventi(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    totale_esatto: bool = False,
     data_da: Optional[str] = None,
     data_a: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Lista eventi calendario.
+    Lista eventi calendario in ordine cronologico, con paginazione a cursore.
 
-    - **skip**: Numero eventi da saltare
+    - **cursor**: next_cursor della pagina precedente (ignora skip)
+    - **skip**: Numero eventi da saltare (compatibilità, preferire cursor)
     - **limit**: Numero massimo eventi da restituire
+    - **totale_esatto**: COUNT esatto invece della stima del planner
     - **data_da**: Filtra da data (YYYY-MM-DD)
     - **data_a**: Filtra fino a data (YYYY-MM-DD)
     """
@@ -70,17 +82,99 @@ def list_eventi(
         except ValueError:
             raise HTTPException(status_code=400, detail="Formato data_a non valido")
 
-    total = query.count()
-    eventi = query.order_by(EventoCalendario.data_inizio).offset(skip).limit(limit).all()
+    total = count_rows(db, query, totale_esatto)
+
+    eventi, next_cursor = keyset_page(
+        query, [EventoCalendario.data_inizio, EventoCalendario.id], cursor, limit, descending=False, skip=skip
+    )
 
     return {
         "total": total,
+        "total_esatto": totale_esatto,
         "skip": skip,
         "limit": limit,
+        "next_cursor": next_cursor,
         "eventi": eventi
     }
 
 
+def _parse_iso(value: str, nome: str) -> datetime:
+    """Interpreta un parametro data/ora ISO (400 se non valido)."""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Formato {nome} non valido")
+
+
+@router.get("/conflitti")
+def get_conflitti(
+    data_inizio: str,
+    data_fine: Optional[str] = None,
+    assegnatario_id: Optional[int] = None,
+    escludi_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Verifica se un intervallo si sovrappone a impegni esistenti.
+
+    Risponde dall'indice in memoria, senza query sugli eventi.
+
+    - **data_inizio**: Inizio (ISO, es. 2025-01-15T10:00:00)
+    - **data_fine**: Fine (default: un'ora dopo l'inizio)
+    - **assegnatario_id**: Solo impegni di questo assegnatario (default: tutti)
+    - **escludi_id**: Evento da ignorare (es. quello che si sta spostando)
+    """
+    inizio = _parse_iso(data_inizio, "data_inizio")
+    fine = _parse_iso(data_fine, "data_fine") if data_fine else None
+
+    if fine and fine <= inizio:
+        raise HTTPException(status_code=400, detail="data_fine deve seguire data_inizio")
+
+    conflitti = get_calendar_index().overlaps(db, inizio, fine, assegnatario_id, escludi_id)
+
+    return {
+        "sovrapposto": bool(conflitti),
+        "conflitti": [
+            {"id": evento_id, "data_inizio": c_inizio, "data_fine": c_fine}
+            for c_inizio, c_fine, evento_id in conflitti
+        ]
+    }
+
+
+@router.get("/slot-liberi")
+def get_slot_liberi(
+    data_da: str,
+    data_a: Optional[str] = None,
+    durata_minuti: int = Query(60, ge=5, le=480),
+    assegnatario_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_db)
+):
+    """
+    Slot liberi nelle fasce lavorative (CALENDAR_WORK_HOURS, lun-ven).
+
+    - **data_da**: Inizio ricerca (ISO)
+    - **data_a**: Fine ricerca (default: 7 giorni dopo data_da)
+    - **durata_minuti**: Durata dello slot
+    - **assegnatario_id**: Impegni di questo assegnatario (default: tutti)
+    - **limit**: Numero massimo di slot
+    """
+    da = _parse_iso(data_da, "data_da")
+    a = _parse_iso(data_a, "data_a") if data_a else da + timedelta(days=7)
+
+    if (a - da).days > 90:
+        raise HTTPException(status_code=400, detail="Intervallo massimo 90 giorni")
+
+    slots = get_calendar_index().free_slots(
+        db, da, a, timedelta(minutes=durata_minuti), assegnatario_id, limit
+    )
+
+    return {
+        "durata_minuti": durata_minuti,
+        "slot": [{"inizio": inizio, "fine": fine} for inizio, fine in slots]
+    }
+
+
 @router.get("/{evento_id}")
 def get_evento(evento_id: int, db: Session = Depends(get_db)):
     """Recupera dettagli evento singolo."""
@@ -117,9 +211,8 @@ def create_evento(evento_data: EventoCreate, db: Session = Depends(get_db)):
         data_fine=datetime.fromisoformat(evento_data.data_fine) if evento_data.data_fine else None,
         luogo=evento_data.luogo,
         descrizione=evento_data.descrizione,
-        partecipanti=evento_data.partecipanti,
         email_id=evento_data.email_id,
-        sincronizzato_google=False
+        sincronizzato=False
     )
 
     db.add(evento)
@@ -128,7 +221,7 @@ def create_evento(evento_data: EventoCreate, db: Session = Depends(get_db)):
 
     # Prova a sincronizzare con Google Calendar
     try:
-        gcal_client = GoogleCalendarClient()
+        gcal_client = get_calendar_client()
 
         if gcal_client.authenticate():
             gcal_event = gcal_client.create_event(
@@ -137,16 +230,17 @@ def create_evento(evento_data: EventoCreate, db: Session = Depends(get_db)):
                 end_datetime=evento.data_fine.isoformat() if evento.data_fine else None,
                 location=evento.luogo,
                 description=evento.descrizione,
-                attendees=evento.partecipanti
+                attendees=evento_data.partecipanti,
+                calendar_id=settings.GOOGLE_CALENDAR_ID
             )
 
             if gcal_event:
+                evento.google_calendar_id = settings.GOOGLE_CALENDAR_ID
                 evento.google_event_id = gcal_event['id']
-                evento.sincronizzato_google = True
+                evento.sincronizzato = True
                 db.commit()
 
     except Exception as e:
-        logger = logging.getLogger(__name__)
         logger.warning(f"Impossibile sincronizzare con Google Calendar: {e}")
 
     return {"message": "Evento creato", "evento": evento}
@@ -180,16 +274,13 @@ def update_evento(
     if evento_data.descrizione is not None:
         evento.descrizione = evento_data.descrizione
 
-    if evento_data.partecipanti is not None:
-        evento.partecipanti = evento_data.partecipanti
-
     db.commit()
     db.refresh(evento)
 
     # Aggiorna su Google Calendar se sincronizzato
-    if evento.sincronizzato_google and evento.google_event_id:
+    if evento.sincronizzato and evento.google_event_id:
         try:
-            gcal_client = GoogleCalendarClient()
+            gcal_client = get_calendar_client()
             if gcal_client.authenticate():
                 updates = {}
                 if evento_data.titolo:
@@ -198,11 +289,17 @@ def update_evento(
                     updates['location'] = evento.luogo
                 if evento_data.descrizione:
                     updates['description'] = evento.descrizione
+                if evento_data.partecipanti is not None:
+                    # I partecipanti non sono salvati localmente: solo su Google
+                    updates['attendees'] = [{'email': email} for email in evento_data.partecipanti]
 
-                gcal_client.update_event(evento.google_event_id, updates)
+                gcal_client.update_event(
+                    evento.google_event_id,
+                    updates,
+                    calendar_id=evento.google_calendar_id or settings.GOOGLE_CALENDAR_ID
+                )
 
         except Exception as e:
-            logger = logging.getLogger(__name__)
             logger.warning(f"Impossibile aggiornare Google Calendar: {e}")
 
     return {"message": "Evento aggiornato", "evento": evento}
@@ -217,13 +314,15 @@ def delete_evento(evento_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Evento non trovato")
 
     # Elimina da Google Calendar se sincronizzato
-    if evento.sincronizzato_google and evento.google_event_id:
+    if evento.sincronizzato and evento.google_event_id:
         try:
-            gcal_client = GoogleCalendarClient()
+            gcal_client = get_calendar_client()
             if gcal_client.authenticate():
-                gcal_client.delete_event(evento.google_event_id)
+                gcal_client.delete_event(
+                    evento.google_event_id,
+                    calendar_id=evento.google_calendar_id or settings.GOOGLE_CALENDAR_ID
+                )
         except Exception as e:
-            logger = logging.getLogger(__name__)
             logger.warning(f"Impossibile eliminare da Google Calendar: {e}")
 
     db.delete(evento)
@@ -234,64 +333,28 @@ def delete_evento(evento_id: int, db: Session = Depends(get_db)):
 
 @router.post("/sync-google")
 def sync_google_calendar(
-    limit: int = Query(10, ge=1, le=100),
+    completa: bool = Query(False, description="Ignora il syncToken e risincronizza tutto"),
     db: Session = Depends(get_db)
 ):
     """
     Sincronizza eventi da Google Calendar.
 
-    Importa eventi recenti da Google Calendar al database locale.
+    La prima volta importa tutti gli eventi del calendario; le successive
+    solo quelli creati, modificati o eliminati dall'ultima sincronizzazione.
     """
-    gcal_client = GoogleCalendarClient()
+    gcal_client = get_calendar_client()
 
     if not gcal_client.authenticate():
         raise HTTPException(status_code=503, detail="Autenticazione Google Calendar fallita")
 
     try:
-        # Recupera eventi da Google
-        time_min = datetime.now() - timedelta(days=7)
-        gcal_events = gcal_client.list_events(max_results=limit, time_min=time_min)
-
-        imported = 0
-
-        for gcal_event in gcal_events:
-            # Verifica se evento già esiste
-            existing = db.query(EventoCalendario).filter(
-                EventoCalendario.google_event_id == gcal_event['id']
-            ).first()
-
-            if existing:
-                continue
-
-            # Estrai date
-            start = gcal_event['start'].get('dateTime', gcal_event['start'].get('date'))
-            end = gcal_event['end'].get('dateTime', gcal_event['end'].get('date'))
-
-            # Crea evento locale
-            evento = EventoCalendario(
-                titolo=gcal_event.get('summary', 'Senza titolo'),
-                data_inizio=datetime.fromisoformat(start.replace('Z', '+00:00')),
-                data_fine=datetime.fromisoformat(end.replace('Z', '+00:00')) if end else None,
-                luogo=gcal_event.get('location'),
-                descrizione=gcal_event.get('description'),
-                partecipanti=[a['email'] for a in gcal_event.get('attendees', [])],
-                google_event_id=gcal_event['id'],
-                sincronizzato_google=True
-            )
-
-            db.add(evento)
-            imported += 1
-
-        db.commit()
+        stats = CalendarSync(db, gcal_client).sync(settings.GOOGLE_CALENDAR_ID, full=completa)
 
         return {
             "message": "Sincronizzazione completata",
-            "eventi_importati": imported,
-            "eventi_totali_google": len(gcal_events)
+            **stats
         }
 
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"Errore sincronizzazione: {str(e)}")
-
-
-import logging
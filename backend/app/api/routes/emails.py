@@ -3,39 +3,96 @@ API Routes per gestione Email.
 
 FASE 6: API Complete per Frontend
 """
+import os
+import json
+import mimetypes
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, or_
+from datetime import date, timedelta
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session, undefer, joinedload, selectinload
+from sqlalchemy import desc, func, case
 
 from app.database import get_db
-from app.models.email import Email, EmailCategory, EmailStatus
+from app.models.email import Email, EmailCategory, EmailStatus, AccountType
+from app.models.azione import StatoAzione
+from app.models.interpretazione import Interpretazione
 from app.schemas.email import EmailResponse, EmailListResponse, EmailUpdateRequest
+from app.api.pagination import keyset_page, offset_cursor_page, count_rows
+from app.services.statistiche import contatori
+from app.services.archivio import ArchivioFreddo
+from app.services.raw_store import RawStore
+from app.services.filtri_interpretazione import filtro_interpretazione
 
 router = APIRouter(prefix="/emails", tags=["emails"])
 
+# Frammenti del corpo evidenziati nei risultati di ricerca
+SNIPPET_OPTIONS = "MaxFragments=2, MaxWords=25, MinWords=8, StartSel=<mark>, StopSel=</mark>"
+
+# Caratteri del corpo restituiti come anteprima nella lista
+ANTEPRIMA_CHARS = 200
+
+# Colonne della lista email (EmailSummary): niente corpo completo,
+# interpretazione o azioni, che restano nel dettaglio
+EMAIL_SUMMARY_COLUMNS = (
+    Email.id,
+    Email.account_type,
+    Email.mittente,
+    Email.oggetto,
+    func.left(Email.corpo, ANTEPRIMA_CHARS).label('anteprima'),
+    Email.data_ricezione,
+    Email.categoria,
+    Email.stato,
+    Email.richiede_revisione,
+    Email.revisionata,
+    Email.priorita,
+    # allegati_nomi può contenere il null JSON, non solo SQL NULL
+    case(
+        (func.json_typeof(Email.allegati_nomi) == 'array', func.json_array_length(Email.allegati_nomi)),
+        else_=0
+    ).label('numero_allegati'),
+)
+
 
 @router.get("/", response_model=EmailListResponse)
 def list_emails(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    totale_esatto: bool = False,
     categoria: Optional[str] = None,
     stato: Optional[str] = None,
     account_type: Optional[str] = None,
     search: Optional[str] = None,
+    scuola: Optional[str] = None,
+    luogo: Optional[str] = None,
+    data_da: Optional[str] = None,
+    data_a: Optional[str] = None,
+    interpretazione: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
-    Lista email con filtri e paginazione.
+    Lista email con filtri e paginazione a cursore.
 
-    - **skip**: Numero email da saltare (paginazione)
+    - **cursor**: next_cursor della pagina precedente (ignora skip)
+    - **skip**: Numero email da saltare (compatibilità, preferire cursor)
     - **limit**: Numero massimo email da restituire
+    - **totale_esatto**: COUNT esatto invece della stima del planner
     - **categoria**: Filtra per categoria
     - **stato**: Filtra per stato
     - **account_type**: Filtra per tipo account (normal/pec)
-    - **search**: Cerca in mittente, oggetto, corpo
+    - **search**: Ricerca full-text in oggetto, mittente e corpo (sintassi web:
+      "frase esatta", -esclusa, OR). I risultati sono ordinati per rilevanza
+      e includono rank e snippet evidenziato
+    - **scuola**, **luogo**: Campi estratti dall'interpretazione (senza maiuscole)
+    - **data_da**, **data_a**: Intervallo sulla data estratta (AAAA-MM-GG, inclusi)
+    - **interpretazione**: JSON che l'interpretazione deve contenere,
+      es. `{"argomento": "RSU"}`
+
+    Restituisce righe EmailSummary; il contenuto completo è in GET /emails/{id}.
     """
-    query = db.query(Email)
+    query = db.query(*EMAIL_SUMMARY_COLUMNS)
 
     # Applica filtri
     if categoria:
@@ -55,39 +112,137 @@ def list_emails(
     if account_type:
         query = query.filter(Email.account_type == account_type)
 
+    try:
+        contiene = json.loads(interpretazione) if interpretazione else None
+    except ValueError:
+        contiene = None
+    if interpretazione and not isinstance(contiene, dict):
+        raise HTTPException(status_code=400, detail="Filtro interpretazione non valido: serve un oggetto JSON")
+
+    filtri = filtro_interpretazione(contiene, scuola=scuola, luogo=luogo, data_da=data_da, data_a=data_a)
+    if filtri:
+        query = query.join(Interpretazione, Interpretazione.email_id == Email.id).filter(*filtri)
+
+    tsquery = None
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Email.mittente.ilike(search_term),
-                Email.oggetto.ilike(search_term),
-                Email.corpo_testo.ilike(search_term)
-            )
-        )
+        # Usa l'indice GIN su search_vector (niente scansione dei corpi)
+        tsquery = func.websearch_to_tsquery('italian', search)
+        query = query.filter(Email.search_vector.op('@@')(tsquery))
 
-    # Conta totale
-    total = query.count()
+    # Totale stimato (o esatto su richiesta)
+    total = count_rows(db, query, totale_esatto)
 
     # Paginazione e ordine
-    emails = query.order_by(desc(Email.data_ricezione)).offset(skip).limit(limit).all()
+    if tsquery is not None:
+        rank = func.ts_rank_cd(Email.search_vector, tsquery).label('rank')
+        snippet = func.ts_headline(
+            'italian', func.left(func.coalesce(Email.corpo, ''), 100000), tsquery, SNIPPET_OPTIONS
+        ).label('snippet')
+        # ts_headline viene calcolato solo per le righe della pagina (dopo ORDER BY/LIMIT)
+        # Ordine per rilevanza: cursore basato su offset
+        emails, next_cursor = offset_cursor_page(
+            query.add_columns(rank, snippet).order_by(desc(rank), desc(Email.data_ricezione), desc(Email.id)),
+            cursor, limit, skip
+        )
+    else:
+        emails, next_cursor = keyset_page(query, [Email.data_ricezione, Email.id], cursor, limit, skip=skip)
 
     return {
         "total": total,
+        "total_esatto": totale_esatto,
         "skip": skip,
         "limit": limit,
+        "next_cursor": next_cursor,
         "emails": emails
     }
 
 
+@router.get("/stats")
+def get_email_stats(giorni: Optional[int] = Query(None, ge=1), db: Session = Depends(get_db)):
+    """
+    Statistiche email per la dashboard, dai contatori giornalieri precalcolati.
+
+    - **giorni**: Limita agli ultimi N giorni (default: tutto lo storico)
+    """
+    oggi = date.today()
+    da = oggi - timedelta(days=giorni - 1) if giorni else None
+
+    email = contatori(db, 'email', da=da)
+    email_oggi = contatori(db, 'email', da=oggi, a=oggi)
+    azioni = contatori(db, 'azione', da=da).get('stato', {})
+    per_account = email.get('account_type', {})
+
+    return {
+        "total_emails": sum(per_account.values()),
+        "emails_today": sum(email_oggi.get('account_type', {}).values()),
+        "pending_actions": sum(azioni.get(stato.name, 0) for stato in (
+            StatoAzione.IN_CODA, StatoAzione.IN_ESECUZIONE, StatoAzione.FALLITA
+        )),
+        "categories_distribution": {
+            EmailCategory[nome].value: count for nome, count in email.get('categoria', {}).items()
+        },
+        "status_distribution": {
+            EmailStatus[nome].value: count for nome, count in email.get('stato', {}).items()
+        },
+        "emails_by_account": {
+            AccountType[nome].value: count for nome, count in per_account.items()
+        },
+    }
+
+
 @router.get("/{email_id}", response_model=EmailResponse)
 def get_email(email_id: int, db: Session = Depends(get_db)):
-    """Recupera dettagli email singola."""
+    """Recupera dettagli email singola, con interpretazione e azioni."""
+    # Interpretazione (uno a uno) in join, azioni in una seconda query
+    email = db.query(Email).options(
+        undefer(Email.corpo),
+        joinedload(Email.interpretazione),
+        selectinload(Email.azioni)
+    ).filter(Email.id == email_id).first()
+
+    if not email:
+        raise HTTPException(status_code=404, detail="Email non trovata")
+
+    risposta = EmailResponse.model_validate(email)
+
+    if email.archiviata_at:
+        # Corpo nell'archivio freddo: reidratato solo nella risposta
+        contenuto = ArchivioFreddo(db).contenuto(email.id) or {}
+        risposta.corpo = contenuto.get('corpo')
+
+    return risposta
+
+
+@router.get("/{email_id}/allegati/{indice}")
+def get_email_attachment(email_id: int, indice: int, db: Session = Depends(get_db)):
+    """
+    Scarica un allegato, dallo storage o dall'archivio freddo.
+
+    - **indice**: Posizione dell'allegato nella lista allegati dell'email
+    """
     email = db.query(Email).filter(Email.id == email_id).first()
 
     if not email:
         raise HTTPException(status_code=404, detail="Email non trovata")
 
-    return email
+    allegati = email.allegati
+    if indice < 0 or indice >= len(allegati):
+        raise HTTPException(status_code=404, detail="Allegato non trovato")
+
+    allegato = allegati[indice]
+    if allegato['path'] and os.path.isfile(allegato['path']):
+        return FileResponse(allegato['path'], filename=allegato['filename'])
+
+    archiviato = ArchivioFreddo(db).allegato(email.id, indice) if email.archiviata_at else None
+    if archiviato is None:
+        raise HTTPException(status_code=404, detail="Allegato non disponibile")
+
+    nome, dati = archiviato
+    return Response(
+        content=dati,
+        media_type=mimetypes.guess_type(nome)[0] or 'application/octet-stream',
+        headers={'Content-Disposition': f"attachment; filename*=utf-8''{quote(nome)}"}
+    )
 
 
 @router.put("/{email_id}")
@@ -175,28 +330,49 @@ def reprocess_email(email_id: int, db: Session = Depends(get_db)):
     """
     Riprocessa email (ricategorizza e reinterpreta).
 
-    Utile se il LLM ha fatto errori o se sono cambiate le regole.
+    Utile se il LLM ha fatto errori o se sono cambiate le regole. Se il
+    messaggio originale è nel RawStore viene riletto da lì (corpo e
+    allegati riestratti) senza riscaricarlo dal server.
     """
     from app.services.categorizer import EmailCategorizer
     from app.services.interpreter import EmailInterpreter
+    from app.services.email_ingest import EmailNormalClient
+    from app.models.interpretazione import Interpretazione
     from datetime import datetime
 
-    email = db.query(Email).filter(Email.id == email_id).first()
+    email = db.query(Email).options(
+        undefer(Email.corpo),
+        joinedload(Email.interpretazione)
+    ).filter(Email.id == email_id).first()
 
     if not email:
         raise HTTPException(status_code=404, detail="Email non trovata")
 
     try:
+        store = RawStore()
+        riparsata = bool(email.raw_sha256) and store.esiste(email.raw_sha256)
+        corpo = email.corpo
+
+        if riparsata:
+            dati = EmailNormalClient().parse_raw(store.leggi(email.raw_sha256), email.message_id)
+            corpo = dati['corpo']
+            email.allegati_nomi = dati['allegati_nomi']
+            email.allegati_path = dati['allegati_path']
+            if not email.archiviata_at:
+                email.corpo = corpo
+        elif email.archiviata_at:
+            corpo = (ArchivioFreddo(db).contenuto(email.id) or {}).get('corpo')
+
         # Ricategorizza
         categorizer = EmailCategorizer()
         categoria, confidence = categorizer.categorize(
             email.mittente,
             email.oggetto,
-            email.corpo_testo
+            corpo
         )
 
         email.categoria = categoria
-        email.confidence_score = confidence
+        email.categoria_confidence = confidence
 
         # Reinterpreta
         interpreter = EmailInterpreter()
@@ -204,29 +380,33 @@ def reprocess_email(email_id: int, db: Session = Depends(get_db)):
             categoria,
             email.mittente,
             email.oggetto,
-            email.corpo_testo,
-            email.allegati or [],
+            corpo,
+            email.allegati_nomi or [],
             datetime.now().strftime('%Y-%m-%d')
         )
 
         if email.interpretazione:
-            email.interpretazione.dati_estratti = interpretazione_data
+            email.interpretazione.categoria = categoria.value
+            email.interpretazione.interpretazione_json = interpretazione_data
+            email.interpretazione.confidence = confidence
         else:
-            from app.models.interpretazione import Interpretazione
-            interp = Interpretazione(
+            db.add(Interpretazione(
                 email_id=email.id,
-                dati_estratti=interpretazione_data
-            )
-            db.add(interp)
+                categoria=categoria.value,
+                interpretazione_json=interpretazione_data,
+                confidence=confidence,
+                richiede_revisione=(confidence < 0.7)
+            ))
 
         db.commit()
-        db.refresh(email)
 
         return {
             "message": "Email riprocessata",
-            "categoria": email.categoria.value,
-            "confidence": email.confidence_score
+            "categoria": categoria.value,
+            "confidence": confidence,
+            "riparsata": riparsata
         }
 
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"Errore riprocessamento: {str(e)}")
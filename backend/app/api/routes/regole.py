@@ -210,6 +210,37 @@ def test_regola(
         raise HTTPException(status_code=500, detail=f"Errore test regola: {str(e)}")
 
 
+@router.get("/{regola_id}/anteprima")
+def anteprima_regola(
+    regola_id: int,
+    limite: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_db)
+):
+    """
+    Email già ricevute che soddisfano la regola (più recenti prima).
+
+    Non esegue azioni. Le condizioni sui campi estratti
+    (interpretazione.*) sono valutate in SQL sugli indici JSONB.
+    """
+    regola = db.query(Regola).filter(Regola.id == regola_id).first()
+
+    if not regola:
+        raise HTTPException(status_code=404, detail="Regola non trovata")
+
+    try:
+        emails = RulesEngine(db).cerca_email(regola.condizioni, limite)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "regola_id": regola_id,
+        "emails": [
+            {"id": email.id, "oggetto": email.oggetto, "data_ricezione": email.data_ricezione}
+            for email in emails
+        ]
+    }
+
+
 @router.post("/test-conditions")
 def test_conditions(
     email_id: int = Body(...),
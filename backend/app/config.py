@@ -22,6 +22,11 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
     DB_ECHO: bool = False
+    DB_QUERY_BUDGET: int = 0  # Query massime per richiesta API (0 = controllo disattivato)
+    DB_QUERY_BUDGET_STRICT: bool = False  # Oltre il budget: errore invece di warning (test/CI)
+    PARTITION_MONTHS_AHEAD: int = 3  # Partizioni mensili di emails e log_sistema create in anticipo
+    EMAIL_HOT_MONTHS: int = 0  # Mesi di email nelle partizioni attive, le più vecchie vengono staccate (0 = tutte)
+    LOG_RETENTION_MONTHS: int = 6  # Mesi di log_sistema conservati, le partizioni più vecchie vengono eliminate (0 = tutte)
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -51,6 +56,23 @@ class Settings(BaseSettings):
     WEBMAIL_IMAP_PORT: int = 993
     WEBMAIL_IMAP_USER: str
     WEBMAIL_IMAP_PASSWORD: str
+
+    # IMAP per account (bozze); l'account normale usa WEBMAIL_IMAP_* se vuoto
+    EMAIL_NORMAL_IMAP_HOST: str = ""
+    EMAIL_NORMAL_IMAP_PORT: int = 993
+    EMAIL_NORMAL_IMAP_USER: str = ""
+    EMAIL_NORMAL_IMAP_PASSWORD: str = ""
+    EMAIL_PEC_IMAP_HOST: str = ""
+    EMAIL_PEC_IMAP_PORT: int = 993
+    EMAIL_PEC_IMAP_USER: str = ""
+    EMAIL_PEC_IMAP_PASSWORD: str = ""
+
+    # Pool connessioni IMAP (per processo worker)
+    IMAP_TIMEOUT: int = 30  # Timeout socket in secondi
+    IMAP_POOL_MAX_PER_ACCOUNT: int = 4
+    IMAP_POOL_IDLE_TIMEOUT: int = 300  # Chiude connessioni inattive da più di N secondi
+    IMAP_POOL_HEALTHCHECK_INTERVAL: int = 30  # NOOP se inattiva da più di N secondi
+    IMAP_POOL_ACQUIRE_TIMEOUT: int = 30  # Attesa massima per una connessione libera
     
     # LLM
     LLM_PROVIDER: str = "ollama"
@@ -65,22 +87,74 @@ class Settings(BaseSettings):
     GOOGLE_CREDENTIALS_FILE: str = "config/google_credentials.json"
     GOOGLE_TOKEN_FILE: str = "config/google_token.json"
     GOOGLE_CALENDAR_ID: str = "primary"
+    GOOGLE_CALENDAR_SYNC_INTERVAL: int = 300  # Secondi tra due sincronizzazioni incrementali del calendario
+    CALENDAR_WORK_HOURS: str = "09:00-13:00,15:00-18:00"  # Fasce per gli slot liberi (lun-ven)
+    CALENDAR_SLOT_MINUTES: int = 60  # Durata degli appuntamenti proposti nelle bozze
+    CALENDAR_DRAFT_SLOT_DAYS: int = 10  # Giorni in avanti in cui cercare slot liberi per le bozze
+    CALENDAR_DRAFT_MAX_SLOTS: int = 5  # Slot liberi proposti in una bozza
+    CALENDAR_INDEX_TTL: int = 300  # Senza Redis l'indice calendario si ricarica al più ogni N secondi
     GOOGLE_DRIVE_FOLDER_UST: str = ""
     GOOGLE_DRIVE_FOLDER_SNALS: str = ""
+    DRIVE_UPLOAD_CHUNK_SIZE: int = 8 * 1024 * 1024  # Byte per chunk (multiplo di 256 KB)
+    DRIVE_UPLOAD_PARALLELISM: int = 3  # File caricati in parallelo per azione
+    DRIVE_UPLOAD_RETRIES: int = 3  # Retry con backoff per chunk su errori 5xx/429
+    DRIVE_BASE_FOLDER: str = "SNALS Email Attachments"
+    DRIVE_FOLDER_VALIDATE_INTERVAL: int = 86400  # Secondi dopo cui una cartella in cache viene riverificata
+    DRIVE_UPLOAD_DEDUP: bool = True  # Allegati già su Drive collegati con scorciatoia invece di ricaricarli
     
     # Storage
     STORAGE_PATH: str = "storage"
     ATTACHMENTS_PATH: str = "storage/attachments"
     REPOSITORY_PATH: str = "storage/repository"
+    ARCHIVE_PATH: str = "storage/archive"  # Segmenti zstd dell'archivio freddo
+    ARCHIVE_AFTER_DAYS: int = 365  # Età dopo cui corpo e allegati vanno in archivio (0 = mai)
+    ARCHIVE_BATCH_SIZE: int = 200  # Email archiviate per transazione
+    ARCHIVE_SEGMENT_MAX_MB: int = 256  # Dimensione oltre cui si apre un nuovo segmento
+    ARCHIVE_ZSTD_LEVEL: int = 10
+    RAW_STORE_PATH: str = "storage/raw"  # Messaggi RFC 822 originali (zstd, per SHA-256)
+    RAW_STORE_ZSTD_LEVEL: int = 6
     
     # Scheduling
     EMAIL_POLL_INTERVAL: int = 120
     DAILY_SUMMARY_HOUR: int = 18
+    STATS_ROLLUP_DAYS: int = 7  # Giorni di contatori ricalcolati dal rollup notturno
+    STATS_CONSOLIDATION_INTERVAL: int = 300  # Secondi tra i consolidamenti delle variazioni dei trigger
 
     # Email Behavior
     EMAIL_MARK_AS_READ: bool = False  # Se True, marca le email come lette sul server (richiede IMAP)
     EMAIL_DELETE_FROM_SERVER: bool = False  # Se True, elimina le email dal server dopo il download
     EMAIL_FETCH_LIMIT: int = 50  # Numero massimo di email da scaricare per polling
+    EMAIL_INGEST_MODE: str = "pop3"  # "pop3" (polling periodico) o "imap_idle" (push con IMAP IDLE)
+    IMAP_INGEST_FOLDER: str = "INBOX"
+    IMAP_IDLE_TIMEOUT: int = 1740  # Secondi prima di rinnovare IDLE (RFC 2177: meno di 30 minuti)
+    IMAP_IDLE_RECONNECT_DELAY: int = 30  # Attesa massima tra due riconnessioni dopo un errore
+    IMAP_FETCH_CHUNK: int = 50  # Messaggi per UID FETCH (e per commit) nel recupero arretrati
+
+    # Azioni automatiche
+    ACTION_SWEEP_INTERVAL: int = 60  # Secondi tra due passaggi dello sweeper azioni
+    ACTION_SWEEP_BATCH: int = 100  # Numero massimo di azioni reinviate per passaggio
+    ACTION_OUTBOX_GRACE_SECONDS: int = 30  # Attesa prima di reinviare una riga outbox non inviata
+    ACTION_STRAGGLER_AGE: int = 300  # Secondi dopo cui un'azione ancora in coda viene reinviata
+    ACTION_LEASE_SECONDS: int = 1800  # Durata della presa in carico: scaduta, l'azione IN_ESECUZIONE torna in coda
+    ACTION_OUTBOX_RETENTION_DAYS: int = 7  # Giorni di conservazione delle righe outbox inviate
+    ACTION_MAX_ATTEMPTS: int = 5  # Tentativi prima del dead letter (se l'azione non ne specifica altri)
+    ACTION_RETRY_BASE_DELAY: int = 60  # Secondi di attesa dopo il primo fallimento (poi raddoppia)
+    ACTION_RETRY_MAX_DELAY: int = 3600  # Attesa massima tra due tentativi
+    ACTION_RETRY_SCAN_INTERVAL: int = 60  # Secondi tra due scansioni delle azioni da ritentare
+    ACTION_DRAFT_BATCH_SIZE: int = 20  # Bozze in coda dello stesso account salvate in una sola sessione IMAP
+    ACTION_CALENDAR_BATCH_SIZE: int = 50  # Eventi in coda creati con una sola richiesta batch Google
+
+    # Worker pool per integrazione (ACTION_WORKER_POOL: imap, drive, calendar, llm; vuoto = coda default)
+    ACTION_WORKER_POOL: str = ""
+    ACTION_CONCURRENCY_IMAP: int = 4
+    ACTION_CONCURRENCY_DRIVE: int = 2
+    ACTION_CONCURRENCY_CALENDAR: int = 2
+    ACTION_CONCURRENCY_LLM: int = 1
+    # Rate limit Celery per worker pool (es. "30/m"; vuoto = nessun limite)
+    ACTION_RATE_LIMIT_IMAP: str = "60/m"
+    ACTION_RATE_LIMIT_DRIVE: str = "30/m"
+    ACTION_RATE_LIMIT_CALENDAR: str = "60/m"
+    ACTION_RATE_LIMIT_LLM: str = ""
     
     # Security
     SECRET_KEY: str
@@ -90,6 +164,10 @@ class Settings(BaseSettings):
     # Logging
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "logs/app.log"
+    DB_LOG_LEVEL: str = "WARNING"  # Livello minimo dei log salvati in log_sistema ("" = disattivato)
+    DB_LOG_QUEUE_SIZE: int = 10000  # Record in attesa oltre cui i nuovi vengono scartati
+    DB_LOG_BATCH_SIZE: int = 500  # Righe per INSERT
+    DB_LOG_FLUSH_INTERVAL: float = 2.0  # Secondi massimi prima di scrivere un batch parziale
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,222 @@
+"""
+Handler logging asincrono verso log_sistema.
+
+emit() non tocca il database: formatta il record e lo accoda in memoria.
+Un thread di background scrive le righe con un unico INSERT multi-riga
+quando il batch raggiunge DB_LOG_BATCH_SIZE o dopo DB_LOG_FLUSH_INTERVAL
+secondi. Se la coda è piena (database lento o irraggiungibile) i nuovi
+record vengono scartati e contati invece di bloccare richieste e task; il
+numero di scartati viene poi registrato in log_sistema stesso.
+
+Il writer usa un engine dedicato con una sola connessione, ricreato nei
+processi figli dopo un fork (worker Celery prefork).
+"""
+import os
+import sys
+import json
+import queue
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, insert
+
+from app.models.log_sistema import LogSistema, LivelloLog
+from app.config import get_settings
+
+settings = get_settings()
+
+# Lunghezza massima di componente (String(100))
+COMPONENTE_MAX = 100
+
+
+def livello(levelno: int) -> LivelloLog:
+    """Livello logging → LivelloLog (i livelli personalizzati vanno al più vicino inferiore)."""
+    if levelno >= logging.CRITICAL:
+        return LivelloLog.CRITICAL
+    if levelno >= logging.ERROR:
+        return LivelloLog.ERROR
+    if levelno >= logging.WARNING:
+        return LivelloLog.WARNING
+    if levelno >= logging.INFO:
+        return LivelloLog.INFO
+    return LivelloLog.DEBUG
+
+
+class DatabaseLogHandler(logging.Handler):
+    """Handler che scrive i record in log_sistema a batch da un thread di background."""
+
+    def __init__(
+        self,
+        level: int = logging.WARNING,
+        capacity: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 2.0
+    ):
+        """
+        Args:
+            level: Livello minimo dei record salvati
+            capacity: Record in coda oltre cui i nuovi vengono scartati
+            batch_size: Righe per INSERT
+            flush_interval: Secondi massimi di attesa di un batch parziale
+        """
+        super().__init__(level)
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.scritti = 0
+        self.scartati = 0  # Coda piena (aggiornato da emit)
+        self.falliti = 0  # Batch non scritti per errori del database (aggiornato dal writer)
+        self._pid = None
+        self._start()
+
+    def _start(self):
+        """Coda, engine e thread del processo corrente."""
+        self._pid = os.getpid()
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=self.capacity)
+        self._stop = threading.Event()
+        self._engine = create_engine(
+            settings.DATABASE_URL, pool_size=1, max_overflow=0, pool_pre_ping=True
+        )
+        self._segnalati = self.scartati
+        self._thread = threading.Thread(target=self._run, name='db-log-writer', daemon=True)
+        self._thread.start()
+
+    def _after_fork(self):
+        """Nel processo figlio thread e coda del padre non esistono più: si ripartono."""
+        # Le connessioni ereditate restano al padre (non vanno chiuse dal figlio)
+        self._engine.dispose(close=False)
+        self._start()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            if os.getpid() != self._pid:
+                self._after_fork()
+            # I log prodotti dal writer stesso (es. SQLAlchemy) non vengono riaccodati
+            if threading.get_ident() == self._thread.ident:
+                return
+            self._queue.put_nowait(self._riga(record))
+        except queue.Full:
+            self.scartati += 1
+        except Exception:
+            self.handleError(record)
+
+    def _riga(self, record: logging.LogRecord) -> Dict:
+        """Valori della riga log_sistema (calcolati subito: gli argomenti possono cambiare)."""
+        extra = {
+            'modulo': record.module,
+            'funzione': record.funcName,
+            'riga': record.lineno,
+            'processo': record.process,
+            'thread': record.threadName,
+        }
+        if record.exc_info:
+            extra['eccezione'] = (self.formatter or logging.Formatter()).formatException(record.exc_info)
+
+        return {
+            'timestamp': datetime.utcfromtimestamp(record.created),
+            'livello': livello(record.levelno),
+            'componente': record.name[:COMPONENTE_MAX],
+            'messaggio': record.getMessage(),
+            'extra': json.dumps(extra, ensure_ascii=False, default=str),
+        }
+
+    def _run(self):
+        """Raccoglie i record in batch e li scrive fino alla chiusura."""
+        while not self._stop.is_set() or not self._queue.empty():
+            batch = self._raccogli()
+            if batch:
+                self._scrivi(batch)
+
+    def _raccogli(self) -> List[Dict]:
+        """Attende fino a batch_size record o flush_interval secondi."""
+        batch = []
+        scadenza = time.monotonic() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            restante = scadenza - time.monotonic()
+            if restante <= 0 or (self._stop.is_set() and self._queue.empty()):
+                break
+            try:
+                batch.append(self._queue.get(timeout=min(restante, 0.5)))
+            except queue.Empty:
+                continue
+
+        if self.scartati > self._segnalati:
+            batch.append({
+                'timestamp': datetime.utcnow(),
+                'livello': LivelloLog.WARNING,
+                'componente': __name__,
+                'messaggio': f"Scartati {self.scartati - self._segnalati} log: coda piena",
+                'extra': None,
+            })
+            self._segnalati = self.scartati
+
+        return batch
+
+    def _scrivi(self, batch: List[Dict]):
+        """Un INSERT multi-riga per batch; in caso di errore il batch viene scartato."""
+        try:
+            with self._engine.begin() as conn:
+                conn.execute(insert(LogSistema).values(batch))
+            self.scritti += len(batch)
+        except Exception as e:
+            self.falliti += len(batch)
+            # Niente logging qui: il record tornerebbe in questo handler
+            print(f"❌ Scrittura log_sistema fallita ({len(batch)} record scartati): {e}", file=sys.stderr)
+
+    def statistiche(self) -> Dict[str, int]:
+        """Record scritti, scartati (coda piena), falliti (errore database) e in coda nel processo corrente."""
+        return {
+            'scritti': self.scritti,
+            'scartati': self.scartati,
+            'falliti': self.falliti,
+            'in_coda': self._queue.qsize(),
+        }
+
+    def close(self):
+        """Scrive i record rimasti e ferma il thread (chiamato anche da logging.shutdown)."""
+        if os.getpid() == self._pid and self._thread.is_alive():
+            self._stop.set()
+            self._thread.join(timeout=max(self.flush_interval, 1.0) * 2)
+            self._engine.dispose()
+        super().close()
+
+
+_handler: Optional[DatabaseLogHandler] = None
+
+
+def install_db_log_handler(logger: Optional[logging.Logger] = None) -> Optional[DatabaseLogHandler]:
+    """
+    Aggiunge il DatabaseLogHandler (uno per processo) al logger indicato o al root.
+
+    Args:
+        logger: Logger a cui aggiungerlo (default: root)
+
+    Returns:
+        DatabaseLogHandler: Handler installato, None se DB_LOG_LEVEL è vuoto
+    """
+    global _handler
+
+    if not settings.DB_LOG_LEVEL:
+        return None
+
+    if _handler is None:
+        _handler = DatabaseLogHandler(
+            level=logging.getLevelName(settings.DB_LOG_LEVEL.upper()),
+            capacity=settings.DB_LOG_QUEUE_SIZE,
+            batch_size=settings.DB_LOG_BATCH_SIZE,
+            flush_interval=settings.DB_LOG_FLUSH_INTERVAL
+        )
+
+    logger = logger or logging.getLogger()
+    if _handler not in logger.handlers:
+        logger.addHandler(_handler)
+    return _handler
+
+
+def get_db_log_handler() -> Optional[DatabaseLogHandler]:
+    """Handler installato nel processo, se presente."""
+    return _handler
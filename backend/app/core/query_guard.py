@@ -0,0 +1,153 @@
+"""
+Query guard - Conteggio delle query SQL per individuare i problemi N+1.
+
+Ogni statement eseguito dall'engine viene contato nel contesto corrente
+(richiesta API o blocco `query_budget`). Un accesso lazy a una relazione
+dentro un ciclo produce una query per riga: superato il budget il guard
+registra un warning o, in modalità stretta, solleva QueryBudgetExceeded.
+
+Uso nei test:
+
+    with query_budget(3):
+        client.get("/api/emails/1")
+
+Per le richieste API: DB_QUERY_BUDGET > 0 attiva QueryCountMiddleware,
+DB_QUERY_BUDGET_STRICT=true fa fallire la richiesta oltre il budget.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from starlette.responses import JSONResponse
+
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+# Contatore del contesto corrente; una lista perché il valore viene
+# condiviso con i thread del threadpool FastAPI (copia del contesto)
+_query_counter: ContextVar[Optional[List[str]]] = ContextVar('query_counter', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Troppe query SQL nello stesso contesto (probabile N+1)."""
+
+
+@event.listens_for(engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    """Registra lo statement nel contatore attivo, se presente."""
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.append(statement)
+
+
+class QueryCounter:
+    """Statement eseguiti dentro un blocco count_queries."""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """
+    Conta le query eseguite nel blocco.
+
+    Yields:
+        QueryCounter: count e statements, aggiornati durante il blocco
+    """
+    counter = QueryCounter()
+    token = _query_counter.set(counter.statements)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
+
+def check_budget(counter: QueryCounter, max_queries: int, label: str, strict: bool = True):
+    """
+    Verifica che il blocco non abbia superato il budget.
+
+    Raises:
+        QueryBudgetExceeded: Budget superato in modalità stretta
+    """
+    if counter.count <= max_queries:
+        return
+
+    primi = "\n".join(s.split('\n')[0][:120] for s in counter.statements[:max_queries + 2])
+    message = f"{label}: {counter.count} query (budget {max_queries})\n{primi}"
+    if strict:
+        raise QueryBudgetExceeded(message)
+    logger.warning(f"⚠️ {message}")
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "Blocco") -> Iterator[QueryCounter]:
+    """
+    Fallisce se il blocco esegue più di max_queries query.
+
+    Args:
+        max_queries: Numero massimo di query ammesse
+        label: Nome del blocco nel messaggio d'errore
+
+    Raises:
+        QueryBudgetExceeded: Budget superato
+    """
+    with count_queries() as counter:
+        yield counter
+    check_budget(counter, max_queries, label)
+
+
+class QueryCountMiddleware:
+    """
+    Middleware ASGI: conta le query di ogni richiesta HTTP.
+
+    La risposta viene trattenuta finché l'app non ha finito (le query
+    possono avvenire anche durante lo streaming del body): poi riceve
+    l'header X-Query-Count e, in modalità stretta oltre il budget, è
+    sostituita da un errore 500. Pensato per sviluppo e test: le risposte
+    restano in memoria per intero.
+    """
+
+    def __init__(self, app, max_queries: int, strict: bool = False):
+        self.app = app
+        self.max_queries = max_queries
+        self.strict = strict
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        messages = []
+
+        async def buffer(message):
+            messages.append(message)
+
+        with count_queries() as counter:
+            await self.app(scope, receive, buffer)
+
+        try:
+            check_budget(counter, self.max_queries, f"{scope['method']} {scope['path']}", self.strict)
+        except QueryBudgetExceeded as e:
+            logger.error(f"❌ {e}")
+            response = JSONResponse(
+                {'detail': f"Budget query superato: {counter.count} query (budget {self.max_queries})"},
+                status_code=500,
+                headers={'x-query-count': str(counter.count)}
+            )
+            await response(scope, receive, send)
+            return
+
+        for message in messages:
+            if message['type'] == 'http.response.start':
+                message['headers'] = list(message.get('headers', [])) + [
+                    (b'x-query-count', str(counter.count).encode())
+                ]
+            await send(message)
@@ -0,0 +1,210 @@
+"""
+Credenziali e service object Google condivisi per processo.
+
+build() analizza il documento di discovery dell'API a ogni chiamata: i
+service object vengono quindi costruiti una sola volta per processo, dal
+documento statico incluso in google-api-python-client (niente richiesta di
+discovery né cache su file). Le credenziali sono caricate e rinnovate una
+volta sola e condivise da tutti i client.
+
+httplib2.Http non è thread-safe: ogni richiesta usa un AuthorizedHttp
+dedicato al thread corrente, così un solo service (e un solo client) può
+servire tutti i thread di un worker riusando le connessioni.
+"""
+import os
+import logging
+import threading
+from typing import Optional, Dict, Tuple, List
+
+import httplib2
+import google_auth_httplib2
+from google.oauth2.credentials import Credentials
+from google.auth.transport.requests import Request
+from googleapiclient.discovery import build, Resource
+from googleapiclient.http import HttpRequest
+
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_lock = threading.RLock()
+_pid: Optional[int] = None
+_credentials: Dict[Tuple[str, ...], Credentials] = {}
+_services: Dict[Tuple[str, str], Resource] = {}
+_thread_local = threading.local()
+
+
+def _reset_after_fork():
+    """Svuota le cache se il processo è cambiato (fork dei worker Celery)."""
+    global _pid, _thread_local
+
+    if _pid != os.getpid():
+        _credentials.clear()
+        _services.clear()
+        _thread_local = threading.local()
+        _pid = os.getpid()
+
+
+def get_credentials(scopes: List[str]) -> Optional[Credentials]:
+    """
+    Restituisce le credenziali OAuth2 valide per gli scope, rinnovandole se scadute.
+
+    Args:
+        scopes: Scope richiesti
+
+    Returns:
+        Credentials: Credenziali valide, None se serve un'autenticazione interattiva
+    """
+    key = tuple(scopes)
+
+    with _lock:
+        _reset_after_fork()
+        creds = _credentials.get(key)
+
+        if creds is None:
+            creds = _load_credentials(scopes)
+            if creds is None:
+                return None
+
+        if not creds.valid:
+            if creds.expired and creds.refresh_token:
+                creds.refresh(Request())
+                _save_credentials(creds)
+                logger.info("🔄 Token Google rinnovato")
+            else:
+                # In produzione, questo dovrebbe essere gestito diversamente
+                # (es. salvare token in database, usare service account, ecc.)
+                logger.warning("Autenticazione Google richiesta ma non disponibile in modalità automatica")
+                return None
+
+        _credentials[key] = creds
+        return creds
+
+
+def get_service(api: str, version: str, scopes: List[str]) -> Optional[Resource]:
+    """
+    Restituisce il service object dell'API, costruito una sola volta per processo.
+
+    Args:
+        api: Nome API (es. "drive", "calendar")
+        version: Versione API (es. "v3")
+        scopes: Scope richiesti
+
+    Returns:
+        Resource: Service object thread-safe, None se non autenticato
+    """
+    with _lock:
+        _reset_after_fork()
+        service = _services.get((api, version))
+        if service is not None:
+            return service
+
+        creds = get_credentials(scopes)
+        if creds is None:
+            return None
+
+        service = build(
+            api,
+            version,
+            http=google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=60)),
+            requestBuilder=_request_builder(creds, tuple(scopes)),
+            static_discovery=True,
+            cache_discovery=False
+        )
+        _services[(api, version)] = service
+        logger.info(f"✅ Service Google {api} {version} inizializzato")
+        return service
+
+
+def execute_batch(
+    service: Resource,
+    requests: List[HttpRequest],
+    max_requests: int
+) -> List[Tuple[Optional[Dict], Optional[Exception]]]:
+    """
+    Esegue più richieste con l'endpoint batch di Google.
+
+    Le richieste vengono inviate a gruppi di max_requests, ciascun gruppo in
+    un'unica richiesta HTTP; l'esito di ogni richiesta è indipendente.
+
+    Args:
+        service: Service object che ha preparato le richieste
+        requests: Richieste preparate (non eseguite, niente upload)
+        max_requests: Richieste massime per batch ammesse dall'API
+
+    Returns:
+        List[Tuple]: (risposta, errore) per richiesta, nello stesso ordine
+    """
+    results: List[Tuple[Optional[Dict], Optional[Exception]]] = [(None, None)] * len(requests)
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    for start in range(0, len(requests), max_requests):
+        batch = service.new_batch_http_request(callback=callback)
+        for index, request in enumerate(requests[start:start + max_requests], start):
+            batch.add(request, request_id=str(index))
+        batch.execute()
+
+    return results
+
+
+def invalidate(api: Optional[str] = None):
+    """
+    Scarta service e credenziali in cache (es. dopo una revoca del token).
+
+    Args:
+        api: Service da scartare (None = tutti, incluse le credenziali)
+    """
+    with _lock:
+        if api is None:
+            _credentials.clear()
+            _services.clear()
+        else:
+            for key in [k for k in _services if k[0] == api]:
+                del _services[key]
+
+
+def _request_builder(creds: Credentials, key: Tuple[str, ...]):
+    """Costruisce HttpRequest legate all'AuthorizedHttp del thread corrente."""
+    def build_request(http, *args, **kwargs):
+        return HttpRequest(_thread_http(creds, key), *args, **kwargs)
+    return build_request
+
+
+def _thread_http(creds: Credentials, key: Tuple[str, ...]) -> google_auth_httplib2.AuthorizedHttp:
+    """AuthorizedHttp del thread corrente (httplib2.Http non è thread-safe)."""
+    https = getattr(_thread_local, 'https', None)
+    if https is None:
+        https = _thread_local.https = {}
+
+    authorized = https.get(key)
+    if authorized is None or authorized.credentials is not creds:
+        authorized = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=60))
+        https[key] = authorized
+    return authorized
+
+
+def _load_credentials(scopes: List[str]) -> Optional[Credentials]:
+    """Carica le credenziali salvate su file."""
+    if not settings.GOOGLE_CREDENTIALS_FILE or settings.GOOGLE_CREDENTIALS_FILE == "path/to/credentials.json":
+        return None
+
+    try:
+        return Credentials.from_authorized_user_file(settings.GOOGLE_CREDENTIALS_FILE, scopes)
+    except Exception as e:
+        logger.warning(f"Impossibile caricare credenziali salvate: {e}")
+        return None
+
+
+def _save_credentials(creds: Credentials):
+    """Salva le credenziali rinnovate per i prossimi avvii."""
+    if not settings.GOOGLE_CREDENTIALS_FILE:
+        return
+
+    try:
+        with open(settings.GOOGLE_CREDENTIALS_FILE, 'w') as token:
+            token.write(creds.to_json())
+    except OSError as e:
+        logger.warning(f"Impossibile salvare credenziali rinnovate: {e}")
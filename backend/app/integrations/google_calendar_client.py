@@ -3,17 +3,18 @@ Google Calendar Client per gestione eventi calendario.
 
 FASE 6: API Complete per Frontend
 """
+import base64
+import hashlib
 import logging
-from typing import Optional, List, Dict
+import threading
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime, timedelta
 
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
 
 from app.config import get_settings
+from app.integrations.google_auth import get_service, get_credentials, execute_batch
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -21,12 +22,37 @@ logger = logging.getLogger(__name__)
 # Scopes necessari per Google Calendar
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+# Limite consigliato da Google per i batch Calendar
+CALENDAR_BATCH_MAX_REQUESTS = 50
+
+
+def calendar_event_id(key: str) -> str:
+    """
+    Genera un ID evento deterministico da una chiave di idempotenza.
+
+    Google accetta ID scelti dal client (caratteri base32hex, 5-1024):
+    reinviare la stessa creazione restituisce 409 invece di un duplicato.
+
+    Args:
+        key: Chiave univoca dell'evento (es. message-id email e ID azione)
+
+    Returns:
+        str: ID evento valido per Google Calendar
+    """
+    digest = hashlib.sha256(key.encode('utf-8')).digest()[:20]
+    return base64.b32hexencode(digest).decode('ascii').lower().rstrip('=')
+
 
 class GoogleCalendarClient:
     """Client per interagire con Google Calendar API."""
 
     def __init__(self):
-        """Inizializza il client Google Calendar."""
+        """
+        Inizializza il client Google Calendar.
+
+        Il client è thread-safe: usare get_calendar_client() per condividere
+        un'unica istanza nel processo.
+        """
         self.credentials = None
         self.service = None
 
@@ -38,33 +64,12 @@ class GoogleCalendarClient:
             bool: True se autenticazione riuscita
         """
         try:
-            creds = None
-
-            # Carica credenziali salvate se esistono
-            if settings.GOOGLE_CREDENTIALS_FILE and settings.GOOGLE_CREDENTIALS_FILE != "path/to/credentials.json":
-                try:
-                    creds = Credentials.from_authorized_user_file(
-                        settings.GOOGLE_CREDENTIALS_FILE, SCOPES
-                    )
-                except Exception as e:
-                    logger.warning(f"Impossibile caricare credenziali salvate: {e}")
-
-            # Se non ci sono credenziali valide, richiedi autenticazione
-            if not creds or not creds.valid:
-                if creds and creds.expired and creds.refresh_token:
-                    creds.refresh(Request())
-                else:
-                    logger.warning("Autenticazione Google Calendar richiesta ma non disponibile in modalità automatica")
-                    return False
-
-                # Salva credenziali per la prossima volta
-                if settings.GOOGLE_CREDENTIALS_FILE:
-                    with open(settings.GOOGLE_CREDENTIALS_FILE, 'w') as token:
-                        token.write(creds.to_json())
-
-            self.credentials = creds
-            self.service = build('calendar', 'v3', credentials=creds)
-            logger.info("✅ Autenticazione Google Calendar riuscita")
+            # Service e credenziali condivisi da tutti i client del processo
+            self.service = get_service('calendar', 'v3', SCOPES)
+            if not self.service:
+                return False
+
+            self.credentials = get_credentials(SCOPES)
             return True
 
         except Exception as e:
@@ -101,24 +106,7 @@ class GoogleCalendarClient:
                 return None
 
         try:
-            # Prepara date/ore
-            start_dt, end_dt = self._parse_datetime(start_datetime, end_datetime)
-
-            # Costruisci evento
-            event = {
-                'summary': summary,
-                'start': start_dt,
-                'end': end_dt,
-            }
-
-            if location:
-                event['location'] = location
-
-            if description:
-                event['description'] = description
-
-            if attendees:
-                event['attendees'] = [{'email': email} for email in attendees]
+            event = self.build_event_body(summary, start_datetime, end_datetime, location, description, attendees)
 
             # Crea evento
             created_event = self.service.events().insert(
@@ -134,6 +122,101 @@ class GoogleCalendarClient:
             logger.error(f"❌ Errore creazione evento: {e}")
             return None
 
+    def build_event_body(
+        self,
+        summary: str,
+        start_datetime: str,
+        end_datetime: Optional[str] = None,
+        location: Optional[str] = None,
+        description: Optional[str] = None,
+        attendees: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Costruisce il body di un evento (vedi create_event per i parametri).
+
+        Returns:
+            Dict: Evento nel formato Google Calendar
+        """
+        start_dt, end_dt = self._parse_datetime(start_datetime, end_datetime)
+
+        event = {
+            'summary': summary,
+            'start': start_dt,
+            'end': end_dt,
+        }
+
+        if location:
+            event['location'] = location
+
+        if description:
+            event['description'] = description
+
+        if attendees:
+            event['attendees'] = [{'email': email} for email in attendees]
+
+        return event
+
+    def event_insert_request(
+        self,
+        event: Dict,
+        event_id: Optional[str] = None,
+        calendar_id: str = 'primary',
+        send_updates: bool = False
+    ) -> HttpRequest:
+        """
+        Richiesta (non eseguita) di creazione evento, da usare in un batch.
+
+        Args:
+            event: Body evento (build_event_body)
+            event_id: ID scelto dal client per l'idempotenza (opzionale)
+            calendar_id: ID calendario
+            send_updates: Invia gli inviti via email ai partecipanti (default: no)
+
+        Returns:
+            HttpRequest: Richiesta events.insert
+        """
+        body = dict(event)
+        if event_id:
+            body['id'] = event_id
+
+        return self.service.events().insert(
+            calendarId=calendar_id,
+            body=body,
+            sendUpdates='all' if send_updates and body.get('attendees') else 'none'
+        )
+
+    def event_patch_request(
+        self,
+        event_id: str,
+        updates: Dict,
+        calendar_id: str = 'primary'
+    ) -> HttpRequest:
+        """Richiesta (non eseguita) di modifica parziale evento, da usare in un batch."""
+        return self.service.events().patch(
+            calendarId=calendar_id,
+            eventId=event_id,
+            body=updates
+        )
+
+    def execute_batch(self, requests: List[HttpRequest]) -> List[Tuple[Optional[Dict], Optional[Exception]]]:
+        """
+        Esegue più richieste con l'endpoint batch di Google.
+
+        Le richieste vengono inviate a gruppi di CALENDAR_BATCH_MAX_REQUESTS,
+        ciascuno in un'unica richiesta HTTP.
+
+        Args:
+            requests: Richieste preparate (event_insert_request, event_patch_request)
+
+        Returns:
+            List[Tuple]: (risposta, errore) per richiesta, nello stesso ordine
+        """
+        if not self.service:
+            if not self.authenticate():
+                raise ConnectionError("Google Calendar non autenticato")
+
+        return execute_batch(self.service, requests, CALENDAR_BATCH_MAX_REQUESTS)
+
     def list_events(
         self,
         max_results: int = 10,
@@ -183,6 +266,53 @@ class GoogleCalendarClient:
             logger.error(f"❌ Errore recupero eventi: {e}")
             return []
 
+    def list_events_page(
+        self,
+        calendar_id: str = 'primary',
+        sync_token: Optional[str] = None,
+        page_token: Optional[str] = None,
+        page_size: int = 250
+    ) -> Dict:
+        """
+        Recupera una pagina di eventi per la sincronizzazione.
+
+        Senza sync_token restituisce tutti gli eventi (sincronizzazione
+        completa); con sync_token solo quelli modificati da allora, compresi
+        gli eliminati (status "cancelled"). L'ultima pagina contiene
+        nextSyncToken, le altre nextPageToken.
+
+        Args:
+            calendar_id: ID calendario
+            sync_token: Token della sincronizzazione precedente (opzionale)
+            page_token: Token della pagina da recuperare (opzionale)
+            page_size: Eventi per pagina (massimo 2500)
+
+        Returns:
+            Dict: Risposta events.list (items, nextPageToken, nextSyncToken)
+
+        Raises:
+            HttpError: 410 se il sync_token è scaduto (serve una sincronizzazione completa)
+        """
+        if not self.service:
+            if not self.authenticate():
+                raise ConnectionError("Google Calendar non autenticato")
+
+        # syncToken non è compatibile con timeMin/orderBy: i parametri
+        # devono restare identici tra sincronizzazione completa e incrementale
+        params = {
+            'calendarId': calendar_id,
+            'maxResults': page_size,
+            'singleEvents': True,
+        }
+
+        if sync_token:
+            params['syncToken'] = sync_token
+
+        if page_token:
+            params['pageToken'] = page_token
+
+        return self.service.events().list(**params).execute()
+
     def update_event(
         self,
         event_id: str,
@@ -205,22 +335,8 @@ class GoogleCalendarClient:
                 return None
 
         try:
-            # Recupera evento corrente
-            event = self.service.events().get(
-                calendarId=calendar_id,
-                eventId=event_id
-            ).execute()
-
-            # Applica modifiche
-            for key, value in updates.items():
-                event[key] = value
-
-            # Aggiorna evento
-            updated_event = self.service.events().update(
-                calendarId=calendar_id,
-                eventId=event_id,
-                body=event
-            ).execute()
+            # Patch: solo i campi modificati, senza rileggere l'evento
+            updated_event = self.event_patch_request(event_id, updates, calendar_id).execute()
 
             logger.info(f"✅ Evento aggiornato: {event_id}")
             return updated_event
@@ -333,3 +449,17 @@ class GoogleCalendarClient:
         except HttpError as e:
             logger.error(f"❌ Errore recupero calendari: {e}")
             return []
+
+
+_client: Optional[GoogleCalendarClient] = None
+_client_lock = threading.Lock()
+
+
+def get_calendar_client() -> GoogleCalendarClient:
+    """Restituisce il client Google Calendar condiviso dal processo."""
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = GoogleCalendarClient()
+        return _client
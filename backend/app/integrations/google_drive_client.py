@@ -5,17 +5,15 @@ FASE 4: Azioni Automatiche
 """
 import io
 import logging
-from typing import Optional, List, Dict
+import threading
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime
 
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
+from googleapiclient.http import MediaIoBaseUpload, MediaFileUpload, HttpRequest
 from googleapiclient.errors import HttpError
 
 from app.config import get_settings
+from app.integrations.google_auth import get_service, get_credentials, execute_batch
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -23,12 +21,23 @@ logger = logging.getLogger(__name__)
 # Scopes necessari per Google Drive
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
+FOLDER_MIMETYPE = 'application/vnd.google-apps.folder'
+SHORTCUT_MIMETYPE = 'application/vnd.google-apps.shortcut'
+
+# Limite Drive di richieste per batch HTTP
+DRIVE_BATCH_MAX_REQUESTS = 100
+
 
 class GoogleDriveClient:
     """Client per interagire con Google Drive API."""
 
     def __init__(self):
-        """Inizializza il client Google Drive."""
+        """
+        Inizializza il client Google Drive.
+
+        Il client è thread-safe: usare get_drive_client() per condividere
+        un'unica istanza nel processo.
+        """
         self.credentials = None
         self.service = None
 
@@ -40,35 +49,12 @@ class GoogleDriveClient:
             bool: True se autenticazione riuscita
         """
         try:
-            creds = None
-
-            # Carica credenziali salvate se esistono
-            if settings.GOOGLE_CREDENTIALS_FILE and settings.GOOGLE_CREDENTIALS_FILE != "path/to/credentials.json":
-                try:
-                    creds = Credentials.from_authorized_user_file(
-                        settings.GOOGLE_CREDENTIALS_FILE, SCOPES
-                    )
-                except Exception as e:
-                    logger.warning(f"Impossibile caricare credenziali salvate: {e}")
-
-            # Se non ci sono credenziali valide, richiedi autenticazione
-            if not creds or not creds.valid:
-                if creds and creds.expired and creds.refresh_token:
-                    creds.refresh(Request())
-                else:
-                    # In produzione, questo dovrebbe essere gestito diversamente
-                    # (es. salvare token in database, usare service account, ecc.)
-                    logger.warning("Autenticazione Google Drive richiesta ma non disponibile in modalità automatica")
-                    return False
-
-                # Salva credenziali per la prossima volta
-                if settings.GOOGLE_CREDENTIALS_FILE:
-                    with open(settings.GOOGLE_CREDENTIALS_FILE, 'w') as token:
-                        token.write(creds.to_json())
-
-            self.credentials = creds
-            self.service = build('drive', 'v3', credentials=creds)
-            logger.info("✅ Autenticazione Google Drive riuscita")
+            # Service e credenziali condivisi da tutti i client del processo
+            self.service = get_service('drive', 'v3', SCOPES)
+            if not self.service:
+                return False
+
+            self.credentials = get_credentials(SCOPES)
             return True
 
         except Exception as e:
@@ -160,6 +146,117 @@ class GoogleDriveClient:
             logger.error(f"❌ Errore upload file: {e}")
             return None
 
+    def folder_create_request(self, folder_name: str, parent_folder_id: Optional[str] = None) -> HttpRequest:
+        """Richiesta (non eseguita) di creazione cartella, da usare in un batch."""
+        file_metadata = {
+            'name': folder_name,
+            'mimeType': FOLDER_MIMETYPE
+        }
+
+        if parent_folder_id:
+            file_metadata['parents'] = [parent_folder_id]
+
+        return self.service.files().create(body=file_metadata, fields='id')
+
+    def folder_find_request(self, folder_name: str, parent_folder_id: Optional[str] = None) -> HttpRequest:
+        """Richiesta (non eseguita) di ricerca cartella per nome, da usare in un batch."""
+        name = folder_name.replace('\\', '\\\\').replace("'", "\\'")
+        query = f"name='{name}' and mimeType='{FOLDER_MIMETYPE}' and trashed=false"
+
+        if parent_folder_id:
+            query += f" and '{parent_folder_id}' in parents"
+
+        return self.service.files().list(q=query, spaces='drive', fields='files(id, name)', pageSize=1)
+
+    def shortcut_create_request(self, name: str, target_id: str, folder_id: Optional[str] = None) -> HttpRequest:
+        """Richiesta (non eseguita) di creazione scorciatoia a un file esistente, da usare in un batch."""
+        file_metadata = {
+            'name': name,
+            'mimeType': SHORTCUT_MIMETYPE,
+            'shortcutDetails': {'targetId': target_id}
+        }
+
+        if folder_id:
+            file_metadata['parents'] = [folder_id]
+
+        return self.service.files().create(
+            body=file_metadata,
+            fields='id, name, webViewLink, mimeType, shortcutDetails'
+        )
+
+    def execute_batch(self, requests: List[HttpRequest]) -> List[Tuple[Optional[Dict], Optional[HttpError]]]:
+        """
+        Esegue più richieste di metadati con l'endpoint batch di Google.
+
+        Le richieste vengono inviate a gruppi di DRIVE_BATCH_MAX_REQUESTS
+        in un'unica richiesta HTTP per gruppo (gli upload non sono ammessi).
+
+        Args:
+            requests: Richieste preparate con il service (non eseguite)
+
+        Returns:
+            List[Tuple]: (risposta, errore) per richiesta, nello stesso ordine
+        """
+        if not self.service:
+            if not self.authenticate():
+                return [(None, None)] * len(requests)
+
+        return execute_batch(self.service, requests, DRIVE_BATCH_MAX_REQUESTS)
+
+    def resumable_upload_request(
+        self,
+        path: str,
+        filename: str,
+        mimetype: str,
+        folder_id: Optional[str] = None,
+        resumable_uri: Optional[str] = None
+    ) -> Optional[HttpRequest]:
+        """
+        Prepara l'upload resumable di un file letto da disco a chunk.
+
+        La richiesta va eseguita con next_chunk(); il file non viene mai
+        caricato interamente in memoria.
+
+        Args:
+            path: Percorso del file
+            filename: Nome del file su Drive
+            mimetype: MIME type del file
+            folder_id: ID cartella destinazione (opzionale)
+            resumable_uri: Sessione di upload interrotta da riprendere (opzionale)
+
+        Returns:
+            HttpRequest: Richiesta di upload, None se non autenticato
+        """
+        if not self.service:
+            if not self.authenticate():
+                return None
+
+        file_metadata = {'name': filename}
+
+        if folder_id:
+            file_metadata['parents'] = [folder_id]
+
+        media = MediaFileUpload(
+            path,
+            mimetype=mimetype,
+            chunksize=settings.DRIVE_UPLOAD_CHUNK_SIZE,
+            resumable=True
+        )
+
+        request = self.service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id, name, webViewLink, mimeType, size'
+        )
+
+        if resumable_uri:
+            # Al primo next_chunk() il client chiede al server quanti byte ha già
+            # ricevuto (PUT con Content-Range: bytes */size) e riprende da lì
+            request.resumable_uri = resumable_uri
+            request._in_error_state = True
+
+        return request
+
     def upload_attachments(
         self,
         attachments: List[tuple],
@@ -232,3 +329,17 @@ class GoogleDriveClient:
         except HttpError as e:
             logger.error(f"❌ Errore ricerca cartella: {e}")
             return None
+
+
+_client: Optional[GoogleDriveClient] = None
+_client_lock = threading.Lock()
+
+
+def get_drive_client() -> GoogleDriveClient:
+    """Restituisce il client Google Drive condiviso dal processo."""
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = GoogleDriveClient()
+        return _client
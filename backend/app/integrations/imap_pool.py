@@ -0,0 +1,225 @@
+"""
+Pool di connessioni IMAP persistenti per account.
+
+Ogni processo worker mantiene connessioni già autenticate e le riusa tra
+le azioni, evitando handshake TLS e LOGIN a ogni bozza (e i rate limit sui
+login dei provider). Le connessioni inattive vengono verificate con NOOP,
+chiuse dopo IMAP_POOL_IDLE_TIMEOUT e ricreate in caso di errore.
+"""
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from imaplib import IMAP4, IMAP4_SSL
+from typing import Dict, List, Optional, Tuple
+
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+AccountKey = Tuple[str, int, str]
+
+
+def refresh_capabilities(conn: IMAP4):
+    """
+    Rilegge CAPABILITY dopo il login.
+
+    imaplib conserva le capability annunciate prima dell'autenticazione;
+    molti server (es. Dovecot) aggiungono SPECIAL-USE, MULTIAPPEND e IDLE
+    solo dopo il LOGIN.
+    """
+    status, data = conn.capability()
+    if status == 'OK' and data and data[-1]:
+        conn.capabilities = tuple(data[-1].decode('ascii', 'replace').upper().split())
+
+
+@dataclass
+class PooledConnection:
+    """Connessione IMAP autenticata gestita dal pool."""
+    imap: IMAP4
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    broken: bool = False
+
+
+class ImapConnectionPool:
+    """Pool thread-safe di connessioni IMAP, indicizzato per account."""
+
+    def __init__(
+        self,
+        max_per_account: int = 4,
+        idle_timeout: float = 300,
+        health_check_interval: float = 30,
+        acquire_timeout: float = 30
+    ):
+        """
+        Inizializza il pool.
+
+        Args:
+            max_per_account: Connessioni massime aperte per account
+            idle_timeout: Secondi di inattività dopo cui una connessione viene chiusa
+            health_check_interval: Inattività oltre cui verificare la connessione con NOOP
+            acquire_timeout: Attesa massima per una connessione libera
+        """
+        self.max_per_account = max_per_account
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._cond = threading.Condition()
+        self._idle: Dict[AccountKey, List[PooledConnection]] = {}
+        self._open: Dict[AccountKey, int] = {}
+
+    @contextmanager
+    def connection(self, host: str, port: int, user: str, password: str):
+        """
+        Presta una connessione autenticata per la durata del blocco.
+
+        Errori di rete o di protocollo (abort, OSError) marcano la
+        connessione come non riutilizzabile.
+
+        Yields:
+            IMAP4: Connessione IMAP autenticata
+        """
+        key = (host, port, user)
+        pooled = self._acquire(key, password)
+
+        try:
+            yield pooled.imap
+        except (IMAP4.abort, OSError):
+            pooled.broken = True
+            raise
+        finally:
+            self._release(key, pooled)
+
+    def _acquire(self, key: AccountKey, password: str) -> PooledConnection:
+        """Restituisce una connessione sana dal pool o ne apre una nuova."""
+        deadline = time.monotonic() + self.acquire_timeout
+
+        while True:
+            pooled = None
+
+            with self._cond:
+                while True:
+                    idle = self._idle.setdefault(key, [])
+
+                    if idle:
+                        # Resta conteggiata in _open: nessun altro thread può prenderla
+                        pooled = idle.pop()
+                        break
+
+                    if self._open.get(key, 0) < self.max_per_account:
+                        # Riserva lo slot prima di connettersi fuori dal lock
+                        self._open[key] = self._open.get(key, 0) + 1
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"Nessuna connessione IMAP libera per {key[2]}@{key[0]}")
+                    self._cond.wait(remaining)
+
+            if pooled is None:
+                break
+
+            # NOOP fuori dal lock: un server lento non blocca gli altri account
+            if self._is_healthy(pooled):
+                return pooled
+
+            self._close(pooled)
+            with self._cond:
+                self._open[key] = max(self._open.get(key, 1) - 1, 0)
+                self._cond.notify()
+
+        try:
+            return PooledConnection(imap=self._connect(key, password))
+        except Exception:
+            with self._cond:
+                self._open[key] -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, key: AccountKey, pooled: PooledConnection):
+        """Rimette la connessione nel pool o la chiude se non riutilizzabile."""
+        with self._cond:
+            if pooled.broken or pooled.imap.state not in ('AUTH', 'SELECTED'):
+                self._discard(key, pooled)
+            else:
+                pooled.last_used = time.monotonic()
+                self._idle.setdefault(key, []).append(pooled)
+            self._cond.notify()
+
+    def _is_healthy(self, pooled: PooledConnection) -> bool:
+        """Verifica una connessione inattiva (timeout idle e NOOP)."""
+        idle_for = time.monotonic() - pooled.last_used
+
+        if idle_for > self.idle_timeout:
+            return False
+
+        if idle_for > self.health_check_interval:
+            try:
+                status, _ = pooled.imap.noop()
+                return status == 'OK'
+            except Exception as e:
+                logger.debug(f"NOOP IMAP fallito, riconnessione: {e}")
+                return False
+
+        return True
+
+    def _discard(self, key: AccountKey, pooled: PooledConnection):
+        """Chiude una connessione e libera il suo slot (chiamare con il lock)."""
+        self._open[key] = max(self._open.get(key, 1) - 1, 0)
+        self._close(pooled)
+
+    @staticmethod
+    def _close(pooled: PooledConnection):
+        """Chiude la connessione ignorando gli errori (socket già caduto)."""
+        try:
+            pooled.imap.logout()
+        except Exception:
+            pass
+
+    def _connect(self, key: AccountKey, password: str) -> IMAP4:
+        """Apre e autentica una nuova connessione IMAP."""
+        host, port, user = key
+        conn = IMAP4_SSL(host, port, timeout=settings.IMAP_TIMEOUT)
+        conn.login(user, password)
+        refresh_capabilities(conn)
+        logger.info(f"✅ Nuova connessione IMAP nel pool: {user}@{host}")
+        return conn
+
+    def close_all(self):
+        """Chiude tutte le connessioni inattive (es. allo shutdown del worker)."""
+        with self._cond:
+            for key, idle in self._idle.items():
+                while idle:
+                    self._discard(key, idle.pop())
+            self._cond.notify_all()
+
+
+_pool: Optional[ImapConnectionPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def get_imap_pool() -> ImapConnectionPool:
+    """
+    Restituisce il pool IMAP del processo corrente.
+
+    Con il pool prefork di Celery ogni processo figlio crea il proprio
+    pool: le connessioni non vanno mai condivise tra processi.
+    """
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ImapConnectionPool(
+                max_per_account=settings.IMAP_POOL_MAX_PER_ACCOUNT,
+                idle_timeout=settings.IMAP_POOL_IDLE_TIMEOUT,
+                health_check_interval=settings.IMAP_POOL_HEALTHCHECK_INTERVAL,
+                acquire_timeout=settings.IMAP_POOL_ACQUIRE_TIMEOUT
+            )
+            _pool_pid = os.getpid()
+        return _pool
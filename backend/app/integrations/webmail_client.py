@@ -3,18 +3,74 @@ Webmail Client IMAP per salvare bozze email.
 
 FASE 4: Azioni Automatiche
 """
+import re
 import logging
+import threading
 import email
+from dataclasses import dataclass, field
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from imaplib import IMAP4_SSL
-from typing import Optional
+from imaplib import IMAP4, IMAP4_SSL
+from typing import Optional, Callable, Any, Dict, List, Tuple
 
 from app.config import get_settings
+from app.integrations.imap_pool import get_imap_pool, refresh_capabilities
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Nomi comuni della cartella bozze, usati se il server non espone SPECIAL-USE
+DRAFT_FOLDER_NAMES = ['Drafts', 'Bozze', '[Gmail]/Drafts', 'INBOX.Drafts']
+
+# Risposta LIST: (\HasNoChildren \Drafts) "/" "Drafts"
+LIST_RESPONSE_RE = re.compile(r'\((?P<flags>[^)]*)\) (?P<delimiter>"[^"]*"|NIL) (?P<name>.+)')
+
+# Cartella bozze risolta per account (host, user), condivisa nel processo
+_drafts_folder_cache: Dict[Tuple[str, str], str] = {}
+_drafts_folder_lock = threading.Lock()
+
+# UID nella risposta FETCH: b'12 (UID 345 BODY[...] {120}'
+FETCH_UID_RE = re.compile(rb'UID (\d+)')
+
+
+@dataclass
+class DraftIndex:
+    """Intestazioni delle bozze di una cartella, valide per un UIDVALIDITY."""
+    uidvalidity: Optional[int]
+    uidnext: Optional[int] = None
+    entries: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+
+
+# Indice bozze per (host, user, cartella)
+_draft_index_cache: Dict[Tuple[str, str, str], DraftIndex] = {}
+_draft_index_lock = threading.Lock()
+
+
+def imap_account_settings(account_type: str) -> Tuple[str, int, str, str]:
+    """
+    Restituisce host, porta, utente e password IMAP di un account.
+
+    Args:
+        account_type: "pec" oppure account normale ("normal"/"normale")
+
+    Returns:
+        Tuple[str, int, str, str]: Parametri di connessione
+    """
+    if account_type == "pec":
+        return (
+            settings.EMAIL_PEC_IMAP_HOST,
+            settings.EMAIL_PEC_IMAP_PORT,
+            settings.EMAIL_PEC_IMAP_USER,
+            settings.EMAIL_PEC_IMAP_PASSWORD
+        )
+
+    return (
+        settings.EMAIL_NORMAL_IMAP_HOST or settings.WEBMAIL_IMAP_HOST,
+        settings.EMAIL_NORMAL_IMAP_PORT or settings.WEBMAIL_IMAP_PORT,
+        settings.EMAIL_NORMAL_IMAP_USER or settings.WEBMAIL_IMAP_USER,
+        settings.EMAIL_NORMAL_IMAP_PASSWORD or settings.WEBMAIL_IMAP_PASSWORD
+    )
+
 
 class WebmailClient:
     """Client IMAP per gestire bozze email."""
@@ -27,38 +83,189 @@ class WebmailClient:
             account_type: "normal" o "pec"
         """
         self.account_type = account_type
+        self.pool = get_imap_pool()
+
+        self.imap_host, self.imap_port, self.imap_user, self.imap_password = imap_account_settings(account_type)
 
         if account_type == "pec":
-            self.imap_host = settings.EMAIL_PEC_IMAP_HOST
-            self.imap_port = settings.EMAIL_PEC_IMAP_PORT
-            self.imap_user = settings.EMAIL_PEC_IMAP_USER
-            self.imap_password = settings.EMAIL_PEC_IMAP_PASSWORD
             self.smtp_host = settings.EMAIL_PEC_SMTP_HOST
             self.smtp_port = settings.EMAIL_PEC_SMTP_PORT
         else:
-            self.imap_host = settings.EMAIL_NORMAL_IMAP_HOST
-            self.imap_port = settings.EMAIL_NORMAL_IMAP_PORT
-            self.imap_user = settings.EMAIL_NORMAL_IMAP_USER
-            self.imap_password = settings.EMAIL_NORMAL_IMAP_PASSWORD
             self.smtp_host = settings.EMAIL_NORMAL_SMTP_HOST
             self.smtp_port = settings.EMAIL_NORMAL_SMTP_PORT
 
     def connect_imap(self) -> Optional[IMAP4_SSL]:
         """
-        Connette al server IMAP.
+        Connette al server IMAP con una connessione dedicata (fuori dal pool).
 
         Returns:
             IMAP4_SSL: Connessione IMAP
         """
         try:
-            conn = IMAP4_SSL(self.imap_host, self.imap_port)
+            conn = IMAP4_SSL(self.imap_host, self.imap_port, timeout=settings.IMAP_TIMEOUT)
             conn.login(self.imap_user, self.imap_password)
+            refresh_capabilities(conn)
             logger.info(f"✅ Connesso a IMAP {self.account_type}: {self.imap_host}")
             return conn
         except Exception as e:
             logger.error(f"❌ Errore connessione IMAP {self.account_type}: {e}")
             return None
 
+    def _with_connection(self, operation: Callable[[IMAP4], Any]) -> Any:
+        """
+        Esegue un'operazione su una connessione del pool.
+
+        Se una connessione riusata si rivela caduta (abort, errore socket)
+        l'operazione viene ripetuta una volta su una connessione nuova.
+
+        Args:
+            operation: Funzione che riceve la connessione IMAP
+
+        Returns:
+            Any: Risultato dell'operazione
+        """
+        for tentativo in range(2):
+            try:
+                with self.pool.connection(
+                    self.imap_host, self.imap_port, self.imap_user, self.imap_password
+                ) as conn:
+                    return operation(conn)
+            except (IMAP4.abort, OSError) as e:
+                if tentativo:
+                    raise
+                logger.warning(f"⚠️ Connessione IMAP {self.account_type} caduta, riconnessione: {e}")
+
+    def _get_drafts_folder(self, conn: IMAP4) -> str:
+        """
+        Restituisce la cartella bozze dell'account, risolvendola al primo uso.
+
+        Args:
+            conn: Connessione IMAP autenticata
+
+        Returns:
+            str: Nome cartella (nella forma usata dal server, già quotata se serve)
+        """
+        key = (self.imap_host, self.imap_user)
+
+        with _drafts_folder_lock:
+            folder = _drafts_folder_cache.get(key)
+        if folder:
+            return folder
+
+        folder = self._discover_drafts_folder(conn)
+
+        with _drafts_folder_lock:
+            _drafts_folder_cache[key] = folder
+        return folder
+
+    def invalidate_drafts_folder(self):
+        """Invalida la cartella bozze in cache (es. dopo un APPEND fallito)."""
+        with _drafts_folder_lock:
+            _drafts_folder_cache.pop((self.imap_host, self.imap_user), None)
+
+    def _discover_drafts_folder(self, conn: IMAP4) -> str:
+        """
+        Individua la cartella bozze con LIST.
+
+        Usa l'attributo \\Drafts (RFC 6154, SPECIAL-USE) se disponibile,
+        altrimenti cerca i nomi comuni; in ultima istanza INBOX.
+
+        Args:
+            conn: Connessione IMAP autenticata
+
+        Returns:
+            str: Nome cartella bozze
+        """
+        mailboxes = self._list_mailboxes(conn, special_use='SPECIAL-USE' in conn.capabilities)
+
+        for flags, name in mailboxes:
+            if '\\drafts' in flags:
+                logger.info(f"✅ Cartella bozze {self.account_type} (SPECIAL-USE): {name}")
+                return name
+
+        by_name = {name.strip('"').lower(): name for _, name in mailboxes}
+        for candidate in DRAFT_FOLDER_NAMES:
+            if candidate.lower() in by_name:
+                logger.info(f"✅ Cartella bozze {self.account_type}: {by_name[candidate.lower()]}")
+                return by_name[candidate.lower()]
+
+        logger.warning(f"⚠️ Nessuna cartella Drafts trovata per {self.account_type}, uso INBOX")
+        return 'INBOX'
+
+    def _list_mailboxes(self, conn: IMAP4, special_use: bool) -> List[Tuple[str, str]]:
+        """
+        Esegue LIST e restituisce (attributi in minuscolo, nome) per ogni cartella.
+
+        Args:
+            conn: Connessione IMAP autenticata
+            special_use: Usa l'opzione di selezione (SPECIAL-USE) di RFC 6154
+
+        Returns:
+            List[Tuple[str, str]]: Cartelle trovate
+        """
+        if special_use:
+            # imaplib non supporta le opzioni di selezione di LIST
+            typ, dat = conn._simple_command('LIST', '(SPECIAL-USE)', '""', '"*"')
+            status, data = conn._untagged_response(typ, dat, 'LIST')
+        else:
+            status, data = conn.list()
+
+        if status != 'OK':
+            return []
+
+        mailboxes = []
+        for item in data:
+            if isinstance(item, tuple):
+                # Nome come literal: (b'(\\Drafts) "/" {6}', b'Drafts')
+                line = item[0].decode(errors='ignore')
+                name = item[1].decode(errors='ignore')
+                match = LIST_RESPONSE_RE.match(line)
+                flags = match.group('flags') if match else ''
+                name = '"' + name.replace('"', '\\"') + '"'
+            elif item:
+                match = LIST_RESPONSE_RE.match(item.decode(errors='ignore'))
+                if not match:
+                    continue
+                # imaplib non quota gli argomenti: il nome resta nella forma ricevuta
+                flags, name = match.group('flags'), match.group('name').strip()
+            else:
+                continue
+
+            mailboxes.append((flags.lower(), name))
+
+        return mailboxes
+
+    def _build_message(
+        self,
+        to: str,
+        subject: str,
+        body: str,
+        cc: Optional[str] = None,
+        bcc: Optional[str] = None,
+        reply_to: Optional[str] = None
+    ) -> bytes:
+        """Costruisce il messaggio MIME di una bozza."""
+        msg = MIMEMultipart('alternative')
+        msg['From'] = self.imap_user
+        msg['To'] = to
+        msg['Subject'] = subject
+
+        if cc:
+            msg['Cc'] = cc
+        if bcc:
+            msg['Bcc'] = bcc
+        if reply_to:
+            msg['In-Reply-To'] = reply_to
+            msg['References'] = reply_to
+
+        # Determina se è HTML o testo
+        if '<html>' in body.lower() or '<p>' in body.lower():
+            msg.attach(MIMEText(body, 'html', 'utf-8'))
+        else:
+            msg.attach(MIMEText(body, 'plain', 'utf-8'))
+
+        return msg.as_string().encode('utf-8')
+
     def save_draft(
         self,
         to: str,
@@ -82,149 +289,313 @@ class WebmailClient:
         Returns:
             bool: True se salvata con successo
         """
-        conn = self.connect_imap()
-        if not conn:
-            return False
+        result = self.save_drafts_batch([{
+            'to': to,
+            'subject': subject,
+            'body': body,
+            'cc': cc,
+            'bcc': bcc,
+            'reply_to': reply_to
+        }])[0]
+
+        if result['success']:
+            logger.info(f"✅ Bozza salvata in {result['folder']}: {subject}")
+        else:
+            logger.error(f"❌ Errore salvataggio bozza: {result['error']}")
 
-        try:
-            # Crea messaggio MIME
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.imap_user
-            msg['To'] = to
-            msg['Subject'] = subject
-
-            if cc:
-                msg['Cc'] = cc
-            if bcc:
-                msg['Bcc'] = bcc
-            if reply_to:
-                msg['In-Reply-To'] = reply_to
-                msg['References'] = reply_to
-
-            # Determina se è HTML o testo
-            if '<html>' in body.lower() or '<p>' in body.lower():
-                msg.attach(MIMEText(body, 'html', 'utf-8'))
-            else:
-                msg.attach(MIMEText(body, 'plain', 'utf-8'))
-
-            # Converti in stringa
-            message_str = msg.as_string()
-
-            # Salva nella cartella Drafts
-            # Nota: Il nome della cartella può variare (Drafts, Bozze, [Gmail]/Drafts, ecc.)
-            draft_folders = ['Drafts', 'Bozze', '[Gmail]/Drafts', 'INBOX.Drafts']
-
-            saved = False
-            for folder in draft_folders:
-                try:
-                    # Seleziona cartella Drafts
-                    status, _ = conn.select(folder)
-
-                    if status == 'OK':
-                        # Append messaggio alla cartella
-                        conn.append(
-                            folder,
-                            '\\Draft',
-                            None,
-                            message_str.encode('utf-8')
-                        )
-                        logger.info(f"✅ Bozza salvata in {folder}: {subject}")
-                        saved = True
-                        break
-                except Exception as e:
-                    logger.debug(f"Cartella {folder} non disponibile: {e}")
-                    continue
+        return result['success']
 
-            if not saved:
-                logger.warning(f"⚠️ Nessuna cartella Drafts trovata. Tentativo salvataggio in INBOX")
-                conn.select('INBOX')
-                conn.append(
-                    'INBOX',
-                    '\\Draft',
-                    None,
-                    message_str.encode('utf-8')
+    def save_drafts_batch(self, drafts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Salva più bozze dello stesso account in una sola sessione IMAP.
+
+        Se il server supporta MULTIAPPEND (RFC 3502) le bozze vengono
+        caricate con un unico comando; altrimenti con APPEND successivi
+        sulla stessa connessione. MULTIAPPEND è atomico: se fallisce si
+        ripiega sugli APPEND singoli per ottenere l'esito di ogni bozza.
+
+        Args:
+            drafts: Lista di dict con to, subject, body e opzionali cc, bcc, reply_to
+
+        Returns:
+            List[Dict]: Esito per bozza, nello stesso ordine
+                (success, folder, multiappend, error)
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(drafts)
+        messages: Dict[int, bytes] = {}
+
+        for index, draft in enumerate(drafts):
+            try:
+                messages[index] = self._build_message(
+                    to=draft['to'],
+                    subject=draft['subject'],
+                    body=draft['body'],
+                    cc=draft.get('cc'),
+                    bcc=draft.get('bcc'),
+                    reply_to=draft.get('reply_to')
                 )
-                logger.info(f"✅ Bozza salvata in INBOX: {subject}")
+            except (KeyError, TypeError, AttributeError) as e:
+                results[index] = {'success': False, 'folder': None, 'multiappend': False,
+                                  'error': f"Bozza non valida: {e}"}
 
-            conn.close()
-            conn.logout()
-            return True
+        def append_pending(conn: IMAP4):
+            # Su riconnessione vengono ricaricate solo le bozze senza esito
+            pending = [i for i in messages if results[i] is None]
+            if pending:
+                self._append_drafts(conn, pending, messages, results)
 
+        try:
+            self._with_connection(append_pending)
         except Exception as e:
-            logger.error(f"❌ Errore salvataggio bozza: {e}")
-            try:
-                conn.close()
-                conn.logout()
-            except:
-                pass
-            return False
+            logger.error(f"❌ Errore salvataggio bozze {self.account_type}: {e}")
 
-    def list_drafts(self, limit: int = 10) -> list:
+        return [
+            result or {'success': False, 'folder': None, 'multiappend': False, 'error': 'Sessione IMAP interrotta'}
+            for result in results
+        ]
+
+    def _append_drafts(
+        self,
+        conn: IMAP4,
+        pending: List[int],
+        messages: Dict[int, bytes],
+        results: List[Optional[Dict[str, Any]]]
+    ):
         """
-        Lista le bozze presenti.
+        Carica le bozze pendenti sulla connessione, registrando l'esito in results.
 
         Args:
-            limit: Numero massimo bozze da recuperare
+            conn: Connessione IMAP autenticata
+            pending: Indici delle bozze da caricare
+            messages: Messaggi per indice
+            results: Esiti per indice (aggiornati sul posto)
+        """
+        folder = self._get_drafts_folder(conn)
+
+        if len(pending) > 1 and 'MULTIAPPEND' in conn.capabilities:
+            status, data = self._multiappend(conn, folder, [messages[i] for i in pending])
+
+            if status == 'OK':
+                for i in pending:
+                    results[i] = {'success': True, 'folder': folder, 'multiappend': True, 'error': None}
+                logger.info(f"✅ {len(pending)} bozze salvate in {folder} con MULTIAPPEND")
+                return
+
+            logger.warning(f"⚠️ MULTIAPPEND in {folder} fallito ({data}), APPEND singoli")
+
+        folder_verified = False
+        for i in pending:
+            status, data = self._append(conn, folder, messages[i])
+
+            if status != 'OK' and not folder_verified:
+                # Cartella rinominata/eliminata: nuova risoluzione e un secondo tentativo
+                logger.warning(f"⚠️ APPEND in {folder} fallito ({data}), nuova ricerca cartella bozze")
+                self.invalidate_drafts_folder()
+                folder = self._get_drafts_folder(conn)
+                status, data = self._append(conn, folder, messages[i])
+
+            folder_verified = folder_verified or status == 'OK'
+            results[i] = {
+                'success': status == 'OK',
+                'folder': folder,
+                'multiappend': False,
+                'error': None if status == 'OK' else f"APPEND in {folder} fallito: {data}"
+            }
+
+    def _append(self, conn: IMAP4, folder: str, message: bytes) -> Tuple[str, list]:
+        """APPEND di una bozza; le risposte NO/BAD diventano esiti, non eccezioni."""
+        try:
+            return conn.append(folder, '\\Draft', None, message)
+        except IMAP4.abort:
+            raise
+        except IMAP4.error as e:
+            return 'BAD', [str(e).encode()]
+
+    def _multiappend(self, conn: IMAP4, folder: str, messages: List[bytes]) -> Tuple[str, list]:
+        """
+        Esegue un MULTIAPPEND (RFC 3502) con literal sincronizzati.
+
+        imaplib gestisce un solo literal per comando; un literal "iteratore"
+        (metodo che riceve ogni continuation) permette di inviare ogni
+        messaggio seguito dai flag e dalla dimensione del successivo.
+
+        Args:
+            conn: Connessione IMAP autenticata
+            folder: Cartella di destinazione
+            messages: Messaggi RFC 822
 
         Returns:
-            list: Lista di dict con info bozze
+            Tuple[str, list]: Stato e dati della risposta taggata
         """
-        conn = self.connect_imap()
-        if not conn:
-            return []
+        literals = _MultiAppendLiterals(messages)
+        conn.literal = literals.next_literal
 
         try:
-            # Cerca cartella Drafts
-            draft_folders = ['Drafts', 'Bozze', '[Gmail]/Drafts', 'INBOX.Drafts']
-
-            for folder in draft_folders:
-                try:
-                    status, _ = conn.select(folder, readonly=True)
-                    if status == 'OK':
-                        break
-                except:
-                    continue
-            else:
-                logger.warning("Nessuna cartella Drafts trovata")
-                return []
+            return conn._simple_command('APPEND', folder, '(\\Draft)', '{%d}' % len(messages[0]))
+        except IMAP4.abort:
+            raise
+        except IMAP4.error as e:
+            return 'BAD', [str(e).encode()]
 
-            # Cerca messaggi con flag \Draft
-            status, messages = conn.search(None, 'ALL')
+    def list_drafts(self, limit: int = 10, before_uid: Optional[int] = None) -> list:
+        """
+        Lista le bozze presenti, dalla più recente.
 
-            if status != 'OK':
-                return []
+        Le intestazioni (To, Subject, Date) sono tenute in un indice per
+        cartella valido finché non cambia UIDVALIDITY: a ogni chiamata un
+        EXAMINE e, solo se sono arrivate bozze nuove, un unico UID FETCH
+        ranged dei soli header. Le bozze eliminate vengono rilevate dal
+        conteggio EXISTS.
 
-            message_ids = messages[0].split()
-            drafts = []
+        Args:
+            limit: Numero massimo bozze da recuperare
+            before_uid: Restituisce solo bozze con UID minore (paginazione)
 
-            # Prendi solo gli ultimi N
-            for msg_id in message_ids[-limit:]:
-                status, msg_data = conn.fetch(msg_id, '(RFC822)')
+        Returns:
+            list: Lista di dict con info bozze (id = UID)
+        """
+        def fetch_drafts(conn: IMAP4) -> list:
+            folder = self._get_drafts_folder(conn)
+            status, data = conn.select(folder, readonly=True)
 
-                if status != 'OK':
-                    continue
+            if status != 'OK':
+                self.invalidate_drafts_folder()
+                logger.warning(f"Cartella bozze {folder} non disponibile")
+                return []
 
-                raw_email = msg_data[0][1]
-                email_message = email.message_from_bytes(raw_email)
+            exists = int(data[0]) if data and data[0] else 0
+            uidvalidity = self._response_int(conn, 'UIDVALIDITY')
+            uidnext = self._response_int(conn, 'UIDNEXT')
 
-                drafts.append({
-                    'id': msg_id.decode(),
-                    'to': email_message.get('To'),
-                    'subject': email_message.get('Subject'),
-                    'date': email_message.get('Date')
-                })
+            index = self._sync_draft_index(conn, folder, exists, uidvalidity, uidnext)
 
-            conn.close()
-            conn.logout()
+            uids = sorted(index.entries, reverse=True)
+            if before_uid is not None:
+                uids = [uid for uid in uids if uid < before_uid]
 
+            drafts = [index.entries[uid] for uid in uids[:limit]]
             logger.info(f"✅ Trovate {len(drafts)} bozze")
             return drafts
 
+        try:
+            return self._with_connection(fetch_drafts)
         except Exception as e:
             logger.error(f"❌ Errore recupero bozze: {e}")
-            try:
-                conn.close()
-                conn.logout()
-            except:
-                pass
             return []
+
+    def _sync_draft_index(
+        self,
+        conn: IMAP4,
+        folder: str,
+        exists: int,
+        uidvalidity: Optional[int],
+        uidnext: Optional[int]
+    ) -> 'DraftIndex':
+        """
+        Allinea l'indice bozze della cartella con lo stato del server.
+
+        Args:
+            conn: Connessione con la cartella bozze selezionata
+            folder: Cartella bozze
+            exists: Messaggi presenti (EXISTS)
+            uidvalidity: UIDVALIDITY della cartella
+            uidnext: UIDNEXT della cartella
+
+        Returns:
+            DraftIndex: Indice aggiornato
+        """
+        key = (self.imap_host, self.imap_user, folder)
+
+        with _draft_index_lock:
+            cached = _draft_index_cache.get(key)
+
+        # Copia di lavoro: l'indice in cache è condiviso tra i thread
+        index = cached and DraftIndex(cached.uidvalidity, cached.uidnext, dict(cached.entries))
+
+        if index is None or uidvalidity is None or index.uidvalidity != uidvalidity:
+            # Prima lettura o UID invalidati dal server: indice da ricostruire
+            index = DraftIndex(uidvalidity=uidvalidity)
+
+        if exists == 0:
+            index.entries.clear()
+        elif uidnext is None or index.uidnext is None or uidnext > index.uidnext:
+            start = index.uidnext or 1
+            index.entries.update(self._fetch_draft_headers(conn, f"{start}:*"))
+
+        if len(index.entries) != exists:
+            # Bozze eliminate (o UIDNEXT non disponibile): si confrontano i soli UID
+            status, data = conn.uid('SEARCH', None, 'ALL')
+            if status == 'OK':
+                presenti = {int(uid) for uid in data[0].split()}
+                for uid in set(index.entries) - presenti:
+                    del index.entries[uid]
+                mancanti = presenti - set(index.entries)
+                if mancanti:
+                    uid_set = ','.join(str(uid) for uid in sorted(mancanti))
+                    index.entries.update(self._fetch_draft_headers(conn, uid_set))
+
+        index.uidnext = uidnext or (max(index.entries) + 1 if index.entries else None)
+
+        with _draft_index_lock:
+            _draft_index_cache[key] = index
+        return index
+
+    def _fetch_draft_headers(self, conn: IMAP4, uid_set: str) -> Dict[int, Dict[str, Any]]:
+        """
+        Scarica con un solo UID FETCH gli header To/Subject/Date delle bozze.
+
+        Args:
+            conn: Connessione con la cartella bozze selezionata
+            uid_set: Insieme UID IMAP (es. "120:*" o "3,7,9")
+
+        Returns:
+            Dict[int, Dict]: Info bozza per UID
+        """
+        status, data = conn.uid('FETCH', uid_set, '(UID BODY.PEEK[HEADER.FIELDS (TO SUBJECT DATE)])')
+
+        if status != 'OK':
+            return {}
+
+        entries = {}
+        for item in data:
+            if not isinstance(item, tuple):
+                continue
+
+            match = FETCH_UID_RE.search(item[0])
+            if not match:
+                continue
+
+            uid = int(match.group(1))
+            headers = email.message_from_bytes(item[1])
+            entries[uid] = {
+                'id': str(uid),
+                'uid': uid,
+                'to': headers.get('To'),
+                'subject': headers.get('Subject'),
+                'date': headers.get('Date')
+            }
+
+        return entries
+
+    @staticmethod
+    def _response_int(conn: IMAP4, code: str) -> Optional[int]:
+        """Legge un codice di risposta numerico (UIDVALIDITY, UIDNEXT) dall'ultimo SELECT."""
+        _, data = conn.response(code)
+        try:
+            return int(data[-1])
+        except (TypeError, ValueError, IndexError):
+            return None
+
+
+class _MultiAppendLiterals:
+    """Literal iteratore per MULTIAPPEND: un messaggio per continuation."""
+
+    def __init__(self, messages: List[bytes]):
+        self.pending = list(messages)
+
+    def next_literal(self, continuation: bytes) -> bytes:
+        """Restituisce il messaggio corrente seguito da flag e dimensione del prossimo."""
+        message = self.pending.pop(0)
+        if self.pending:
+            return message + b' (\\Draft) {%d}' % len(self.pending[0])
+        return message
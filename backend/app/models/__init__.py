@@ -9,6 +9,13 @@ from app.models.evento import EventoCalendario
 from app.models.regola import Regola
 from app.models.utente import Utente, RuoloUtente
 from app.models.log_sistema import LogSistema, LivelloLog
+from app.models.outbox_azione import OutboxAzione
+from app.models.stato_casella import StatoCasella
+from app.models.cartella_drive import CartellaDrive
+from app.models.file_drive import FileDrive
+from app.models.stato_calendario import StatoCalendario
+from app.models.statistica import StatisticaGiornaliera, StatisticaDelta
+from app.models.frammento_archivio import FrammentoArchivio
 
 __all__ = [
     "Email",
@@ -25,4 +32,12 @@ __all__ = [
     "RuoloUtente",
     "LogSistema",
     "LivelloLog",
+    "OutboxAzione",
+    "StatoCasella",
+    "CartellaDrive",
+    "FileDrive",
+    "StatoCalendario",
+    "StatisticaGiornaliera",
+    "StatisticaDelta",
+    "FrammentoArchivio",
 ]
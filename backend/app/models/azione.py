@@ -2,7 +2,7 @@
 Model per azioni eseguite
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, Enum, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -29,6 +29,7 @@ class StatoAzione(enum.Enum):
     COMPLETATA = "completata"
     FALLITA = "fallita"
     ANNULLATA = "annullata"
+    DEAD_LETTER = "dead_letter"
 
 
 class Azione(Base):
@@ -37,7 +38,7 @@ class Azione(Base):
     __tablename__ = "azioni"
     
     id = Column(Integer, primary_key=True, index=True)
-    email_id = Column(Integer, ForeignKey("emails.id"), nullable=False)
+    email_id = Column(Integer, nullable=False, index=True)  # emails è partizionata: niente FK
     
     # Tipo azione
     tipo = Column(Enum(TipoAzione), nullable=False)
@@ -48,12 +49,30 @@ class Azione(Base):
     risultato = Column(JSON)
     errore = Column(Text)
     
+    # Retry
+    tentativi = Column(Integer, default=0)
+    max_tentativi = Column(Integer)  # None = ACTION_MAX_ATTEMPTS
+    prossimo_tentativo = Column(DateTime, index=True)
+    tipo_errore = Column(String(20))  # transitorio / permanente
+    # Scadenza della presa in carico: un worker morto durante l'esecuzione
+    # lascia l'azione IN_ESECUZIONE, lo sweeper la rimette in coda dopo questa data
+    lease_scade = Column(DateTime, index=True)
+    
     # Timestamp
     timestamp_inizio = Column(DateTime, default=datetime.utcnow)
     timestamp_fine = Column(DateTime)
     
     # Relazioni
-    email = relationship("Email", back_populates="azioni")
+    email = relationship("Email", primaryjoin="foreign(Azione.email_id) == Email.id", back_populates="azioni")
+
+    # Paginazione keyset della lista azioni e della dead letter
+    __table_args__ = (
+        Index('ix_azioni_timestamp_inizio_id', 'timestamp_inizio', 'id'),
+        Index(
+            'ix_azioni_dead_letter_timestamp_fine_id', 'timestamp_fine', 'id',
+            postgresql_where=text("stato = 'DEAD_LETTER'")
+        ),
+    )
     
     def __repr__(self):
         return f"<Azione {self.id}: {self.tipo.value}>"
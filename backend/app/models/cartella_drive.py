@@ -0,0 +1,25 @@
+"""
+Model per cache cartelle Google Drive
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+
+from app.database import Base
+
+
+class CartellaDrive(Base):
+    """Percorso cartella Drive risolto nel suo ID"""
+
+    __tablename__ = "cartelle_drive"
+
+    id = Column(Integer, primary_key=True, index=True)
+    percorso = Column(String(1000), unique=True, nullable=False, index=True)
+    folder_id = Column(String(255), nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Ultima verifica dell'esistenza su Drive (validazione lazy)
+    verificata_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<CartellaDrive {self.percorso}: {self.folder_id}>"
@@ -2,8 +2,9 @@
 Model per email ricevute
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, JSON, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Boolean, JSON, Enum, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 import enum
 
@@ -40,12 +41,19 @@ class EmailStatus(enum.Enum):
 
 
 class Email(Base):
-    """Email ricevuta"""
+    """
+    Email ricevuta
+
+    Tabella partizionata per mese su data_ricezione (vedi
+    app/services/partizioni.py): la chiave primaria e i vincoli univoci
+    includono data_ricezione e le altre tabelle non hanno foreign key verso
+    emails, le relazioni ORM restano definite sulle colonne email_id.
+    """
     
     __tablename__ = "emails"
     
-    id = Column(Integer, primary_key=True, index=True)
-    message_id = Column(String(255), unique=True, nullable=False, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    message_id = Column(String(255), nullable=False, index=True)
     
     # Account origine
     account_type = Column(Enum(AccountType), nullable=False)
@@ -54,11 +62,16 @@ class Email(Base):
     mittente = Column(String(255), nullable=False, index=True)
     destinatario = Column(String(255), nullable=False)
     oggetto = Column(String(500))
-    corpo = Column(Text)
+    # Caricato solo quando serve: le liste usano EmailSummary
+    corpo = deferred(Column(Text))
+    # Messaggio originale nel RawStore (SHA-256 del RFC 822 scaricato)
+    raw_sha256 = Column(String(64))
     
     # Timestamp
-    data_ricezione = Column(DateTime, nullable=False, index=True)
+    data_ricezione = Column(DateTime, primary_key=True, index=True)
     data_elaborazione = Column(DateTime)
+    # Corpo e allegati spostati nell'archivio freddo
+    archiviata_at = Column(DateTime)
     
     # Allegati
     allegati_path = Column(JSON)
@@ -71,18 +84,48 @@ class Email(Base):
     # Stato
     stato = Column(Enum(EmailStatus), default=EmailStatus.RICEVUTA, index=True)
     
+    # Ricerca full-text: oggetto (peso A), mittente (B, senza stemming) e corpo
+    # (C, troncato: un tsvector non può superare 1 MB), calcolata dal trigger
+    # trg_emails_search_vector a ogni insert/update. Per le email archiviate
+    # i lessemi del corpo restano quelli calcolati prima dell'archiviazione
+    search_vector = deferred(Column(TSVECTOR))
+
     # Flag speciali
     richiede_revisione = Column(Boolean, default=False)
     revisionata = Column(Boolean, default=False)
     priorita = Column(Integer, default=0)
     
     # Relazioni
-    interpretazione = relationship("Interpretazione", back_populates="email", uselist=False)
-    azioni = relationship("Azione", back_populates="email")
+    interpretazione = relationship(
+        "Interpretazione", primaryjoin="Email.id == foreign(Interpretazione.email_id)",
+        back_populates="email", uselist=False
+    )
+    azioni = relationship(
+        "Azione", primaryjoin="Email.id == foreign(Azione.email_id)", back_populates="email"
+    )
     
     # Metadati
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_emails_search_vector', 'search_vector', postgresql_using='gin'),
+        # Paginazione keyset della lista email
+        Index('ix_emails_data_ricezione_id', 'data_ricezione', 'id'),
+        # Deduplica dell'ingest (la data viene dall'header Date, stabile per messaggio)
+        UniqueConstraint('message_id', 'data_ricezione', name='uq_emails_message_id_data'),
+        {'postgresql_partition_by': 'RANGE (data_ricezione)'},
+    )
+
+    # L'id resta l'identità ORM (sequenza unica su tutte le partizioni)
+    __mapper_args__ = {'primary_key': [id]}
+
+    @property
+    def allegati(self):
+        """Allegati come lista di dict con filename e path"""
+        nomi = self.allegati_nomi or []
+        paths = self.allegati_path or []
+        return [{'filename': nome, 'path': path} for nome, path in zip(nomi, paths)]
+    
     def __repr__(self):
         return f"<Email {self.id}: {self.oggetto[:50] if self.oggetto else 'No subject'}>"
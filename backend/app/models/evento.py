@@ -2,7 +2,7 @@
 Model per eventi calendario
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, Boolean, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -15,7 +15,7 @@ class EventoCalendario(Base):
     __tablename__ = "eventi_calendario"
     
     id = Column(Integer, primary_key=True, index=True)
-    email_id = Column(Integer, ForeignKey("emails.id"))
+    email_id = Column(Integer)  # emails è partizionata: niente FK
     
     # Dettagli evento
     titolo = Column(String(500), nullable=False)
@@ -50,8 +50,15 @@ class EventoCalendario(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relazioni
-    email = relationship("Email")
+    email = relationship("Email", primaryjoin="foreign(EventoCalendario.email_id) == Email.id")
     assegnatario = relationship("Utente", foreign_keys=[assegnatario_id])
+
+    # Chiave per l'upsert degli eventi sincronizzati da Google
+    __table_args__ = (
+        UniqueConstraint('google_calendar_id', 'google_event_id', name='uq_evento_google'),
+        # Paginazione keyset della lista eventi
+        Index('ix_eventi_calendario_data_inizio_id', 'data_inizio', 'id'),
+    )
     
     def __repr__(self):
         return f"<EventoCalendario {self.id}: {self.titolo}>"
@@ -0,0 +1,28 @@
+"""
+Model per file caricati su Google Drive (deduplicazione per contenuto)
+"""
+
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from datetime import datetime
+
+from app.database import Base
+
+
+class FileDrive(Base):
+    """File già presente su Drive, indicizzato per hash del contenuto"""
+
+    __tablename__ = "file_drive"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, nullable=False, index=True)
+    drive_file_id = Column(String(255), nullable=False)
+    nome = Column(String(500))
+    dimensione = Column(BigInteger)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Ultima volta che il file è stato riusato al posto di un nuovo upload
+    ultimo_riuso = Column(DateTime)
+    riusi = Column(Integer, default=0)
+
+    def __repr__(self):
+        return f"<FileDrive {self.sha256[:12]}: {self.drive_file_id}>"
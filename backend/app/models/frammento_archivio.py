@@ -0,0 +1,45 @@
+"""
+Model per indice dell'archivio freddo (segmenti zstd)
+"""
+
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, UniqueConstraint
+from datetime import datetime
+
+from app.database import Base
+
+
+class FrammentoArchivio(Base):
+    """
+    Posizione di un contenuto archiviato in un segmento zstd.
+
+    Ogni email archiviata ha un frammento 'contenuto' (corpo in JSON)
+    e un frammento 'allegato' per file; ogni
+    frammento è un frame zstd indipendente, leggibile con una sola read
+    a offset noto.
+    """
+
+    __tablename__ = "archivio_frammenti"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email_id = Column(Integer, nullable=False, index=True)
+    tipo = Column(String(20), nullable=False)  # contenuto / allegato
+    indice = Column(Integer, nullable=False, default=0)  # Posizione in allegati_nomi
+    nome = Column(String(500))
+
+    # Posizione nel segmento
+    segmento = Column(String(50), nullable=False)
+    offset = Column(BigInteger, nullable=False)
+    lunghezza = Column(Integer, nullable=False)  # Byte compressi
+
+    # Verifica del contenuto decompresso
+    dimensione = Column(BigInteger, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('email_id', 'tipo', 'indice', name='uq_frammento_email'),
+    )
+
+    def __repr__(self):
+        return f"<FrammentoArchivio {self.email_id}/{self.tipo}/{self.indice}: {self.segmento}@{self.offset}>"
@@ -2,7 +2,8 @@
 Model per interpretazione email
 """
 
-from sqlalchemy import Column, Integer, String, Float, Boolean, Text, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, Text, DateTime, ForeignKey, Index, func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -15,11 +16,12 @@ class Interpretazione(Base):
     __tablename__ = "interpretazioni"
     
     id = Column(Integer, primary_key=True, index=True)
-    email_id = Column(Integer, ForeignKey("emails.id"), unique=True, nullable=False)
+    email_id = Column(Integer, unique=True, nullable=False)  # emails è partizionata: niente FK
     
     # Dati interpretazione
     categoria = Column(String(100), nullable=False)
-    interpretazione_json = Column(JSON, nullable=False)
+    # JSONB: filtri sui campi estratti in SQL (vedi services/filtri_interpretazione)
+    interpretazione_json = Column(JSONB, nullable=False)
     
     # Qualità
     confidence = Column(Float)
@@ -35,8 +37,22 @@ class Interpretazione(Base):
     timestamp_revisione = Column(DateTime)
     
     # Relazioni
-    email = relationship("Email", back_populates="interpretazione")
+    email = relationship("Email", primaryjoin="foreign(Interpretazione.email_id) == Email.id", back_populates="interpretazione")
     revisore = relationship("Utente", foreign_keys=[revisore_user_id])
     
+    __table_args__ = (
+        # Contenimento (@>) su qualsiasi campo estratto
+        Index(
+            'ix_interpretazioni_json', 'interpretazione_json',
+            postgresql_using='gin', postgresql_ops={'interpretazione_json': 'jsonb_path_ops'}
+        ),
+    )
+
     def __repr__(self):
         return f"<Interpretazione {self.id}: Email {self.email_id}>"
+
+
+# Campi più filtrati: data (intervalli), scuola e luogo (uguaglianza senza maiuscole)
+Index('ix_interpretazioni_data', Interpretazione.interpretazione_json['data'].astext)
+Index('ix_interpretazioni_scuola', func.lower(Interpretazione.interpretazione_json['scuola'].astext))
+Index('ix_interpretazioni_luogo', func.lower(Interpretazione.interpretazione_json['luogo'].astext))
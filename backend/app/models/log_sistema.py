@@ -19,14 +19,14 @@ class LivelloLog(enum.Enum):
 
 
 class LogSistema(Base):
-    """Log eventi sistema"""
+    """Log eventi sistema (tabella partizionata per mese su timestamp)"""
     
     __tablename__ = "log_sistema"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     
     # Dettagli log
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True, nullable=False)
+    timestamp = Column(DateTime, default=datetime.utcnow, primary_key=True, index=True)
     livello = Column(Enum(LivelloLog), nullable=False, index=True)
     componente = Column(String(100), index=True)
     messaggio = Column(Text, nullable=False)
@@ -37,7 +37,10 @@ class LogSistema(Base):
     # Indice composto per query efficienti
     __table_args__ = (
         Index('idx_log_timestamp_livello', 'timestamp', 'livello'),
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
     )
+
+    __mapper_args__ = {'primary_key': [id]}
     
     def __repr__(self):
         return f"<LogSistema {self.id}: {self.livello.value}>"
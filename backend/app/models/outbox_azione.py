@@ -0,0 +1,45 @@
+"""
+Model per outbox dispatch azioni
+"""
+
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, Index, CheckConstraint, text
+from sqlalchemy.orm import relationship
+from datetime import datetime
+
+from app.database import Base
+
+
+class OutboxAzione(Base):
+    """
+    Richiesta di dispatch verso Celery (transactional outbox).
+
+    Con azione_id accoda l'esecuzione di un'azione; con email_id accoda la
+    creazione delle azioni di un'email appena salvata (bozze generate con
+    l'LLM sul worker pool azioni_llm, non nel processo di ingest).
+    """
+
+    __tablename__ = "outbox_azioni"
+
+    id = Column(Integer, primary_key=True, index=True)
+    azione_id = Column(Integer, ForeignKey("azioni.id", ondelete="CASCADE"), index=True)
+    email_id = Column(Integer)  # Creazione azioni; emails è partizionata: niente FK
+
+    # Stato invio
+    creato_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    inviato_at = Column(DateTime)
+    tentativi_invio = Column(Integer, default=0)
+    ultimo_errore = Column(Text)
+
+    # Relazioni
+    azione = relationship("Azione")
+
+    # Indice parziale: lo sweeper legge solo le righe non ancora inviate
+    __table_args__ = (
+        Index('idx_outbox_non_inviati', 'creato_at', postgresql_where=text('inviato_at IS NULL')),
+        CheckConstraint('(azione_id IS NULL) <> (email_id IS NULL)', name='ck_outbox_azione_o_email'),
+    )
+
+    def __repr__(self):
+        if self.azione_id is None:
+            return f"<OutboxAzione {self.id}: Creazione azioni email {self.email_id}>"
+        return f"<OutboxAzione {self.id}: Azione {self.azione_id}>"
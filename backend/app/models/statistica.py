@@ -0,0 +1,57 @@
+"""
+Model per contatori statistici giornalieri
+"""
+
+from sqlalchemy import Column, BigInteger, Integer, String, Date, UniqueConstraint
+
+from app.database import Base
+
+
+class StatisticaGiornaliera(Base):
+    """
+    Contatore per giorno, entità, dimensione e valore
+    (es. 2026-10-19 / email / categoria / VARIE → 12).
+
+    Consolidato periodicamente dalle variazioni in statistiche_delta,
+    riallineato dal rollup notturno. I valori degli enum sono salvati per
+    nome, come nelle colonne di origine.
+    """
+
+    __tablename__ = "statistiche_giornaliere"
+
+    id = Column(Integer, primary_key=True, index=True)
+    giorno = Column(Date, nullable=False)
+    entita = Column(String(20), nullable=False)  # email / azione
+    dimensione = Column(String(30), nullable=False)  # categoria, stato, account_type, tipo
+    valore = Column(String(50), nullable=False)
+    conteggio = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('giorno', 'entita', 'dimensione', 'valore', name='uq_statistica_bucket'),
+    )
+
+    def __repr__(self):
+        return f"<StatisticaGiornaliera {self.giorno} {self.entita}.{self.dimensione}={self.valore}: {self.conteggio}>"
+
+
+class StatisticaDelta(Base):
+    """
+    Variazione di un contatore giornaliero non ancora consolidata.
+
+    Scritta dai trigger PostgreSQL su emails e azioni a ogni insert, delete
+    e cambio di stato (anche con update bulk). La tabella è append-only:
+    i trigger non aggiornano righe condivise, quindi le transazioni
+    concorrenti non si bloccano (né vanno in deadlock) sui contatori.
+    """
+
+    __tablename__ = "statistiche_delta"
+
+    id = Column(BigInteger, primary_key=True)
+    giorno = Column(Date, nullable=False)
+    entita = Column(String(20), nullable=False)
+    dimensione = Column(String(30), nullable=False)
+    valore = Column(String(50), nullable=False)
+    delta = Column(Integer, nullable=False)  # +1 / -1
+
+    def __repr__(self):
+        return f"<StatisticaDelta {self.giorno} {self.entita}.{self.dimensione}={self.valore}: {self.delta:+d}>"
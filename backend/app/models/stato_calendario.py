@@ -0,0 +1,26 @@
+"""
+Model per stato sincronizzazione calendari Google
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+
+from app.database import Base
+
+
+class StatoCalendario(Base):
+    """syncToken dell'ultima sincronizzazione per calendario Google"""
+
+    __tablename__ = "stato_calendari"
+
+    id = Column(Integer, primary_key=True, index=True)
+    calendar_id = Column(String(255), unique=True, nullable=False, index=True)
+
+    # Token per la sincronizzazione incrementale (None: serve una completa)
+    sync_token = Column(String(500))
+
+    ultima_sincronizzazione = Column(DateTime)
+    ultima_completa = Column(DateTime)
+
+    def __repr__(self):
+        return f"<StatoCalendario {self.calendar_id}>"
@@ -0,0 +1,33 @@
+"""
+Model per stato sincronizzazione caselle IMAP
+"""
+
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Enum, UniqueConstraint
+from datetime import datetime
+
+from app.database import Base
+from app.models.email import AccountType
+
+
+class StatoCasella(Base):
+    """Ultimo UID elaborato per casella IMAP (ingest IDLE)"""
+
+    __tablename__ = "stato_caselle"
+
+    id = Column(Integer, primary_key=True, index=True)
+    account_type = Column(Enum(AccountType), nullable=False)
+    cartella = Column(String(255), nullable=False, default="INBOX")
+
+    # Stato IMAP: gli UID sono validi solo finché UIDVALIDITY non cambia
+    uidvalidity = Column(BigInteger)
+    uidnext = Column(BigInteger)
+    ultimo_uid = Column(BigInteger, default=0)
+
+    aggiornato_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('account_type', 'cartella', name='uq_stato_casella'),
+    )
+
+    def __repr__(self):
+        return f"<StatoCasella {self.account_type.value}/{self.cartella}: UID {self.ultimo_uid}>"
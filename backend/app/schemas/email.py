@@ -7,6 +7,7 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime
 from pydantic import BaseModel, EmailStr
 from app.models.email import EmailCategory, EmailStatus, AccountType
+from app.models.azione import TipoAzione, StatoAzione
 
 
 class EmailBase(BaseModel):
@@ -17,25 +18,82 @@ class EmailBase(BaseModel):
     corpo_testo: Optional[str] = None
 
 
+class InterpretazioneResponse(BaseModel):
+    """Interpretazione LLM nel dettaglio email."""
+    id: int
+    categoria: str
+    interpretazione_json: Dict[str, Any]
+    confidence: Optional[float]
+    richiede_revisione: Optional[bool]
+    revisionata: Optional[bool]
+    timestamp_creazione: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
+class AzioneResponse(BaseModel):
+    """Azione nel dettaglio email."""
+    id: int
+    tipo: TipoAzione
+    stato: Optional[StatoAzione]
+    dettagli: Optional[Dict[str, Any]]
+    risultato: Optional[Dict[str, Any]]
+    errore: Optional[str]
+    tentativi: Optional[int]
+    timestamp_inizio: Optional[datetime]
+    timestamp_fine: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
 class EmailResponse(BaseModel):
     """Schema risposta Email dettagliata."""
     id: int
     message_id: str
+    account_type: AccountType
     mittente: str
     destinatario: Optional[str]
-    oggetto: str
-    corpo_testo: Optional[str]
-    corpo_html: Optional[str]
+    oggetto: Optional[str]
+    corpo: Optional[str]
+    data_ricezione: datetime
+    data_elaborazione: Optional[datetime]
+    archiviata_at: Optional[datetime] = None
+    raw_sha256: Optional[str] = None
+    allegati: List[Dict[str, Any]]
+    categoria: Optional[EmailCategory]
+    categoria_confidence: Optional[float]
+    stato: Optional[EmailStatus]
+    richiede_revisione: Optional[bool]
+    revisionata: Optional[bool]
+    priorita: Optional[int]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    interpretazione: Optional[InterpretazioneResponse] = None
+    azioni: List[AzioneResponse] = []
+
+    class Config:
+        from_attributes = True
+
+
+class EmailSummary(BaseModel):
+    """Schema riga lista email (solo le colonne mostrate nella inbox)."""
+    id: int
+    account_type: AccountType
+    mittente: str
+    oggetto: Optional[str]
+    anteprima: Optional[str]
     data_ricezione: datetime
-    account_type: str
-    categoria: Optional[str]
-    stato: str
-    letto: bool
-    confidence_score: Optional[float]
-    allegati: Optional[List[Dict[str, Any]]]
-    note: Optional[str]
-    interpretazione: Optional[Dict[str, Any]] = None
-    azioni: Optional[List[Dict[str, Any]]] = None
+    categoria: Optional[EmailCategory]
+    stato: Optional[EmailStatus]
+    richiede_revisione: Optional[bool]
+    revisionata: Optional[bool]
+    priorita: Optional[int]
+    numero_allegati: int = 0
+    # Solo nei risultati di ricerca full-text
+    rank: Optional[float] = None
+    snippet: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -44,9 +102,11 @@ class EmailResponse(BaseModel):
 class EmailListResponse(BaseModel):
     """Schema risposta lista email."""
     total: int
+    total_esatto: bool = True
     skip: int
     limit: int
-    emails: List[EmailResponse]
+    next_cursor: Optional[str] = None
+    emails: List[EmailSummary]
 
 
 class EmailUpdateRequest(BaseModel):
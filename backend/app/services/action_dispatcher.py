@@ -0,0 +1,271 @@
+"""
+Action Dispatcher - Invio event-driven delle azioni ai worker Celery.
+
+Le azioni vengono registrate in una tabella outbox nella stessa transazione
+in cui sono create; subito dopo il commit ogni azione viene accodata come
+task Celery dedicato. Allo stesso modo l'ingest registra, insieme alle
+email nuove, la richiesta di crearne le azioni sul worker pool LLM. Il task periodico resta solo come sweeper per le righe
+non inviate (broker irraggiungibile, crash tra commit e invio) e per le
+azioni rimaste in coda troppo a lungo.
+"""
+import logging
+from typing import List, Dict
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import exists, and_, or_
+
+from app.models.azione import Azione, TipoAzione, StatoAzione
+from app.models.outbox_azione import OutboxAzione
+from app.tasks import celery_app
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+EXECUTE_ACTION_TASK = 'app.tasks.action_tasks.execute_action'
+CREATE_ACTIONS_TASK = 'app.tasks.action_tasks.create_actions_for_email'
+
+# Task (e quindi coda/worker pool, vedi task_routes) per tipo di azione
+ACTION_TASKS_BY_TIPO = {
+    TipoAzione.BOZZA_RISPOSTA: 'app.tasks.action_tasks.execute_imap_action',
+    TipoAzione.BOZZA_APPUNTAMENTO: 'app.tasks.action_tasks.execute_imap_action',
+    TipoAzione.BOZZA_TESSERAMENTO: 'app.tasks.action_tasks.execute_imap_action',
+    TipoAzione.INOLTRA: 'app.tasks.action_tasks.execute_imap_action',
+    TipoAzione.NOTIFICA: 'app.tasks.action_tasks.execute_imap_action',
+    TipoAzione.UPLOAD_DRIVE: 'app.tasks.action_tasks.execute_drive_action',
+    TipoAzione.EVENTO_CALENDARIO: 'app.tasks.action_tasks.execute_calendar_action',
+    TipoAzione.SINTESI: 'app.tasks.action_tasks.execute_llm_action',
+}
+
+
+class ActionDispatcher:
+    """Gestisce outbox e invio dei task di esecuzione azioni."""
+
+    def __init__(self, db: Session):
+        """
+        Inizializza il dispatcher.
+
+        Args:
+            db: Sessione database
+        """
+        self.db = db
+
+    def enqueue(self, azioni: List[Azione]) -> List[OutboxAzione]:
+        """
+        Registra le azioni nell'outbox nella transazione corrente.
+
+        Va chiamato prima del commit che salva le azioni, così azione e
+        richiesta di dispatch vengono persistite atomicamente.
+
+        Args:
+            azioni: Azioni appena create (anche non ancora flushate)
+
+        Returns:
+            List[OutboxAzione]: Righe outbox da passare a dispatch() dopo il commit
+        """
+        if not azioni:
+            return []
+
+        # Serve l'id delle azioni per le righe outbox
+        self.db.flush()
+
+        entries = [OutboxAzione(azione_id=azione.id) for azione in azioni]
+        self.db.add_all(entries)
+        return entries
+
+    def enqueue_action_creation(self, email_ids: List[int]) -> List[OutboxAzione]:
+        """
+        Registra nella transazione corrente la creazione azioni delle email.
+
+        Va chiamato prima del commit che salva le email: l'ingest non genera
+        bozze né chiama l'LLM, la creazione avviene sulla coda azioni_llm.
+
+        Args:
+            email_ids: ID delle email appena salvate
+
+        Returns:
+            List[OutboxAzione]: Righe outbox da passare a dispatch() dopo il commit
+        """
+        entries = [OutboxAzione(email_id=email_id) for email_id in email_ids]
+        self.db.add_all(entries)
+        return entries
+
+    def dispatch(self, entries: List[OutboxAzione]) -> int:
+        """
+        Invia i task Celery per le righe outbox e le marca come inviate.
+
+        Le righe il cui invio fallisce restano non inviate e verranno
+        riprese dallo sweeper.
+
+        Args:
+            entries: Righe outbox già committate
+
+        Returns:
+            int: Numero di task inviati
+        """
+        sent = 0
+
+        for entry in entries:
+            try:
+                if entry.azione_id is None:
+                    celery_app.send_task(CREATE_ACTIONS_TASK, args=[entry.email_id])
+                else:
+                    task_name = ACTION_TASKS_BY_TIPO.get(entry.azione.tipo, EXECUTE_ACTION_TASK)
+                    celery_app.send_task(task_name, args=[entry.azione_id])
+                entry.inviato_at = datetime.utcnow()
+                entry.ultimo_errore = None
+                sent += 1
+            except Exception as e:
+                entry.tentativi_invio = (entry.tentativi_invio or 0) + 1
+                entry.ultimo_errore = str(e)
+                logger.warning(f"⚠️ Invio {entry!r} rimandato allo sweeper: {e}")
+
+        self.db.commit()
+        return sent
+
+    def requeue(self, azioni: List[Azione], reset_tentativi: bool = False) -> int:
+        """
+        Rimette in coda azioni fallite o in dead letter e le invia.
+
+        Args:
+            azioni: Azioni da rimettere in coda
+            reset_tentativi: Azzera il contatore tentativi (requeue manuale)
+
+        Returns:
+            int: Numero di task inviati
+        """
+        for azione in azioni:
+            azione.stato = StatoAzione.IN_CODA
+            azione.prossimo_tentativo = None
+            if reset_tentativi:
+                azione.tentativi = 0
+                azione.errore = None
+                azione.tipo_errore = None
+
+        entries = self.enqueue(azioni)
+        self.db.commit()
+        return self.dispatch(entries)
+
+    def sweep(self) -> Dict[str, int]:
+        """
+        Passaggio dello sweeper: reinvia outbox pendenti e azioni bloccate.
+
+        Returns:
+            Dict: Conteggi per outbox reinviati, azioni reinviate, righe eliminate
+        """
+        return {
+            'outbox_reinviati': self.sweep_outbox(),
+            'azioni_reinviate': self.sweep_stragglers(),
+            'lease_scaduti': self.sweep_expired_leases(),
+            'outbox_eliminati': self.purge_sent(),
+        }
+
+    def sweep_outbox(self) -> int:
+        """
+        Reinvia le righe outbox non inviate più vecchie del periodo di grazia.
+
+        Returns:
+            int: Numero di task inviati
+        """
+        soglia = datetime.utcnow() - timedelta(seconds=settings.ACTION_OUTBOX_GRACE_SECONDS)
+
+        entries = self.db.query(OutboxAzione).options(
+            joinedload(OutboxAzione.azione)
+        ).filter(
+            OutboxAzione.inviato_at.is_(None),
+            OutboxAzione.creato_at <= soglia
+        ).order_by(OutboxAzione.creato_at).limit(
+            settings.ACTION_SWEEP_BATCH
+        ).with_for_update(skip_locked=True, of=OutboxAzione).all()
+
+        if not entries:
+            return 0
+
+        logger.info(f"🔄 Reinvio {len(entries)} righe outbox non inviate")
+        return self.dispatch(entries)
+
+    def sweep_stragglers(self) -> int:
+        """
+        Reinvia le azioni rimaste in coda senza un invio recente.
+
+        Copre task persi dal broker e azioni create fuori dall'outbox
+        (es. inserite a mano o da versioni precedenti).
+
+        Returns:
+            int: Numero di task inviati
+        """
+        soglia = datetime.utcnow() - timedelta(seconds=settings.ACTION_STRAGGLER_AGE)
+
+        invio_recente = exists().where(and_(
+            OutboxAzione.azione_id == Azione.id,
+            or_(OutboxAzione.inviato_at.is_(None), OutboxAzione.inviato_at > soglia)
+        ))
+
+        azioni = self.db.query(Azione).filter(
+            Azione.stato == StatoAzione.IN_CODA,
+            Azione.timestamp_inizio <= soglia,
+            ~invio_recente
+        ).order_by(Azione.id).limit(settings.ACTION_SWEEP_BATCH).all()
+
+        if not azioni:
+            return 0
+
+        logger.info(f"🔄 Reinvio {len(azioni)} azioni in coda da oltre {settings.ACTION_STRAGGLER_AGE}s")
+        entries = self.enqueue(azioni)
+        self.db.commit()
+        return self.dispatch(entries)
+
+    def sweep_expired_leases(self) -> int:
+        """
+        Recupera le azioni IN_ESECUZIONE con la presa in carico scaduta.
+
+        Il worker che le eseguiva è morto (crash, kill, OOM) dopo il claim:
+        tornano in coda, o in dead letter se hanno esaurito i tentativi
+        (un'azione che fa cadere il worker non viene ritentata all'infinito).
+
+        Returns:
+            int: Numero di azioni rimesse in coda
+        """
+        azioni = self.db.query(Azione).filter(
+            Azione.stato == StatoAzione.IN_ESECUZIONE,
+            Azione.lease_scade < datetime.utcnow()
+        ).order_by(Azione.id).limit(settings.ACTION_SWEEP_BATCH).with_for_update(skip_locked=True).all()
+
+        if not azioni:
+            return 0
+
+        da_rimettere = []
+        for azione in azioni:
+            azione.lease_scade = None
+            if (azione.tentativi or 0) >= (azione.max_tentativi or settings.ACTION_MAX_ATTEMPTS):
+                azione.stato = StatoAzione.DEAD_LETTER
+                azione.errore = "Esecuzione interrotta (presa in carico scaduta)"
+                azione.timestamp_fine = datetime.utcnow()
+                logger.warning(f"☠️ Azione {azione.id} in dead letter: presa in carico scaduta")
+            else:
+                da_rimettere.append(azione)
+
+        self.db.commit()
+
+        if not da_rimettere:
+            return 0
+
+        logger.warning(f"⚠️ {len(da_rimettere)} azioni con presa in carico scaduta rimesse in coda")
+        return self.requeue(da_rimettere)
+
+    def purge_sent(self) -> int:
+        """
+        Elimina le righe outbox già inviate oltre il periodo di conservazione.
+
+        Returns:
+            int: Numero di righe eliminate
+        """
+        soglia = datetime.utcnow() - timedelta(days=settings.ACTION_OUTBOX_RETENTION_DAYS)
+
+        deleted = self.db.query(OutboxAzione).filter(
+            OutboxAzione.inviato_at.isnot(None),
+            OutboxAzione.inviato_at < soglia
+        ).delete(synchronize_session=False)
+
+        self.db.commit()
+        return deleted
@@ -4,21 +4,54 @@ Action Executor - Esegue azioni automatiche sulle email.
 FASE 4: Azioni Automatiche
 """
 import logging
+from email.utils import parseaddr
 from typing import Optional, Dict, List
-from datetime import datetime
-from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session, undefer, joinedload
+from sqlalchemy import func, or_, and_
+from sqlalchemy.dialects.postgresql import insert
 
 from app.models.azione import Azione, TipoAzione, StatoAzione
 from app.models.email import Email
 from app.models.interpretazione import Interpretazione
+from app.models.evento import EventoCalendario
 from app.integrations.llm_client import LLMClient
-from app.integrations.google_drive_client import GoogleDriveClient
+from app.integrations.google_drive_client import get_drive_client
+from app.integrations.google_calendar_client import get_calendar_client, calendar_event_id
 from app.integrations.webmail_client import WebmailClient
+from app.services.action_dispatcher import ActionDispatcher
+from app.services.drive_uploader import DriveUploader
+from app.services.action_lease import LeaseLostError, lease_filter, rinnova_lease
+from app.services.drive_folders import DriveFolderCache, folder_path
+from app.services.calendar_index import get_calendar_index, track_calendar_changes
+from app.services.archivio import ArchivioFreddo
+from app.services.action_retry import (
+    TransientActionError,
+    PermanentActionError,
+    ERRORE_PERMANENTE,
+    classify_error,
+    compute_next_retry,
+)
 from app.config import get_settings
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+# Formati data/ora estratti dall'LLM per gli eventi
+EVENT_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y')
+EVENT_TIME_FORMATS = ('%H:%M', '%H.%M', '%H:%M:%S')
+
+# Evento già creato con lo stesso ID (tentativo precedente andato a buon fine)
+HTTP_CONFLICT = 409
+
+GIORNI_SETTIMANA = ('lunedì', 'martedì', 'mercoledì', 'giovedì', 'venerdì', 'sabato', 'domenica')
+
+
+def attendee_emails(values: Optional[List[str]]) -> List[str]:
+    """Indirizzi dei partecipanti da header del tipo "Nome <indirizzo>" (vuoti esclusi)."""
+    indirizzi = (parseaddr(value or '')[1] for value in values or [])
+    return [indirizzo for indirizzo in indirizzi if '@' in indirizzo]
+
 
 class ActionExecutor:
     """Esecutore di azioni automatiche sulle email."""
@@ -32,7 +65,10 @@ class ActionExecutor:
         """
         self.db = db
         self.llm_client = LLMClient()
-        self.drive_client = GoogleDriveClient()
+        self.drive_client = get_drive_client()
+        self.dispatcher = ActionDispatcher(db)
+        # Azioni prese in carico da questo executor: {id: tentativi al claim}
+        self._prese: Dict[int, int] = {}
 
     def execute_actions_for_email(self, email_id: int) -> List[Azione]:
         """
@@ -44,7 +80,11 @@ class ActionExecutor:
         Returns:
             List[Azione]: Lista azioni create
         """
-        email = self.db.query(Email).filter(Email.id == email_id).first()
+        # Corpo e interpretazione servono a bozze ed eventi: caricati insieme alla riga
+        email = self.db.query(Email).options(
+            undefer(Email.corpo),
+            joinedload(Email.interpretazione)
+        ).filter(Email.id == email_id).first()
 
         if not email:
             logger.error(f"Email {email_id} non trovata")
@@ -54,6 +94,11 @@ class ActionExecutor:
             logger.warning(f"Email {email_id} non ha interpretazione, skip azioni")
             return []
 
+        # Task riconsegnato dal broker: le azioni esistono già
+        if self.db.query(Azione.id).filter(Azione.email_id == email_id).first():
+            logger.info(f"Azioni per email {email_id} già create, skip")
+            return []
+
         azioni = []
 
         # Determina azioni da eseguire in base alla categoria
@@ -79,15 +124,20 @@ class ActionExecutor:
             if email.allegati:
                 azioni.append(self._upload_attachments_to_drive(email))
 
-        # Salva azioni nel database
+        azioni = [a for a in azioni if a]
+
+        # Salva azioni e righe outbox nella stessa transazione
         for azione in azioni:
-            if azione:
-                self.db.add(azione)
+            self.db.add(azione)
 
+        outbox = self.dispatcher.enqueue(azioni)
         self.db.commit()
 
-        logger.info(f"✅ Create {len([a for a in azioni if a])} azioni per email {email_id}")
-        return [a for a in azioni if a]
+        # Accoda subito l'esecuzione: lo sweeper recupera eventuali invii falliti
+        self.dispatcher.dispatch(outbox)
+
+        logger.info(f"✅ Create {len(azioni)} azioni per email {email_id}")
+        return azioni
 
     def _create_draft_response(self, email: Email) -> Optional[Azione]:
         """
@@ -100,24 +150,28 @@ class ActionExecutor:
             Azione: Azione creata
         """
         try:
-            interpretazione_data = email.interpretazione.dati_estratti if email.interpretazione else {}
+            interpretazione_data = email.interpretazione.interpretazione_json if email.interpretazione else {}
+
+            # Per gli appuntamenti si propongono solo orari liberi in agenda
+            slot_liberi = []
+            if email.categoria.value == 'richiesta_appuntamento':
+                slot_liberi = self._free_slots_for_draft()
 
             # Genera risposta con LLM
-            prompt = self._build_response_prompt(email, interpretazione_data)
+            prompt = self._build_response_prompt(email, interpretazione_data, slot_liberi)
             risposta = self.llm_client.generate(prompt, model_type="generation")
 
             # Crea azione
             azione = Azione(
                 email_id=email.id,
-                tipo_azione=TipoAzione.BOZZA_RISPOSTA,
-                stato=StatoAzione.PENDING,
-                parametri={
+                tipo=TipoAzione.BOZZA_RISPOSTA,
+                stato=StatoAzione.IN_CODA,
+                dettagli={
                     'to': email.mittente,
                     'subject': f"Re: {email.oggetto}",
                     'body': risposta,
                     'reply_to': email.message_id
-                },
-                eseguita_at=None
+                }
             )
 
             logger.info(f"✅ Bozza risposta creata per email {email.id}")
@@ -141,13 +195,13 @@ class ActionExecutor:
             if not email.interpretazione:
                 return None
 
-            dati = email.interpretazione.dati_estratti
+            dati = email.interpretazione.interpretazione_json
 
             # Estrai info evento
             data_evento = dati.get('data_evento') or dati.get('data_convocazione')
             ora_evento = dati.get('ora_evento') or dati.get('ora_convocazione')
             luogo = dati.get('luogo') or dati.get('sede')
-            descrizione = dati.get('descrizione') or email.corpo_testo[:500]
+            descrizione = dati.get('descrizione') or (email.corpo or '')[:500]
 
             if not data_evento:
                 logger.warning(f"Nessuna data evento trovata per email {email.id}")
@@ -156,17 +210,19 @@ class ActionExecutor:
             # Crea azione
             azione = Azione(
                 email_id=email.id,
-                tipo_azione=TipoAzione.CREA_EVENTO_CALENDARIO,
-                stato=StatoAzione.PENDING,
-                parametri={
+                tipo=TipoAzione.EVENTO_CALENDARIO,
+                stato=StatoAzione.IN_CODA,
+                dettagli={
                     'summary': email.oggetto,
                     'date': data_evento,
                     'time': ora_evento,
                     'location': luogo,
                     'description': descrizione,
-                    'attendees': [email.mittente]
-                },
-                eseguita_at=None
+                    # Solo l'indirizzo: Google rifiuta "Nome <indirizzo>"
+                    'attendees': attendee_emails([email.mittente]),
+                    # Nessun invito email al mittente esterno, salvo richiesta esplicita
+                    'invia_inviti': False
+                }
             )
 
             logger.info(f"✅ Evento calendario creato per email {email.id}")
@@ -193,14 +249,13 @@ class ActionExecutor:
             # Crea azione (verrà eseguita dal task)
             azione = Azione(
                 email_id=email.id,
-                tipo_azione=TipoAzione.CARICA_SU_DRIVE,
-                stato=StatoAzione.PENDING,
-                parametri={
+                tipo=TipoAzione.UPLOAD_DRIVE,
+                stato=StatoAzione.IN_CODA,
+                dettagli={
                     'attachments_count': len(email.allegati),
                     'email_subject': email.oggetto,
                     'email_date': email.data_ricezione.isoformat()
-                },
-                eseguita_at=None
+                }
             )
 
             logger.info(f"✅ Azione upload Drive creata per email {email.id}")
@@ -230,118 +285,585 @@ class ActionExecutor:
             logger.info(f"Azione {azione_id} già completata")
             return True
 
-        try:
-            azione.stato = StatoAzione.IN_ESECUZIONE
-            self.db.commit()
+        # Claim atomico: con dispatch event-driven e sweeper la stessa azione
+        # può arrivare a più worker, solo uno deve eseguirla. Le azioni
+        # fallite solo dopo il backoff; il lease permette allo sweeper di
+        # recuperare l'azione se il worker muore durante l'esecuzione
+        now = datetime.utcnow()
+        claimed = self.db.query(Azione).filter(
+            Azione.id == azione_id,
+            or_(
+                Azione.stato == StatoAzione.IN_CODA,
+                and_(
+                    Azione.stato == StatoAzione.FALLITA,
+                    or_(Azione.prossimo_tentativo.is_(None), Azione.prossimo_tentativo <= now)
+                )
+            )
+        ).update(self._claim_values(now), synchronize_session=False)
+        self.db.commit()
+
+        if not claimed:
+            self.db.refresh(azione)
+            logger.info(f"Azione {azione_id} già presa in carico (stato: {azione.stato.value})")
+            return azione.stato == StatoAzione.COMPLETATA
 
+        # Ricarica dopo il claim insieme all'email, usata da tutti gli esecutori
+        azione = self.db.query(Azione).options(joinedload(Azione.email)).populate_existing().filter(
+            Azione.id == azione_id
+        ).one()
+        self._prese[azione.id] = azione.tentativi
+
+        try:
             success = False
 
-            if azione.tipo_azione == TipoAzione.BOZZA_RISPOSTA:
+            if azione.email is None:
+                # Email staccata dalla retention delle partizioni (o eliminata)
+                raise PermanentActionError(f"Email {azione.email_id} non più disponibile")
+
+            if azione.tipo == TipoAzione.BOZZA_RISPOSTA and settings.ACTION_DRAFT_BATCH_SIZE > 1:
+                # Esito già registrato sulle azioni del batch
+                return self._execute_draft_batch(azione)
+
+            elif azione.tipo == TipoAzione.BOZZA_RISPOSTA:
                 success = self._execute_draft_response(azione)
 
-            elif azione.tipo_azione == TipoAzione.CREA_EVENTO_CALENDARIO:
-                success = self._execute_calendar_event(azione)
+            elif azione.tipo == TipoAzione.EVENTO_CALENDARIO:
+                # Esito già registrato sulle azioni del batch
+                return self._execute_calendar_batch(azione)
 
-            elif azione.tipo_azione == TipoAzione.CARICA_SU_DRIVE:
+            elif azione.tipo == TipoAzione.UPLOAD_DRIVE:
                 success = self._execute_drive_upload(azione)
 
+            else:
+                raise PermanentActionError(f"Tipo azione non supportato: {azione.tipo.value}")
+
+            if not self._trattieni_lease([azione]):
+                raise LeaseLostError(f"Presa in carico dell'azione {azione_id} scaduta")
+
             if success:
                 azione.stato = StatoAzione.COMPLETATA
-                azione.eseguita_at = datetime.now()
+                azione.timestamp_fine = datetime.utcnow()
                 azione.errore = None
+                azione.tipo_errore = None
             else:
-                azione.stato = StatoAzione.FALLITA
-                azione.errore = "Esecuzione fallita"
+                self._register_failure(azione, None)
 
             self.db.commit()
             return success
 
+        except LeaseLostError as e:
+            # Rimessa in coda dallo sweeper: l'esito spetta a chi l'ha ripresa
+            logger.warning(f"⚠️ {e}, esito non registrato")
+            self.db.rollback()
+            return False
+
         except Exception as e:
             logger.error(f"❌ Errore esecuzione azione {azione_id}: {e}")
-            azione.stato = StatoAzione.FALLITA
-            azione.errore = str(e)
+            self.db.rollback()
+            if self._trattieni_lease([azione]):
+                self._register_failure(azione, e)
             self.db.commit()
             return False
 
+    def _claim_values(self, now: datetime) -> Dict:
+        """Valori della presa in carico (claim) di un'azione."""
+        return {
+            Azione.stato: StatoAzione.IN_ESECUZIONE,
+            Azione.tentativi: func.coalesce(Azione.tentativi, 0) + 1,
+            Azione.prossimo_tentativo: None,
+            Azione.lease_scade: now + timedelta(seconds=settings.ACTION_LEASE_SECONDS),
+        }
+
+    def _trattieni_lease(self, batch: List[Azione]) -> List[Azione]:
+        """
+        Blocca fino al commit le azioni ancora prese in carico da questo worker.
+
+        Un'azione con il lease scaduto può essere stata rimessa in coda dallo
+        sweeper e ripresa da un altro worker: le sue modifiche non ancora
+        scritte vengono scartate e l'esito non va registrato. Le righe
+        bloccate vengono saltate dallo sweeper fino al commit.
+
+        Args:
+            batch: Azioni di cui registrare l'esito
+
+        Returns:
+            List[Azione]: Azioni su cui registrare l'esito
+        """
+        if not batch:
+            return []
+
+        prese = {item.id: self._prese.get(item.id) for item in batch}
+        valide = {row.id for row in self.db.query(Azione.id).filter(lease_filter(prese)).with_for_update()}
+
+        for item in batch:
+            if item.id not in valide:
+                logger.warning(f"⚠️ Presa in carico dell'azione {item.id} scaduta, esito non registrato")
+                self.db.expire(item)
+        return [item for item in batch if item.id in valide]
+
+    def _rinnova_lease(self, batch: List[Azione]) -> List[Azione]:
+        """
+        Estende il lease del batch prima di una chiamata esterna.
+
+        Returns:
+            List[Azione]: Azioni ancora prese in carico (le altre vanno escluse)
+        """
+        rinnovate = rinnova_lease({item.id: self._prese.get(item.id) for item in batch})
+        return [item for item in batch if item.id in rinnovate]
+
+    def _register_failure(self, azione: Azione, error: Optional[Exception]):
+        """
+        Registra un fallimento e pianifica il retry o il dead letter.
+
+        Args:
+            azione: Azione fallita
+            error: Eccezione sollevata (None se l'handler ha restituito False)
+        """
+        tipo_errore = classify_error(error)
+        max_tentativi = azione.max_tentativi or settings.ACTION_MAX_ATTEMPTS
+
+        azione.errore = str(error) if error else "Esecuzione fallita"
+        azione.tipo_errore = tipo_errore
+        azione.timestamp_fine = datetime.utcnow()
+
+        if tipo_errore == ERRORE_PERMANENTE or (azione.tentativi or 0) >= max_tentativi:
+            azione.stato = StatoAzione.DEAD_LETTER
+            azione.prossimo_tentativo = None
+            logger.warning(
+                f"☠️ Azione {azione.id} in dead letter dopo {azione.tentativi} tentativi "
+                f"(errore {tipo_errore})"
+            )
+        else:
+            azione.stato = StatoAzione.FALLITA
+            azione.prossimo_tentativo = compute_next_retry(azione.tentativi or 1)
+            logger.info(f"Azione {azione.id} ritentata alle {azione.prossimo_tentativo.isoformat()}")
+
     def _execute_draft_response(self, azione: Azione) -> bool:
         """Esegue creazione bozza risposta."""
-        try:
-            params = azione.parametri
-            webmail = WebmailClient(azione.email.account_type.value)
-
-            success = webmail.save_draft(
-                to=params['to'],
-                subject=params['subject'],
-                body=params['body'],
-                reply_to=params.get('reply_to')
-            )
+        params = azione.dettagli
+        webmail = WebmailClient(azione.email.account_type.value)
 
-            if success:
-                azione.risultato = {'status': 'saved', 'location': 'Drafts folder'}
+        success = webmail.save_draft(
+            to=params['to'],
+            subject=params['subject'],
+            body=params['body'],
+            reply_to=params.get('reply_to')
+        )
 
-            return success
+        if not success:
+            raise TransientActionError("Salvataggio bozza IMAP fallito")
 
-        except Exception as e:
-            logger.error(f"Errore salvataggio bozza: {e}")
+        azione.risultato = {'status': 'saved', 'location': 'Drafts folder'}
+        return True
+
+    def _execute_draft_batch(self, azione: Azione) -> bool:
+        """
+        Salva la bozza insieme alle altre bozze in coda dello stesso account.
+
+        Durante un picco di richieste ogni email genera la propria azione
+        BOZZA_RISPOSTA: il worker che ne prende una in carico reclama anche
+        le altre ancora in coda per lo stesso account e le salva in una sola
+        sessione IMAP. I task di quelle azioni trovano poi il claim già fatto
+        e terminano senza lavoro. L'esito viene registrato su ogni azione.
+
+        Args:
+            azione: Azione già presa in carico (IN_ESECUZIONE)
+
+        Returns:
+            bool: True se la bozza dell'azione richiesta è stata salvata
+        """
+        account_type = azione.email.account_type
+        companions = self._claim_companions(azione, settings.ACTION_DRAFT_BATCH_SIZE - 1, account_type)
+        return self._run_with_companions(companions, self._save_draft_batch, azione, companions)
+
+    def _save_draft_batch(self, azione: Azione, companions: List[Azione]) -> bool:
+        """Salva in una sessione IMAP le bozze dell'azione e delle azioni reclamate."""
+        account_type = azione.email.account_type
+        # Il salvataggio IMAP di un batch può durare: lease esteso prima della chiamata
+        batch = self._rinnova_lease([azione] + companions)
+        if not batch:
             return False
 
-    def _execute_calendar_event(self, azione: Azione) -> bool:
-        """Esegue creazione evento calendario."""
+        webmail = WebmailClient(account_type.value)
+        drafts = []
+        for item in batch:
+            params = item.dettagli or {}
+            drafts.append({
+                'to': params.get('to'),
+                'subject': params.get('subject'),
+                'body': params.get('body'),
+                'reply_to': params.get('reply_to')
+            })
+
         try:
-            # Questa parte verrà implementata nella Fase 6 con Google Calendar API
-            # Per ora segniamo come completata e salviamo i parametri
-            azione.risultato = {
-                'status': 'pending_google_calendar_integration',
-                'event_data': azione.parametri
-            }
-            logger.info(f"⚠️ Evento calendario preparato (Google Calendar API da integrare)")
-            return True
+            results = webmail.save_drafts_batch(drafts)
+        except Exception as e:
+            logger.error(f"❌ Errore salvataggio batch bozze: {e}")
+            results = [{'success': False, 'error': str(e)}] * len(batch)
+
+        valide = {item.id for item in self._trattieni_lease(batch)}
+        for item, draft, result in zip(batch, drafts, results):
+            if item.id not in valide:
+                continue
+            if result['success']:
+                item.stato = StatoAzione.COMPLETATA
+                item.timestamp_fine = datetime.utcnow()
+                item.errore = None
+                item.tipo_errore = None
+                item.risultato = {
+                    'status': 'saved',
+                    'location': result['folder'],
+                    'batch_size': len(batch),
+                    'multiappend': result['multiappend']
+                }
+            elif not all(draft[k] for k in ('to', 'subject', 'body')):
+                self._register_failure(item, PermanentActionError("Parametri bozza mancanti"))
+            else:
+                self._register_failure(item, TransientActionError(
+                    result.get('error') or "Salvataggio bozza IMAP fallito"
+                ))
+
+        # Esito dell'azione richiesta, letto prima che il commit scada gli oggetti
+        salvata = batch[0] is azione and azione.id in valide and results[0]['success']
+        self.db.commit()
+
+        salvate = sum(1 for r in results if r['success'])
+        if len(batch) > 1:
+            logger.info(f"✅ Batch bozze {account_type.value}: {salvate}/{len(batch)} salvate")
+
+        return salvata
 
+    def _run_with_companions(self, companions: List[Azione], run, *args) -> bool:
+        """
+        Esegue un batch registrando il fallimento delle azioni reclamate se solleva.
+
+        Le azioni reclamate sono già IN_ESECUZIONE (claim committato): senza
+        questo resterebbero bloccate, mentre il fallimento dell'azione
+        principale viene gestito da execute_action.
+        """
+        try:
+            return run(*args)
         except Exception as e:
-            logger.error(f"Errore creazione evento: {e}")
+            self.db.rollback()
+            for item in self._trattieni_lease(companions):
+                self._register_failure(item, e)
+            self.db.commit()
+            raise
+
+    def _claim_companions(self, azione: Azione, limit: int, account_type=None) -> List[Azione]:
+        """
+        Prende in carico altre azioni in coda dello stesso tipo.
+
+        Args:
+            azione: Azione già presa in carico
+            limit: Numero massimo di azioni aggiuntive
+            account_type: Limita alle email di questo account (opzionale)
+
+        Returns:
+            List[Azione]: Azioni aggiuntive, già IN_ESECUZIONE
+        """
+        if limit <= 0:
+            return []
+
+        # Join con emails: le azioni senza email restano al proprio task (dead letter)
+        query = self.db.query(Azione.id).join(Email, Azione.email_id == Email.id).filter(
+            Azione.id != azione.id,
+            Azione.tipo == azione.tipo,
+            Azione.stato == StatoAzione.IN_CODA
+        )
+        if account_type is not None:
+            query = query.filter(Email.account_type == account_type)
+
+        ids = [row.id for row in query.order_by(Azione.id).limit(limit).with_for_update(
+            skip_locked=True, of=Azione
+        ).all()]
+
+        if not ids:
+            self.db.commit()
+            return []
+
+        self.db.query(Azione).filter(
+            Azione.id.in_(ids),
+            Azione.stato == StatoAzione.IN_CODA
+        ).update(self._claim_values(datetime.utcnow()), synchronize_session=False)
+        self.db.commit()
+
+        companions = self.db.query(Azione).options(joinedload(Azione.email)).filter(
+            Azione.id.in_(ids),
+            Azione.stato == StatoAzione.IN_ESECUZIONE
+        ).order_by(Azione.id).all()
+        for item in companions:
+            self._prese[item.id] = item.tentativi
+        return companions
+
+    def _execute_calendar_batch(self, azione: Azione) -> bool:
+        """
+        Crea l'evento insieme agli altri eventi in coda, con richieste batch.
+
+        Come per le bozze, il worker reclama anche le altre azioni
+        EVENTO_CALENDARIO in coda (es. le convocazioni di inizio anno) e le
+        invia a Google in richieste batch. Ogni evento ha un ID deterministico
+        derivato da email e azione: un retry dopo una risposta persa riceve
+        409 e l'evento esistente viene aggiornato invece di duplicato.
+        L'esito viene registrato su ogni azione e l'evento salvato in
+        eventi_calendario con il suo google_event_id.
+
+        Args:
+            azione: Azione già presa in carico (IN_ESECUZIONE)
+
+        Returns:
+            bool: True se l'evento dell'azione richiesta è stato creato
+        """
+        companions = self._claim_companions(azione, settings.ACTION_CALENDAR_BATCH_SIZE - 1)
+        return self._run_with_companions(companions, self._create_calendar_batch, azione, companions)
+
+    def _create_calendar_batch(self, azione: Azione, companions: List[Azione]) -> bool:
+        """Crea con richieste batch gli eventi dell'azione e delle azioni reclamate."""
+        batch = self._rinnova_lease([azione] + companions)
+        if not batch:
             return False
+        calendar_id = settings.GOOGLE_CALENDAR_ID
+        gcal_client = get_calendar_client()
+
+        eventi = []
+        non_validi = []
+        for item in batch:
+            try:
+                body, locale = self._calendar_event_data(gcal_client, item)
+            except PermanentActionError as e:
+                non_validi.append((item, e))
+                continue
+            event_id = calendar_event_id(f"{item.email.message_id}:{item.id}")
+            eventi.append((item, event_id, body, locale))
+
+        esiti: Dict[int, tuple] = {}
+        try:
+            results = gcal_client.execute_batch([
+                gcal_client.event_insert_request(
+                    body, event_id, calendar_id,
+                    send_updates=bool((item.dettagli or {}).get('invia_inviti'))
+                )
+                for item, event_id, body, _ in eventi
+            ]) if eventi else []
+
+            conflitti = []
+            for evento, (response, error) in zip(eventi, results):
+                if getattr(getattr(error, 'resp', None), 'status', None) == HTTP_CONFLICT:
+                    conflitti.append(evento)
+                else:
+                    esiti[evento[0].id] = ('created', response, error)
+
+            if conflitti:
+                # Creato da un tentativo precedente: allinea l'evento ai dati attuali
+                self._rinnova_lease([evento[0] for evento in conflitti])
+                patch_results = gcal_client.execute_batch([
+                    gcal_client.event_patch_request(event_id, body, calendar_id)
+                    for _, event_id, body, _ in conflitti
+                ])
+                for evento, (response, error) in zip(conflitti, patch_results):
+                    esiti[evento[0].id] = ('updated', response, error)
+
+        except Exception as e:
+            logger.error(f"❌ Errore batch eventi calendario: {e}")
+            for evento in eventi:
+                esiti.setdefault(evento[0].id, ('created', None, e))
+
+        valide = {item.id for item in self._trattieni_lease(batch)}
+        for item, e in non_validi:
+            if item.id in valide:
+                self._register_failure(item, e)
+
+        for item, event_id, body, locale in eventi:
+            if item.id not in valide:
+                continue
+            status, response, error = esiti[item.id]
+
+            if error is not None or not response:
+                self._register_failure(item, error or TransientActionError("Creazione evento fallita"))
+                continue
+
+            row = self.db.execute(self._evento_upsert(locale, calendar_id, event_id, item.email_id)).one()
+            track_calendar_changes(self.db, upserts=[row])
+
+            # Impegni già presenti nello stesso orario (l'evento viene creato comunque)
+            conflitti = get_calendar_index().overlaps(
+                self.db,
+                locale['data_inizio'],
+                locale['data_fine'],
+                assegnatario_id=row.assegnatario_id,
+                escludi_id=row.id
+            )
+            if conflitti:
+                logger.warning(f"⚠️ Evento {row.id} in conflitto con {len(conflitti)} impegni")
+
+            item.stato = StatoAzione.COMPLETATA
+            item.timestamp_fine = datetime.utcnow()
+            item.errore = None
+            item.tipo_errore = None
+            item.risultato = {
+                'status': status,
+                'calendar_id': calendar_id,
+                'event_id': event_id,
+                'html_link': response.get('htmlLink'),
+                'batch_size': len(batch),
+                'conflitti': [evento_id for _, _, evento_id in conflitti]
+            }
+
+        creati = {item.id for item in batch if item.id in valide and item.stato == StatoAzione.COMPLETATA}
+        self.db.commit()
+
+        if len(batch) > 1:
+            logger.info(f"✅ Batch eventi calendario: {len(creati)}/{len(batch)} creati")
+
+        return azione.id in creati
+
+    def _calendar_event_data(self, gcal_client, azione: Azione) -> tuple:
+        """
+        Prepara body Google e campi locali dell'evento di un'azione.
+
+        Returns:
+            tuple: (body per Google Calendar, colonne EventoCalendario)
+
+        Raises:
+            PermanentActionError: Data o ora evento non interpretabili
+        """
+        params = azione.dettagli or {}
+        data = self._parse_formats(params.get('date'), EVENT_DATE_FORMATS)
+        if data is None:
+            raise PermanentActionError(f"Data evento non valida: {params.get('date')}")
+
+        all_day = not params.get('time')
+        if all_day:
+            data_inizio = data
+            data_fine = data + timedelta(days=1)
+        else:
+            ora = self._parse_formats(params['time'], EVENT_TIME_FORMATS)
+            if ora is None:
+                raise PermanentActionError(f"Ora evento non valida: {params.get('time')}")
+            data_inizio = datetime.combine(data.date(), ora.time())
+            data_fine = data_inizio + timedelta(hours=1)
+
+        titolo = params.get('summary') or 'Evento'
+        body = gcal_client.build_event_body(
+            summary=titolo,
+            start_datetime=data_inizio.isoformat(),
+            end_datetime=data_fine.isoformat(),
+            location=params.get('location'),
+            description=params.get('description'),
+            attendees=attendee_emails(params.get('attendees'))
+        )
+        if all_day:
+            body['start'] = {'date': data_inizio.strftime('%Y-%m-%d')}
+            body['end'] = {'date': data_fine.strftime('%Y-%m-%d')}
+
+        locale = {
+            'titolo': titolo[:500],
+            'descrizione': params.get('description'),
+            'data_inizio': data_inizio,
+            # Fine inclusiva per gli eventi di un giorno, come nella sincronizzazione
+            'data_fine': data_fine - timedelta(seconds=1) if all_day else data_fine,
+            'all_day': all_day,
+            'luogo': (params.get('location') or '')[:500] or None,
+        }
+        return body, locale
+
+    def _parse_formats(self, value, formats) -> Optional[datetime]:
+        """Interpreta una stringa con il primo formato compatibile."""
+        for fmt in formats:
+            try:
+                return datetime.strptime(str(value).strip(), fmt)
+            except (TypeError, ValueError):
+                continue
+        return None
+
+    def _evento_upsert(self, locale: Dict, calendar_id: str, event_id: str, email_id: int):
+        """Upsert dell'evento locale sulla chiave Google (idempotente sui retry)."""
+        now = datetime.utcnow()
+        stmt = insert(EventoCalendario).values(
+            **locale,
+            email_id=email_id,
+            google_calendar_id=calendar_id,
+            google_event_id=event_id,
+            sincronizzato=True,
+            created_at=now,
+            updated_at=now
+        )
+        return stmt.on_conflict_do_update(
+            constraint='uq_evento_google',
+            set_={
+                **{column: stmt.excluded[column] for column in locale},
+                'email_id': stmt.excluded.email_id,
+                'sincronizzato': True,
+                'updated_at': now
+            }
+        ).returning(
+            EventoCalendario.id,
+            EventoCalendario.assegnatario_id,
+            EventoCalendario.data_inizio,
+            EventoCalendario.data_fine
+        )
 
     def _execute_drive_upload(self, azione: Azione) -> bool:
-        """Esegue upload allegati su Drive."""
-        try:
-            email = azione.email
+        """
+        Esegue upload allegati su Drive.
 
-            if not email.allegati:
-                return False
-
-            # Prepara allegati per upload
-            attachments = []
-            for allegato in email.allegati:
-                # Qui dovresti caricare il contenuto reale dall'allegato
-                # Per ora usiamo un placeholder
-                attachments.append((
-                    allegato.get('filename', 'unknown'),
-                    b'',  # Contenuto allegato (da implementare storage)
-                    allegato.get('content_type', 'application/octet-stream')
-                ))
+        Gli allegati sono letti dallo storage a chunk e caricati in parallelo;
+        un nuovo tentativo riprende dalla cartella e dalle sessioni di upload
+        salvate in azione.risultato.
+        """
+        email = azione.email
+
+        if not email.allegati:
+            raise PermanentActionError("Email senza allegati")
+
+        if email.archiviata_at:
+            ArchivioFreddo(self.db).ripristina_allegati(email)
+
+        progress = azione.risultato if isinstance(azione.risultato, dict) else {}
+        folder_id = progress.get('folder_id')
 
-            # Upload su Drive
-            base_folder_id = self.drive_client.get_or_create_base_folder()
-            uploaded_files = self.drive_client.upload_attachments(
-                attachments,
-                email.oggetto,
-                base_folder_id
+        if not folder_id:
+            # Cartella per email sotto la cartella base, risolta dalla cache
+            folder_name = f"{email.data_ricezione.strftime('%Y%m%d')}_{(email.oggetto or '')[:50]}"
+            folder_id = DriveFolderCache(self.db, self.drive_client).resolve(
+                folder_path(settings.DRIVE_BASE_FOLDER, folder_name)
             )
 
-            azione.risultato = {
-                'uploaded_files': uploaded_files,
-                'folder_id': base_folder_id
-            }
+        uploader = DriveUploader(self.drive_client, azione.id, self._prese[azione.id], progress)
+        azione.risultato = uploader.upload(email.allegati, folder_id)
 
-            return len(uploaded_files) > 0
+        return True
 
+    def _free_slots_for_draft(self) -> List[tuple]:
+        """Primi slot liberi in agenda da proporre in una bozza di appuntamento."""
+        try:
+            da = datetime.now() + timedelta(days=1)
+            return get_calendar_index().free_slots(
+                self.db,
+                datetime.combine(da.date(), datetime.min.time()),
+                da + timedelta(days=settings.CALENDAR_DRAFT_SLOT_DAYS),
+                timedelta(minutes=settings.CALENDAR_SLOT_MINUTES),
+                limit=settings.CALENDAR_DRAFT_MAX_SLOTS
+            )
         except Exception as e:
-            logger.error(f"Errore upload Drive: {e}")
-            return False
+            logger.warning(f"⚠️ Slot liberi non disponibili per la bozza: {e}")
+            return []
 
-    def _build_response_prompt(self, email: Email, interpretazione: Dict) -> str:
+    def _build_response_prompt(self, email: Email, interpretazione: Dict, slot_liberi: Optional[List[tuple]] = None) -> str:
         """Costruisce prompt per generare risposta."""
 
+        disponibilita = ""
+        istruzione_appuntamento = "Se è una richiesta appuntamento, conferma disponibilità e chiedi eventuali preferenze"
+        if slot_liberi:
+            disponibilita = "\n**Orari liberi in agenda:**\n" + "\n".join(
+                f"- {GIORNI_SETTIMANA[inizio.weekday()]} {inizio:%d/%m/%Y} dalle {inizio:%H:%M} alle {fine:%H:%M}"
+                for inizio, fine in slot_liberi
+            ) + "\n"
+            istruzione_appuntamento = (
+                "Se è una richiesta appuntamento, proponi solo gli orari liberi indicati "
+                "e chiedi quale preferisce"
+            )
+
         prompt = f"""Sei un assistente di una sede sindacale SNALS.
 
 Genera una risposta professionale e cortese per la seguente email:
@@ -349,17 +871,17 @@ Genera una risposta professionale e cortese per la seguente email:
 **Da:** {email.mittente}
 **Oggetto:** {email.oggetto}
 **Corpo:**
-{email.corpo_testo[:1000]}
+{(email.corpo or '')[:1000]}
 
 **Categoria email:** {email.categoria.value}
 
 **Informazioni estratte:**
 {interpretazione}
-
+{disponibilita}
 **Istruzioni:**
 1. Rispondi in modo professionale e cortese
 2. Fai riferimento alle informazioni specifiche nell'email
-3. Se è una richiesta appuntamento, conferma disponibilità e chiedi eventuali preferenze
+3. {istruzione_appuntamento}
 4. Se è richiesta tesseramento, fornisci info su documenti necessari e procedura
 5. Firma come "Segreteria SNALS"
 6. Usa formato HTML con paragrafi ben formattati
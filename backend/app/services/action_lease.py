@@ -0,0 +1,79 @@
+"""
+Presa in carico (lease) delle azioni in esecuzione.
+
+Il claim porta l'azione IN_ESECUZIONE, incrementa tentativi e fissa
+lease_scade; scaduto il lease lo sweeper la rimette in coda e un altro
+worker può riprenderla (con un nuovo valore di tentativi). Il worker
+identifica quindi la propria presa in carico con la coppia (id, tentativi):
+la rinnova durante le operazioni lunghe (upload a chunk, batch) e scrive
+l'esito solo se la detiene ancora.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Set
+
+from sqlalchemy import and_, tuple_, update
+
+from app.database import SessionLocal
+from app.models.azione import Azione, StatoAzione
+from app.services.action_retry import ActionError
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class LeaseLostError(ActionError):
+    """Presa in carico scaduta e passata ad altri: l'esito non va registrato."""
+
+
+def lease_filter(prese: Dict[int, int]):
+    """
+    Condizione SQL sulle azioni ancora prese in carico da questo worker.
+
+    Args:
+        prese: {azione_id: tentativi al momento del claim}
+    """
+    return and_(
+        Azione.stato == StatoAzione.IN_ESECUZIONE,
+        tuple_(Azione.id, Azione.tentativi).in_(list(prese.items()))
+    )
+
+
+def lease_scadenza() -> datetime:
+    """Scadenza di un lease preso o rinnovato adesso."""
+    return datetime.utcnow() + timedelta(seconds=settings.ACTION_LEASE_SECONDS)
+
+
+def rinnova_lease(prese: Dict[int, int]) -> Set[int]:
+    """
+    Estende il lease delle azioni ancora prese in carico.
+
+    Usa una sessione dedicata e committa subito: lo sweeper deve vedere la
+    nuova scadenza, e gli oggetti della sessione dell'executor non vengono
+    scaduti dal commit.
+
+    Args:
+        prese: {azione_id: tentativi al momento del claim}
+
+    Returns:
+        Set[int]: ID delle azioni rinnovate; le altre sono state perse
+    """
+    if not prese:
+        return set()
+
+    db = SessionLocal()
+    try:
+        rinnovate = set(db.execute(
+            update(Azione).where(lease_filter(prese)).values(
+                lease_scade=lease_scadenza()
+            ).returning(Azione.id).execution_options(synchronize_session=False)
+        ).scalars())
+        db.commit()
+    finally:
+        db.close()
+
+    perse = set(prese) - rinnovate
+    if perse:
+        logger.warning(f"⚠️ Presa in carico persa per le azioni {sorted(perse)}")
+    return rinnovate
@@ -0,0 +1,98 @@
+"""
+Policy di retry per le azioni automatiche.
+
+Classifica gli errori di esecuzione (transitori o permanenti) e calcola il
+prossimo tentativo con backoff esponenziale e jitter.
+"""
+import random
+import socket
+import imaplib
+from datetime import datetime, timedelta
+from typing import Optional
+
+from googleapiclient.errors import HttpError
+
+from app.config import get_settings
+
+settings = get_settings()
+
+ERRORE_TRANSITORIO = "transitorio"
+ERRORE_PERMANENTE = "permanente"
+
+# Status HTTP Google per cui ha senso ritentare
+RETRYABLE_HTTP_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class ActionError(Exception):
+    """Errore base esecuzione azione."""
+
+
+class TransientActionError(ActionError):
+    """Errore temporaneo: l'azione verrà ritentata."""
+
+
+class PermanentActionError(ActionError):
+    """Errore definitivo: l'azione va direttamente in dead letter."""
+
+
+def classify_error(error: Optional[Exception]) -> str:
+    """
+    Classifica un errore di esecuzione.
+
+    Args:
+        error: Eccezione sollevata (None se l'handler ha solo restituito False)
+
+    Returns:
+        str: ERRORE_TRANSITORIO o ERRORE_PERMANENTE
+    """
+    if error is None:
+        return ERRORE_TRANSITORIO
+
+    if isinstance(error, PermanentActionError):
+        return ERRORE_PERMANENTE
+
+    if isinstance(error, TransientActionError):
+        return ERRORE_TRANSITORIO
+
+    if isinstance(error, HttpError):
+        status = getattr(error.resp, 'status', None)
+        if status in RETRYABLE_HTTP_STATUS:
+            return ERRORE_TRANSITORIO
+        # 403 per quota/rate limit è temporaneo, gli altri 4xx no
+        if status == 403 and b'rateLimitExceeded' in (error.content or b''):
+            return ERRORE_TRANSITORIO
+        return ERRORE_PERMANENTE
+
+    # Rete e connessioni interrotte
+    if isinstance(error, (imaplib.IMAP4.abort, socket.timeout, TimeoutError, ConnectionError, OSError)):
+        return ERRORE_TRANSITORIO
+
+    # Parametri azione non validi: ritentare non cambia l'esito
+    if isinstance(error, (KeyError, ValueError, TypeError)):
+        return ERRORE_PERMANENTE
+
+    return ERRORE_TRANSITORIO
+
+
+def compute_next_retry(tentativi: int, now: Optional[datetime] = None) -> datetime:
+    """
+    Calcola il prossimo tentativo con backoff esponenziale e jitter.
+
+    Il ritardo raddoppia a ogni tentativo fino a ACTION_RETRY_MAX_DELAY;
+    metà del ritardo è casuale per non far ripartire insieme le azioni
+    fallite nello stesso momento (es. durante un disservizio Google).
+
+    Args:
+        tentativi: Numero di tentativi già eseguiti (>= 1)
+        now: Istante di riferimento (default: utcnow)
+
+    Returns:
+        datetime: Istante del prossimo tentativo
+    """
+    now = now or datetime.utcnow()
+    delay = min(
+        settings.ACTION_RETRY_BASE_DELAY * (2 ** max(tentativi - 1, 0)),
+        settings.ACTION_RETRY_MAX_DELAY
+    )
+    delay = delay / 2 + random.uniform(0, delay / 2)
+    return now + timedelta(seconds=delay)
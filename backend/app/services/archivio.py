@@ -0,0 +1,279 @@
+"""
+Archivio freddo - Corpo e allegati delle email vecchie in segmenti zstd.
+
+Le email più vecchie di ARCHIVE_AFTER_DAYS restano in PostgreSQL con metadati
+(mittente, oggetto, date, categoria, stato) e interpretazione, che serve ai
+filtri JSONB: il corpo viene scritto come frame zstd in file di segmento
+append-only, gli allegati come frame separati, e i file originali rimossi dal
+disco. search_vector conserva i lessemi del corpo (vedi il trigger
+trg_emails_search_vector), quindi la ricerca full-text continua a trovarle. L'indice
+archivio_frammenti registra segmento, offset e lunghezza di ogni frame:
+leggere un contenuto archiviato costa una sola read.
+
+I contenuti vengono reidratati su richiesta (dettaglio email, download
+allegato, upload Drive) senza riportarli nelle tabelle.
+"""
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+
+import zstandard
+from sqlalchemy import text
+from sqlalchemy.orm import Session, undefer
+
+from app.models.email import Email
+from app.models.frammento_archivio import FrammentoArchivio
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Chiave advisory lock: un solo archiviatore alla volta scrive i segmenti
+ARCHIVE_LOCK = 736202
+
+SEGMENT_SUFFIX = '.zst'
+
+
+class _Segmenti:
+    """Scrittura append-only sui file di segmento, con rotazione per dimensione."""
+
+    def __init__(self, base_path: str, max_bytes: int):
+        self.base_path = base_path
+        self.max_bytes = max_bytes
+        self.nome = None
+        self.file = None
+        self.scritti = []
+
+    def append(self, dati: bytes) -> Tuple[str, int]:
+        """Accoda un frame e restituisce (segmento, offset)."""
+        if self.file is None or self.file.tell() >= self.max_bytes:
+            self._apri()
+        offset = self.file.tell()
+        self.file.write(dati)
+        return self.nome, offset
+
+    def chiudi(self):
+        """Porta su disco i segmenti scritti (prima del commit dell'indice)."""
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = None
+
+    def _apri(self):
+        self.chiudi()
+        os.makedirs(self.base_path, exist_ok=True)
+        esistenti = sorted(n for n in os.listdir(self.base_path) if n.endswith(SEGMENT_SUFFIX))
+
+        ultimo = esistenti[-1] if esistenti else None
+        if ultimo and ultimo != self.nome and os.path.getsize(os.path.join(self.base_path, ultimo)) < self.max_bytes:
+            self.nome = ultimo
+        else:
+            numero = int(ultimo[:-len(SEGMENT_SUFFIX)]) + 1 if ultimo else 1
+            self.nome = f"{numero:06d}{SEGMENT_SUFFIX}"
+
+        self.file = open(os.path.join(self.base_path, self.nome), 'ab')
+        self.file.seek(0, os.SEEK_END)
+
+
+class ArchivioFreddo:
+    """Archiviazione e lettura dei contenuti delle email vecchie."""
+
+    def __init__(self, db: Session, base_path: Optional[str] = None):
+        """
+        Args:
+            db: Sessione database
+            base_path: Directory dei segmenti (default ARCHIVE_PATH)
+        """
+        self.db = db
+        self.base_path = base_path or settings.ARCHIVE_PATH
+
+    def archivia(self, prima_di: datetime, limite: Optional[int] = None) -> Dict[str, int]:
+        """
+        Archivia le email ricevute prima di una data.
+
+        Ogni batch è una transazione: i segmenti vengono scritti e portati su
+        disco prima del commit dell'indice, quindi un crash lascia al più
+        byte non referenziati in coda a un segmento.
+
+        Args:
+            prima_di: Data di ricezione limite
+            limite: Numero massimo di email (None: tutte)
+
+        Returns:
+            Dict: email e allegati archiviati, byte originali e compressi
+        """
+        stats = {'email': 0, 'allegati': 0, 'byte_originali': 0, 'byte_compressi': 0}
+        compressor = zstandard.ZstdCompressor(level=settings.ARCHIVE_ZSTD_LEVEL)
+
+        while limite is None or stats['email'] < limite:
+            # Lock per transazione: con il pool di connessioni un lock di
+            # sessione potrebbe restare su un'altra connessione
+            if not self.db.execute(text("SELECT pg_try_advisory_xact_lock(:k)"), {'k': ARCHIVE_LOCK}).scalar():
+                self.db.rollback()
+                logger.info("⚠️ Archiviazione già in corso, saltata")
+                break
+
+            quante = settings.ARCHIVE_BATCH_SIZE if limite is None else min(settings.ARCHIVE_BATCH_SIZE, limite - stats['email'])
+            emails = self.db.query(Email).options(
+                undefer(Email.corpo)
+            ).filter(
+                Email.archiviata_at.is_(None),
+                Email.data_ricezione < prima_di
+            ).order_by(Email.data_ricezione).limit(quante).all()
+
+            if not emails:
+                self.db.rollback()
+                break
+
+            self._archivia_batch(emails, compressor, stats)
+
+        if stats['email']:
+            logger.info(
+                f"✅ Archiviate {stats['email']} email e {stats['allegati']} allegati: "
+                f"{stats['byte_originali']} → {stats['byte_compressi']} byte"
+            )
+        return stats
+
+    def _archivia_batch(self, emails: List[Email], compressor, stats: Dict[str, int]):
+        """Scrive i frame di un batch, aggiorna indice e tabelle, rimuove gli allegati."""
+        segmenti = _Segmenti(self.base_path, settings.ARCHIVE_SEGMENT_MAX_MB * 1024 * 1024)
+        frammenti = []
+        da_rimuovere = []
+        now = datetime.utcnow()
+
+        try:
+            for email in emails:
+                contenuto = json.dumps({'corpo': email.corpo}, ensure_ascii=False).encode('utf-8')
+                frammenti.append(self._scrivi(segmenti, compressor, stats, email.id, 'contenuto', 0, None, contenuto))
+
+                for indice, allegato in enumerate(email.allegati):
+                    path = allegato['path']
+                    if not path or not os.path.isfile(path):
+                        continue
+                    with open(path, 'rb') as f:
+                        dati = f.read()
+                    frammenti.append(self._scrivi(
+                        segmenti, compressor, stats, email.id, 'allegato', indice, allegato['filename'], dati
+                    ))
+                    da_rimuovere.append(path)
+                    stats['allegati'] += 1
+
+                email.corpo = None
+                email.archiviata_at = now
+        finally:
+            segmenti.chiudi()
+
+        self.db.add_all(frammenti)
+        self.db.commit()
+        stats['email'] += len(emails)
+
+        # File rimossi solo dopo il commit: in caso di errore restano al loro posto
+        for path in da_rimuovere:
+            try:
+                os.remove(path)
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+
+    def _scrivi(self, segmenti: _Segmenti, compressor, stats, email_id: int, tipo: str,
+                indice: int, nome: Optional[str], dati: bytes) -> FrammentoArchivio:
+        """Comprime un contenuto in un frame indipendente e ne restituisce la voce d'indice."""
+        frame = compressor.compress(dati)
+        segmento, offset = segmenti.append(frame)
+        stats['byte_originali'] += len(dati)
+        stats['byte_compressi'] += len(frame)
+
+        return FrammentoArchivio(
+            email_id=email_id,
+            tipo=tipo,
+            indice=indice,
+            nome=nome,
+            segmento=segmento,
+            offset=offset,
+            lunghezza=len(frame),
+            dimensione=len(dati),
+            sha256=hashlib.sha256(dati).hexdigest()
+        )
+
+    def _leggi(self, frammento: FrammentoArchivio) -> bytes:
+        """
+        Legge e verifica un frame.
+
+        Raises:
+            ValueError: Contenuto decompresso diverso da quello archiviato
+        """
+        fd = os.open(os.path.join(self.base_path, frammento.segmento), os.O_RDONLY)
+        try:
+            frame = os.pread(fd, frammento.lunghezza, frammento.offset)
+        finally:
+            os.close(fd)
+
+        dati = zstandard.ZstdDecompressor().decompress(frame)
+        if hashlib.sha256(dati).hexdigest() != frammento.sha256:
+            raise ValueError(
+                f"Frammento archivio corrotto: email {frammento.email_id} {frammento.tipo} {frammento.indice}"
+            )
+        return dati
+
+    def _frammento(self, email_id: int, tipo: str, indice: int = 0) -> Optional[FrammentoArchivio]:
+        return self.db.query(FrammentoArchivio).filter(
+            FrammentoArchivio.email_id == email_id,
+            FrammentoArchivio.tipo == tipo,
+            FrammentoArchivio.indice == indice
+        ).first()
+
+    def contenuto(self, email_id: int) -> Optional[Dict]:
+        """
+        Corpo archiviato di un'email.
+
+        Returns:
+            Dict: corpo, None se l'email non è in archivio
+        """
+        frammento = self._frammento(email_id, 'contenuto')
+        if frammento is None:
+            return None
+        return json.loads(self._leggi(frammento))
+
+    def allegato(self, email_id: int, indice: int) -> Optional[Tuple[str, bytes]]:
+        """
+        Allegato archiviato.
+
+        Returns:
+            Tuple: (nome file, contenuto), None se non in archivio
+        """
+        frammento = self._frammento(email_id, 'allegato', indice)
+        if frammento is None:
+            return None
+        return frammento.nome, self._leggi(frammento)
+
+    def ripristina_allegati(self, email: Email) -> int:
+        """
+        Riscrive su disco gli allegati archiviati di un'email (es. per l'upload Drive).
+
+        Returns:
+            int: Allegati ripristinati
+        """
+        paths = email.allegati_path or []
+        ripristinati = 0
+
+        for frammento in self.db.query(FrammentoArchivio).filter(
+            FrammentoArchivio.email_id == email.id,
+            FrammentoArchivio.tipo == 'allegato'
+        ):
+            if frammento.indice >= len(paths) or os.path.isfile(paths[frammento.indice]):
+                continue
+            path = paths[frammento.indice]
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(self._leggi(frammento))
+            os.replace(tmp, path)
+            ripristinati += 1
+
+        if ripristinati:
+            logger.info(f"🔄 Ripristinati {ripristinati} allegati archiviati dell'email {email.id}")
+        return ripristinati
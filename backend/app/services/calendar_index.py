@@ -0,0 +1,373 @@
+"""
+Calendar Index - Indice in memoria degli impegni per conflitti e slot liberi.
+
+Gli eventi di eventi_calendario sono tenuti in liste ordinate per inizio
+(una per assegnatario più una globale): la ricerca delle sovrapposizioni
+usa bisect e visita solo gli eventi che possono intersecare l'intervallo
+(inizio entro la durata massima indicizzata), senza query al database.
+
+L'indice viene caricato alla prima richiesta e aggiornato in modo
+incrementale dopo ogni commit che modifica eventi: le modifiche ORM sono
+intercettate dagli eventi del mapper, gli upsert/delete bulk le registrano
+con track_calendar_changes(). Un contatore Redis segnala le modifiche fatte
+da altri processi (API, worker, beat): se cambia, l'indice si ricarica. Se
+Redis non è raggiungibile l'indice resta valido per CALENDAR_INDEX_TTL
+secondi (le modifiche del processo sono comunque applicate) e Redis viene
+ritentato solo dopo REDIS_RETRY secondi, senza attendere il timeout a ogni
+richiesta.
+"""
+import bisect
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, time as dtime
+from typing import Dict, List, Optional, Tuple, Iterable
+
+import redis
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.models.evento import EventoCalendario
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "calendar_index:version"
+
+# Secondi prima di ritentare Redis dopo un errore
+REDIS_RETRY = 30
+
+# Durata assunta per gli eventi senza data_fine (come Google Calendar)
+DEFAULT_DURATION = timedelta(hours=1)
+
+# Gli slot liberi iniziano a multipli di 15 minuti
+SLOT_STEP = timedelta(minutes=15)
+
+SESSION_PENDING_KEY = "calendar_index_pending"
+
+Interval = Tuple[datetime, datetime, int]
+
+
+def parse_work_hours(value: str) -> List[Tuple[dtime, dtime]]:
+    """
+    Interpreta le fasce orarie lavorative (es. "09:00-13:00,15:00-18:00").
+
+    Args:
+        value: Fasce separate da virgola
+
+    Returns:
+        List[Tuple[time, time]]: Fasce (inizio, fine)
+    """
+    fasce = []
+    for fascia in value.split(','):
+        inizio, fine = fascia.strip().split('-')
+        fasce.append((
+            datetime.strptime(inizio.strip(), '%H:%M').time(),
+            datetime.strptime(fine.strip(), '%H:%M').time()
+        ))
+    return fasce
+
+
+@dataclass
+class _SortedIntervals:
+    """Intervalli ordinati per inizio, con durata massima per limitare la scansione."""
+    starts: List[Tuple[datetime, int]] = field(default_factory=list)
+    items: List[Interval] = field(default_factory=list)
+    max_duration: timedelta = timedelta(0)
+
+    def add(self, inizio: datetime, fine: datetime, evento_id: int):
+        pos = bisect.bisect_left(self.starts, (inizio, evento_id))
+        self.starts.insert(pos, (inizio, evento_id))
+        self.items.insert(pos, (inizio, fine, evento_id))
+        # Non si riduce alla rimozione: la scansione resta corretta, solo più ampia
+        self.max_duration = max(self.max_duration, fine - inizio)
+
+    def remove(self, inizio: datetime, evento_id: int):
+        pos = bisect.bisect_left(self.starts, (inizio, evento_id))
+        if pos < len(self.starts) and self.starts[pos] == (inizio, evento_id):
+            del self.starts[pos]
+            del self.items[pos]
+
+    def overlapping(self, inizio: datetime, fine: datetime) -> List[Interval]:
+        """Intervalli che intersecano [inizio, fine) in ordine di inizio."""
+        # Candidati: iniziano prima di fine e non prima di inizio - durata massima
+        hi = bisect.bisect_left(self.starts, (fine, -1))
+        lo = bisect.bisect_left(self.starts, (inizio - self.max_duration, -1))
+        return [item for item in self.items[lo:hi] if item[1] > inizio]
+
+
+class CalendarIndex:
+    """Indice thread-safe degli eventi calendario del processo."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._loaded_at = 0.0
+        # Versione Redis dell'indice caricato (None: non allineato con Redis)
+        self._version: Optional[int] = None
+        self._events: Dict[int, Tuple[Optional[int], datetime, datetime]] = {}
+        self._tutti = _SortedIntervals()
+        self._per_assegnatario: Dict[int, _SortedIntervals] = {}
+        self._redis = None
+        self._redis_retry_at = 0.0
+
+    def overlaps(
+        self,
+        db: Session,
+        inizio: datetime,
+        fine: Optional[datetime] = None,
+        assegnatario_id: Optional[int] = None,
+        escludi_id: Optional[int] = None
+    ) -> List[Interval]:
+        """
+        Eventi che si sovrappongono all'intervallo.
+
+        Args:
+            db: Sessione database (usata solo per caricare l'indice)
+            inizio: Inizio intervallo
+            fine: Fine intervallo (default: inizio + 1h)
+            assegnatario_id: Solo impegni di questo assegnatario (None: tutti)
+            escludi_id: Evento da ignorare (es. quello che si sta modificando)
+
+        Returns:
+            List[Tuple]: (inizio, fine, evento_id) degli eventi in conflitto
+        """
+        fine = fine or inizio + DEFAULT_DURATION
+        with self._lock:
+            self._ensure_current(db)
+            intervalli = self._intervals(assegnatario_id)
+            return [item for item in intervalli.overlapping(inizio, fine) if item[2] != escludi_id]
+
+    def free_slots(
+        self,
+        db: Session,
+        da: datetime,
+        a: datetime,
+        durata: timedelta,
+        assegnatario_id: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> List[Tuple[datetime, datetime]]:
+        """
+        Slot liberi di una certa durata nelle fasce lavorative.
+
+        Args:
+            db: Sessione database (usata solo per caricare l'indice)
+            da: Inizio ricerca
+            a: Fine ricerca
+            durata: Durata dello slot
+            assegnatario_id: Impegni di questo assegnatario (None: tutti)
+            limit: Numero massimo di slot
+
+        Returns:
+            List[Tuple[datetime, datetime]]: Slot liberi in ordine cronologico
+        """
+        fasce = parse_work_hours(settings.CALENDAR_WORK_HOURS)
+        slots = []
+
+        with self._lock:
+            self._ensure_current(db)
+            intervalli = self._intervals(assegnatario_id)
+
+            giorno = da.date()
+            while giorno <= a.date() and (limit is None or len(slots) < limit):
+                if giorno.weekday() < 5:
+                    for ora_inizio, ora_fine in fasce:
+                        inizio = self._round_up(max(datetime.combine(giorno, ora_inizio), da))
+                        fine = min(datetime.combine(giorno, ora_fine), a)
+                        slots.extend(self._free_in(intervalli, inizio, fine, durata))
+                giorno += timedelta(days=1)
+
+        return slots[:limit] if limit is not None else slots
+
+    def apply(self, upserts: Iterable[Tuple], deletes: Iterable[int]):
+        """
+        Applica modifiche già committate e le segnala agli altri processi.
+
+        Args:
+            upserts: Tuple (id, assegnatario_id, data_inizio, data_fine)
+            deletes: ID eventi eliminati
+        """
+        with self._lock:
+            if self._loaded:
+                for evento_id in deletes:
+                    self._remove(evento_id)
+                for evento_id, assegnatario_id, inizio, fine in upserts:
+                    self._remove(evento_id)
+                    self._add(evento_id, assegnatario_id, inizio, fine)
+
+            version = self._bump_version()
+            if version is not None and (self._version is None or version != self._version + 1):
+                # Modifiche di altri processi nel frattempo: ricarica alla prossima query
+                self._loaded = False
+            # Senza Redis l'indice resta valido fino al TTL: quelle locali sono già applicate
+            self._version = version
+
+    def invalidate(self):
+        """Forza il ricaricamento dell'indice alla prossima query."""
+        with self._lock:
+            self._loaded = False
+
+    def _ensure_current(self, db: Session):
+        """Carica (o ricarica) l'indice se mancante, modificato altrove o scaduto senza Redis."""
+        version = self._current_version()
+        if self._loaded:
+            if version is not None and version == self._version:
+                return
+            # Redis non raggiungibile: le modifiche degli altri processi arrivano al
+            # ricaricamento periodico; senza versione nota si ricarica quando Redis torna
+            if version is None and time.monotonic() - self._loaded_at < settings.CALENDAR_INDEX_TTL:
+                self._version = None
+                return
+
+        self._events.clear()
+        self._tutti = _SortedIntervals()
+        self._per_assegnatario.clear()
+
+        rows = db.query(
+            EventoCalendario.id,
+            EventoCalendario.assegnatario_id,
+            EventoCalendario.data_inizio,
+            EventoCalendario.data_fine
+        ).all()
+        for row in rows:
+            self._add(row.id, row.assegnatario_id, row.data_inizio, row.data_fine)
+
+        self._version = version
+        self._loaded = True
+        self._loaded_at = time.monotonic()
+        logger.debug(f"Indice calendario caricato: {len(rows)} eventi")
+
+    def _intervals(self, assegnatario_id: Optional[int]) -> _SortedIntervals:
+        if assegnatario_id is None:
+            return self._tutti
+        return self._per_assegnatario.get(assegnatario_id) or _SortedIntervals()
+
+    def _add(self, evento_id: int, assegnatario_id: Optional[int], inizio: datetime, fine: Optional[datetime]):
+        if inizio is None:
+            return
+        fine = fine if fine and fine > inizio else inizio + DEFAULT_DURATION
+        self._events[evento_id] = (assegnatario_id, inizio, fine)
+        self._tutti.add(inizio, fine, evento_id)
+        if assegnatario_id is not None:
+            self._per_assegnatario.setdefault(assegnatario_id, _SortedIntervals()).add(inizio, fine, evento_id)
+
+    def _remove(self, evento_id: int):
+        vecchio = self._events.pop(evento_id, None)
+        if vecchio is None:
+            return
+        assegnatario_id, inizio, _ = vecchio
+        self._tutti.remove(inizio, evento_id)
+        if assegnatario_id in self._per_assegnatario:
+            self._per_assegnatario[assegnatario_id].remove(inizio, evento_id)
+
+    def _free_in(
+        self,
+        intervalli: _SortedIntervals,
+        inizio: datetime,
+        fine: datetime,
+        durata: timedelta
+    ) -> List[Tuple[datetime, datetime]]:
+        """Slot consecutivi di una durata nella finestra, evitando gli impegni."""
+        slots = []
+        cursore = inizio
+        for occupato_inizio, occupato_fine, _ in intervalli.overlapping(inizio, fine):
+            while cursore + durata <= min(occupato_inizio, fine):
+                slots.append((cursore, cursore + durata))
+                cursore += durata
+            cursore = max(cursore, self._round_up(occupato_fine))
+        while cursore + durata <= fine:
+            slots.append((cursore, cursore + durata))
+            cursore += durata
+        return slots
+
+    def _round_up(self, value: datetime) -> datetime:
+        """Arrotonda al multiplo di SLOT_STEP successivo."""
+        resto = (value - datetime.combine(value.date(), dtime())) % SLOT_STEP
+        return value + (SLOT_STEP - resto) if resto else value
+
+    def _client(self):
+        if self._redis is None:
+            self._redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+        return self._redis
+
+    def _current_version(self) -> Optional[int]:
+        """Versione condivisa dell'indice (None se Redis non è raggiungibile)."""
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        try:
+            return int(self._client().get(VERSION_KEY) or 0)
+        except redis.RedisError as e:
+            logger.debug(f"Versione indice calendario non disponibile: {e}")
+            self._redis_retry_at = time.monotonic() + REDIS_RETRY
+            return None
+
+    def _bump_version(self) -> Optional[int]:
+        if time.monotonic() < self._redis_retry_at:
+            return None
+        try:
+            return int(self._client().incr(VERSION_KEY))
+        except redis.RedisError as e:
+            logger.debug(f"Versione indice calendario non aggiornata: {e}")
+            self._redis_retry_at = time.monotonic() + REDIS_RETRY
+            return None
+
+
+_index = CalendarIndex()
+
+
+def get_calendar_index() -> CalendarIndex:
+    """Restituisce l'indice calendario del processo corrente."""
+    return _index
+
+
+def track_calendar_changes(db: Session, upserts: Iterable[Tuple] = (), deletes: Iterable[int] = ()):
+    """
+    Registra modifiche fatte senza ORM (upsert/delete bulk) per l'indice.
+
+    Vengono applicate al commit della sessione e scartate al rollback.
+
+    Args:
+        db: Sessione che ha eseguito le modifiche
+        upserts: Tuple (id, assegnatario_id, data_inizio, data_fine)
+        deletes: ID eventi eliminati
+    """
+    pending = db.info.setdefault(SESSION_PENDING_KEY, {'upserts': {}, 'deletes': set()})
+    for row in upserts:
+        pending['upserts'][row[0]] = tuple(row)
+        pending['deletes'].discard(row[0])
+    for evento_id in deletes:
+        pending['upserts'].pop(evento_id, None)
+        pending['deletes'].add(evento_id)
+
+
+@event.listens_for(EventoCalendario, 'after_insert')
+@event.listens_for(EventoCalendario, 'after_update')
+def _track_saved(mapper, connection, target):
+    db = object_session(target)
+    if db is not None:
+        track_calendar_changes(db, upserts=[(target.id, target.assegnatario_id, target.data_inizio, target.data_fine)])
+
+
+@event.listens_for(EventoCalendario, 'after_delete')
+def _track_deleted(mapper, connection, target):
+    db = object_session(target)
+    if db is not None:
+        track_calendar_changes(db, deletes=[target.id])
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session):
+    pending = session.info.pop(SESSION_PENDING_KEY, None)
+    if pending and (pending['upserts'] or pending['deletes']):
+        try:
+            _index.apply(pending['upserts'].values(), pending['deletes'])
+        except Exception as e:
+            logger.warning(f"⚠️ Aggiornamento indice calendario fallito, ricaricamento: {e}")
+            _index.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop(SESSION_PENDING_KEY, None)
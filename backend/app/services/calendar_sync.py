@@ -0,0 +1,234 @@
+"""
+Calendar Sync - Sincronizzazione incrementale Google Calendar → eventi locali.
+
+La prima sincronizzazione di un calendario scarica tutti gli eventi; le
+successive usano il syncToken salvato in stato_calendari e ricevono solo le
+modifiche, comprese le cancellazioni. Le pagine vengono scorse con
+nextPageToken e gli eventi salvati con un upsert per pagina sulla chiave
+(google_calendar_id, google_event_id).
+"""
+import logging
+from typing import Dict, List, Optional, Any
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from googleapiclient.errors import HttpError
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.evento import EventoCalendario
+from app.models.stato_calendario import StatoCalendario
+from app.integrations.google_calendar_client import GoogleCalendarClient
+from app.services.calendar_index import track_calendar_changes
+
+logger = logging.getLogger(__name__)
+
+# Fuso orario degli eventi locali (naive), come in GoogleCalendarClient
+LOCAL_TZ = ZoneInfo('Europe/Rome')
+
+# Status restituito da Google quando il syncToken non è più valido
+SYNC_TOKEN_EXPIRED = 410
+
+# Campi aggiornati dalla sincronizzazione: email, assegnatario e contesto
+# SNALS restano quelli impostati localmente
+SYNCED_COLUMNS = (
+    'titolo', 'descrizione', 'data_inizio', 'data_fine', 'all_day',
+    'luogo', 'link_videocall', 'sincronizzato', 'updated_at'
+)
+
+
+def parse_event_time(value: Dict[str, str]) -> Optional[datetime]:
+    """
+    Converte start/end di un evento Google in datetime locale naive.
+
+    Args:
+        value: Dict con dateTime (con offset) o date (tutto il giorno)
+
+    Returns:
+        datetime: Data/ora nel fuso Europe/Rome, None se assente
+    """
+    if not value:
+        return None
+
+    if value.get('dateTime'):
+        dt = datetime.fromisoformat(value['dateTime'].replace('Z', '+00:00'))
+        if dt.tzinfo:
+            dt = dt.astimezone(LOCAL_TZ).replace(tzinfo=None)
+        return dt
+
+    if value.get('date'):
+        return datetime.strptime(value['date'], '%Y-%m-%d')
+
+    return None
+
+
+class CalendarSync:
+    """Sincronizza un calendario Google nella tabella eventi_calendario."""
+
+    def __init__(self, db: Session, calendar_client: GoogleCalendarClient):
+        """
+        Inizializza il motore di sincronizzazione.
+
+        Args:
+            db: Sessione database
+            calendar_client: Client Google Calendar
+        """
+        self.db = db
+        self.calendar_client = calendar_client
+
+    def sync(self, calendar_id: str, full: bool = False) -> Dict[str, Any]:
+        """
+        Sincronizza un calendario.
+
+        Lo stato del calendario resta bloccato (SELECT ... FOR UPDATE) fino al
+        commit finale: due sincronizzazioni concorrenti dello stesso
+        calendario non si sovrappongono, la seconda viene saltata.
+
+        Args:
+            calendar_id: ID calendario Google
+            full: Forza una sincronizzazione completa
+
+        Returns:
+            Dict: Statistiche (completa, pagine, aggiornati, eliminati)
+        """
+        self.db.execute(
+            insert(StatoCalendario).values(calendar_id=calendar_id).on_conflict_do_nothing(
+                index_elements=[StatoCalendario.calendar_id]
+            )
+        )
+        stato = self.db.query(StatoCalendario).filter(
+            StatoCalendario.calendar_id == calendar_id
+        ).with_for_update(skip_locked=True).first()
+
+        if stato is None:
+            self.db.rollback()
+            logger.info(f"⚠️ Sincronizzazione {calendar_id} già in corso, saltata")
+            return {'calendar_id': calendar_id, 'saltata': True}
+
+        sync_token = None if full else stato.sync_token
+
+        try:
+            stats = self._run(calendar_id, sync_token)
+        except HttpError as e:
+            if getattr(e.resp, 'status', None) != SYNC_TOKEN_EXPIRED or not sync_token:
+                raise
+            # Token scaduto (o invalidato da Google): sincronizzazione completa
+            logger.warning(f"⚠️ syncToken scaduto per {calendar_id}, sincronizzazione completa")
+            stats = self._run(calendar_id, None)
+
+        now = datetime.utcnow()
+        stato.sync_token = stats.pop('sync_token')
+        stato.ultima_sincronizzazione = now
+        if stats['completa']:
+            stato.ultima_completa = now
+
+        self.db.commit()
+
+        logger.info(
+            f"✅ Calendario {calendar_id} sincronizzato: {stats['aggiornati']} aggiornati, "
+            f"{stats['eliminati']} eliminati ({stats['pagine']} pagine)"
+        )
+        return {'calendar_id': calendar_id, **stats}
+
+    def _run(self, calendar_id: str, sync_token: Optional[str]) -> Dict[str, Any]:
+        """Scorre tutte le pagine applicando modifiche e cancellazioni."""
+        completa = sync_token is None
+        visti = set()
+        stats = {'completa': completa, 'pagine': 0, 'aggiornati': 0, 'eliminati': 0}
+        page_token = None
+
+        while True:
+            page = self.calendar_client.list_events_page(
+                calendar_id, sync_token=sync_token, page_token=page_token
+            )
+            stats['pagine'] += 1
+
+            items = page.get('items', [])
+            cancellati = [item['id'] for item in items if item.get('status') == 'cancelled']
+            attivi = [item for item in items if item.get('status') != 'cancelled']
+
+            stats['aggiornati'] += self._upsert(calendar_id, attivi)
+            stats['eliminati'] += self._delete(calendar_id, cancellati)
+            visti.update(item['id'] for item in attivi)
+
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                stats['sync_token'] = page.get('nextSyncToken')
+                break
+
+        if completa:
+            # Eventi locali sincronizzati ma non più presenti su Google
+            stmt = delete(EventoCalendario).where(
+                EventoCalendario.google_calendar_id == calendar_id,
+                EventoCalendario.sincronizzato.is_(True)
+            )
+            if visti:
+                stmt = stmt.where(EventoCalendario.google_event_id.notin_(visti))
+            stats['eliminati'] += self._delete_returning(stmt)
+
+        return stats
+
+    def _upsert(self, calendar_id: str, items: List[Dict]) -> int:
+        """Inserisce o aggiorna gli eventi di una pagina con un'unica query."""
+        rows = {}
+        now = datetime.utcnow()
+
+        for item in items:
+            start = item.get('start') or {}
+            data_inizio = parse_event_time(start)
+            if data_inizio is None:
+                continue
+
+            all_day = 'date' in start and 'dateTime' not in start
+            data_fine = parse_event_time(item.get('end'))
+            if all_day and data_fine:
+                # Google usa una data di fine esclusiva per gli eventi di un giorno
+                data_fine = data_fine - timedelta(seconds=1)
+
+            rows[item['id']] = {
+                'google_calendar_id': calendar_id,
+                'google_event_id': item['id'],
+                'titolo': (item.get('summary') or 'Senza titolo')[:500],
+                'descrizione': item.get('description'),
+                'data_inizio': data_inizio,
+                'data_fine': data_fine,
+                'all_day': all_day,
+                'luogo': item['location'][:500] if item.get('location') else None,
+                'link_videocall': item.get('hangoutLink'),
+                'sincronizzato': True,
+                'created_at': now,
+                'updated_at': now,
+            }
+
+        if not rows:
+            return 0
+
+        stmt = insert(EventoCalendario).values(list(rows.values()))
+        result = self.db.execute(stmt.on_conflict_do_update(
+            constraint='uq_evento_google',
+            set_={column: stmt.excluded[column] for column in SYNCED_COLUMNS}
+        ).returning(
+            EventoCalendario.id,
+            EventoCalendario.assegnatario_id,
+            EventoCalendario.data_inizio,
+            EventoCalendario.data_fine
+        ))
+        track_calendar_changes(self.db, upserts=result.all())
+        return len(rows)
+
+    def _delete(self, calendar_id: str, event_ids: List[str]) -> int:
+        """Elimina gli eventi cancellati su Google."""
+        if not event_ids:
+            return 0
+
+        return self._delete_returning(delete(EventoCalendario).where(
+            EventoCalendario.google_calendar_id == calendar_id,
+            EventoCalendario.google_event_id.in_(event_ids)
+        ))
+
+    def _delete_returning(self, stmt) -> int:
+        """Esegue un delete bulk registrando gli eventi eliminati per l'indice."""
+        ids = [row.id for row in self.db.execute(stmt.returning(EventoCalendario.id))]
+        track_calendar_changes(self.db, deletes=ids)
+        return len(ids)
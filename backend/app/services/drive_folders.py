@@ -0,0 +1,278 @@
+"""
+Drive Folders - Cache persistente percorso cartella → ID Google Drive.
+
+Le cartelle usate per archiviare gli allegati sono risolte una volta e
+salvate in cartelle_drive; le chiamate successive non interrogano Drive.
+La validità delle voci è verificata in modo lazy: solo quando una voce non
+viene controllata da DRIVE_FOLDER_VALIDATE_INTERVAL, con un'unica richiesta
+batch per tutte le voci scadute. Ricerche e creazioni delle cartelle mancanti
+sono raggruppate per livello in richieste batch; una cartella viene creata
+solo se la sua ricerca è riuscita senza risultati.
+"""
+import logging
+from typing import List, Dict, Optional
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models.cartella_drive import CartellaDrive
+from app.integrations.google_drive_client import GoogleDriveClient
+from app.services.action_retry import TransientActionError
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Chiave advisory lock per la creazione cartelle (evita doppioni tra worker)
+FOLDER_CREATE_LOCK = 736201
+
+# Status per cui una cartella in cache non esiste più
+FOLDER_GONE_STATUS = {404, 410}
+
+# Tentativi per le ricerche fallite in un batch prima di rinunciare
+FOLDER_FIND_ATTEMPTS = 2
+
+
+def folder_path(*parts: str) -> str:
+    """
+    Costruisce un percorso cartella normalizzato.
+
+    Args:
+        parts: Nomi delle cartelle dalla radice
+
+    Returns:
+        str: Percorso con "/" come separatore
+    """
+    # "/" nei nomi (es. oggetto email) non deve creare livelli in più
+    names = [part.replace('/', '-').strip() for part in parts]
+    return '/'.join(name for name in names if name)
+
+
+class DriveFolderCache:
+    """Risolve percorsi di cartelle Drive usando la cache su database."""
+
+    def __init__(self, db: Session, drive_client: GoogleDriveClient):
+        """
+        Inizializza la cache.
+
+        Args:
+            db: Sessione database
+            drive_client: Client Drive
+        """
+        self.db = db
+        self.drive_client = drive_client
+
+    def resolve(self, percorso: str) -> str:
+        """
+        Restituisce l'ID della cartella, creandola (con gli antenati) se manca.
+
+        Args:
+            percorso: Percorso (vedi folder_path)
+
+        Returns:
+            str: ID cartella Drive
+        """
+        return self.resolve_many([percorso])[percorso]
+
+    def resolve_many(self, percorsi: List[str]) -> Dict[str, str]:
+        """
+        Risolve più percorsi con il minimo di richieste a Drive.
+
+        Args:
+            percorsi: Percorsi da risolvere
+
+        Returns:
+            Dict[str, str]: ID cartella per percorso
+
+        Raises:
+            TransientActionError: Drive non disponibile o cartella non creata
+        """
+        if not self.drive_client.service and not self.drive_client.authenticate():
+            raise TransientActionError("Google Drive non autenticato")
+
+        # Tutti i livelli intermedi, dalla radice
+        richiesti = set()
+        for percorso in percorsi:
+            parti = percorso.split('/')
+            for depth in range(1, len(parti) + 1):
+                richiesti.add('/'.join(parti[:depth]))
+
+        cached = self._load(richiesti)
+        risolti = self._validate(cached)
+
+        mancanti = sorted(richiesti - set(risolti), key=lambda p: p.count('/'))
+        if mancanti:
+            risolti.update(self._create_missing(mancanti, risolti))
+
+        return {percorso: risolti[percorso] for percorso in percorsi}
+
+    def invalidate(self, percorso: str):
+        """
+        Rimuove dalla cache una cartella e i suoi discendenti (es. dopo un 404).
+
+        Args:
+            percorso: Percorso della cartella non più valida
+        """
+        self.db.query(CartellaDrive).filter(
+            (CartellaDrive.percorso == percorso) | CartellaDrive.percorso.startswith(percorso + '/')
+        ).delete(synchronize_session=False)
+        self.db.commit()
+
+    def _load(self, percorsi: set) -> Dict[str, CartellaDrive]:
+        """Carica le voci in cache per i percorsi indicati."""
+        righe = self.db.query(CartellaDrive).filter(CartellaDrive.percorso.in_(percorsi)).all()
+        return {riga.percorso: riga for riga in righe}
+
+    def _validate(self, cached: Dict[str, CartellaDrive]) -> Dict[str, str]:
+        """
+        Verifica con un batch le voci non controllate di recente.
+
+        Returns:
+            Dict[str, str]: Voci valide (percorso → ID)
+        """
+        soglia = datetime.utcnow() - timedelta(seconds=settings.DRIVE_FOLDER_VALIDATE_INTERVAL)
+        scadute = [riga for riga in cached.values() if not riga.verificata_at or riga.verificata_at < soglia]
+
+        if scadute:
+            requests = [
+                self.drive_client.service.files().get(fileId=riga.folder_id, fields='id, trashed')
+                for riga in scadute
+            ]
+            non_valide = []
+            for riga, (response, error) in zip(scadute, self.drive_client.execute_batch(requests)):
+                status = getattr(getattr(error, 'resp', None), 'status', None)
+                if status in FOLDER_GONE_STATUS or (response and response.get('trashed')):
+                    logger.warning(f"⚠️ Cartella Drive non più valida: {riga.percorso}")
+                    non_valide.append(riga.percorso)
+                elif error is None:
+                    riga.verificata_at = datetime.utcnow()
+
+            risolti = {percorso: riga.folder_id for percorso, riga in cached.items()}
+            self.db.commit()
+
+            # Una cartella eliminata invalida anche tutte le sottocartelle
+            for percorso in non_valide:
+                self.invalidate(percorso)
+                risolti = {
+                    p: folder_id for p, folder_id in risolti.items()
+                    if p != percorso and not p.startswith(percorso + '/')
+                }
+            return risolti
+
+        return {percorso: riga.folder_id for percorso, riga in cached.items()}
+
+    def _create_missing(self, mancanti: List[str], risolti: Dict[str, str]) -> Dict[str, str]:
+        """
+        Cerca o crea le cartelle mancanti, un livello alla volta.
+
+        Per ogni livello: un batch di ricerche per nome (cartelle già create
+        fuori dalla cache) e un batch di creazioni per le restanti.
+
+        Args:
+            mancanti: Percorsi mancanti, ordinati per profondità
+            risolti: Percorsi già risolti (antenati)
+
+        Returns:
+            Dict[str, str]: Percorsi creati o trovati
+        """
+        risolti = dict(risolti)
+        nuovi: Dict[str, str] = {}
+
+        # Serializza le creazioni tra worker e riverifica la cache dopo il lock
+        self.db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': FOLDER_CREATE_LOCK})
+        for riga in self._load(set(mancanti)).values():
+            risolti[riga.percorso] = nuovi[riga.percorso] = riga.folder_id
+
+        livelli: Dict[int, List[str]] = {}
+        for percorso in mancanti:
+            if percorso not in risolti:
+                livelli.setdefault(percorso.count('/'), []).append(percorso)
+
+        for depth in sorted(livelli):
+            livello = livelli[depth]
+            parent_ids = [self._parent_id(percorso, risolti) for percorso in livello]
+            nomi = [percorso.rsplit('/', 1)[-1] for percorso in livello]
+
+            # Cartelle già presenti su Drive ma non in cache
+            trovate = self._find(livello, nomi, parent_ids)
+
+            da_creare = []
+            for percorso, nome, parent_id, files in zip(livello, nomi, parent_ids, trovate):
+                if files:
+                    risolti[percorso] = nuovi[percorso] = files[0]['id']
+                else:
+                    da_creare.append((percorso, nome, parent_id))
+
+            if da_creare:
+                creati = self.drive_client.execute_batch([
+                    self.drive_client.folder_create_request(nome, parent_id)
+                    for _, nome, parent_id in da_creare
+                ])
+                for (percorso, _, _), (response, error) in zip(da_creare, creati):
+                    if error is not None or not response:
+                        self.db.rollback()
+                        raise TransientActionError(f"Creazione cartella Drive {percorso} fallita: {error}")
+                    risolti[percorso] = nuovi[percorso] = response['id']
+                    logger.info(f"✅ Cartella creata: {percorso} (ID: {response['id']})")
+
+            self._store({percorso: nuovi[percorso] for percorso in livello})
+
+        self.db.commit()
+        return nuovi
+
+    def _find(self, livello: List[str], nomi: List[str], parent_ids: List[Optional[str]]) -> List[List[Dict]]:
+        """
+        Cerca per nome le cartelle di un livello con un batch.
+
+        Le ricerche fallite vengono ripetute: una cartella va creata solo
+        se la ricerca è riuscita e non ha trovato nulla, altrimenti un errore
+        transitorio produrrebbe un doppione.
+
+        Returns:
+            List[List[Dict]]: Cartelle trovate per percorso, nello stesso ordine
+
+        Raises:
+            TransientActionError: Ricerca ancora fallita dopo FOLDER_FIND_ATTEMPTS tentativi
+        """
+        risultati: List[Optional[List[Dict]]] = [None] * len(livello)
+        errori: Dict[int, Exception] = {}
+
+        for _ in range(FOLDER_FIND_ATTEMPTS):
+            indici = [i for i, files in enumerate(risultati) if files is None]
+            esiti = self.drive_client.execute_batch([
+                self.drive_client.folder_find_request(nomi[i], parent_ids[i]) for i in indici
+            ])
+            for i, (response, error) in zip(indici, esiti):
+                if error is None and response is not None:
+                    risultati[i] = response.get('files') or []
+                    errori.pop(i, None)
+                else:
+                    errori[i] = error
+            if not errori:
+                return risultati
+
+        self.db.rollback()
+        i, error = next(iter(errori.items()))
+        raise TransientActionError(f"Ricerca cartella Drive {livello[i]} fallita: {error}")
+
+    def _parent_id(self, percorso: str, risolti: Dict[str, str]) -> Optional[str]:
+        """ID della cartella padre (None per le cartelle di primo livello)."""
+        if '/' not in percorso:
+            return None
+        return risolti[percorso.rsplit('/', 1)[0]]
+
+    def _store(self, cartelle: Dict[str, str]):
+        """Salva (o aggiorna) le voci in cache."""
+        if not cartelle:
+            return
+
+        now = datetime.utcnow()
+        stmt = insert(CartellaDrive).values([
+            {'percorso': percorso, 'folder_id': folder_id, 'created_at': now, 'verificata_at': now}
+            for percorso, folder_id in cartelle.items()
+        ])
+        self.db.execute(stmt.on_conflict_do_update(
+            index_elements=[CartellaDrive.percorso],
+            set_={'folder_id': stmt.excluded.folder_id, 'verificata_at': stmt.excluded.verificata_at}
+        ))
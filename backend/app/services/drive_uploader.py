@@ -0,0 +1,358 @@
+"""
+Drive Uploader - Upload allegati su Google Drive a chunk, in parallelo e resumable.
+
+I file vengono letti dallo storage allegati a chunk (MediaFileUpload) e
+caricati in parallelo entro DRIVE_UPLOAD_PARALLELISM. Dopo ogni chunk
+l'avanzamento e l'URI della sessione di upload vengono salvati in
+azione.risultato: un nuovo tentativo dell'azione salta i file già caricati
+e riprende quelli interrotti dal byte già ricevuto da Drive. Ogni
+salvataggio rinnova anche la presa in carico dell'azione: se è stata persa
+(lease scaduto e azione ripresa da un altro worker) l'upload si interrompe.
+
+Con DRIVE_UPLOAD_DEDUP gli allegati già presenti su Drive (stesso SHA-256,
+es. la stessa circolare USR ricevuta da più mittenti) non vengono ricaricati:
+nella cartella dell'email si crea una scorciatoia al file esistente.
+"""
+import os
+import math
+import hashlib
+import logging
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Optional, Any
+
+from googleapiclient.errors import HttpError
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import SessionLocal
+from app.models.azione import Azione
+from app.models.file_drive import FileDrive
+from app.integrations.google_drive_client import GoogleDriveClient
+from app.services.action_retry import TransientActionError, PermanentActionError, classify_error, ERRORE_PERMANENTE
+from app.services.action_lease import LeaseLostError, lease_filter, lease_scadenza
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+STATO_IN_CORSO = "in_corso"
+STATO_COMPLETATO = "completato"
+STATO_ERRORE = "errore"
+
+# Sessioni di upload scadute o sconosciute a Drive: si riparte da zero
+SESSION_EXPIRED_STATUS = {404, 410}
+
+# File originale non più accessibile: la voce di deduplicazione va rimossa
+TARGET_GONE_STATUS = {403, 404}
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    """
+    Calcola lo SHA-256 di un file leggendolo a blocchi.
+
+    Args:
+        path: Percorso del file
+
+    Returns:
+        str: Hash esadecimale
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DriveUploader:
+    """Upload degli allegati di un'azione con avanzamento persistito."""
+
+    def __init__(self, drive_client: GoogleDriveClient, azione_id: int, tentativo: int,
+                 progress: Optional[Dict] = None):
+        """
+        Inizializza l'uploader.
+
+        Args:
+            drive_client: Client Drive (thread-safe)
+            azione_id: Azione su cui registrare l'avanzamento
+            tentativo: Valore di tentativi al claim (identifica la presa in carico)
+            progress: Avanzamento di un tentativo precedente (azione.risultato)
+        """
+        self.drive_client = drive_client
+        self.azione_id = azione_id
+        self.tentativo = tentativo
+        self.lease_perso = False
+        self.progress: Dict[str, Any] = dict(progress or {})
+        self.progress.setdefault('files', {})
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def upload(self, attachments: List[Dict[str, str]], folder_id: str) -> Dict[str, Any]:
+        """
+        Carica gli allegati nella cartella indicata.
+
+        Args:
+            attachments: Lista di dict con filename e path
+            folder_id: ID cartella Drive di destinazione
+
+        Returns:
+            Dict: Avanzamento finale (files, bytes_totali, bytes_caricati,
+                bytes_risparmiati, richieste_risparmiate, uploaded_files)
+
+        Raises:
+            PermanentActionError: Allegato mancante o rifiutato da Drive
+            TransientActionError: Upload interrotto (verrà ripreso al prossimo tentativo)
+            LeaseLostError: Presa in carico dell'azione persa durante l'upload
+        """
+        self.progress['folder_id'] = folder_id
+
+        for allegato in attachments:
+            path = allegato['path']
+            if not path or not os.path.isfile(path):
+                raise PermanentActionError(f"Allegato non trovato nello storage: {path}")
+
+            entry = self.progress['files'].setdefault(path, {})
+            entry.setdefault('nome', allegato.get('filename') or os.path.basename(path))
+            entry.setdefault('stato', STATO_IN_CORSO)
+            entry['dimensione'] = os.path.getsize(path)
+            entry.setdefault('caricati', 0)
+            if settings.DRIVE_UPLOAD_DEDUP and 'sha256' not in entry:
+                entry['sha256'] = file_sha256(path)
+
+        if settings.DRIVE_UPLOAD_DEDUP:
+            self._link_duplicates(folder_id)
+
+        self._update_totals()
+        self._save_progress()
+        self._check_lease()
+
+        da_caricare = [
+            path for path, entry in self.progress['files'].items()
+            if entry['stato'] != STATO_COMPLETATO
+        ]
+
+        errors: Dict[str, Exception] = {}
+        if da_caricare:
+            workers = max(1, min(settings.DRIVE_UPLOAD_PARALLELISM, len(da_caricare)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='drive-upload') as pool:
+                futures = {pool.submit(self._upload_file, path, folder_id): path for path in da_caricare}
+                for future, path in futures.items():
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors[path] = e
+
+        self._update_totals()
+        self._save_progress()
+
+        if settings.DRIVE_UPLOAD_DEDUP:
+            self._register_uploads()
+
+        self._check_lease()
+        if errors:
+            dettaglio = '; '.join(f"{self.progress['files'][p]['nome']}: {e}" for p, e in errors.items())
+            if all(classify_error(e) == ERRORE_PERMANENTE for e in errors.values()):
+                raise PermanentActionError(f"Upload rifiutato: {dettaglio}")
+            raise TransientActionError(f"Upload interrotto, verrà ripreso: {dettaglio}")
+
+        self.progress['uploaded_files'] = [
+            entry['file'] for entry in self.progress['files'].values() if entry.get('file')
+        ]
+        return self.progress
+
+    def _link_duplicates(self, folder_id: str):
+        """
+        Collega con scorciatoie i file già presenti su Drive.
+
+        Una sola query per trovare gli hash noti e un solo batch HTTP per
+        creare tutte le scorciatoie. I file per cui la scorciatoia fallisce
+        vengono caricati normalmente.
+        """
+        candidati = {
+            path: entry for path, entry in self.progress['files'].items()
+            if entry['stato'] != STATO_COMPLETATO and entry.get('sha256')
+        }
+        if not candidati:
+            return
+
+        db = SessionLocal()
+        try:
+            noti = {
+                row.sha256: row for row in db.query(FileDrive).filter(
+                    FileDrive.sha256.in_({entry['sha256'] for entry in candidati.values()})
+                ).all()
+            }
+
+            duplicati = [(path, entry, noti[entry['sha256']]) for path, entry in candidati.items() if entry['sha256'] in noti]
+            if not duplicati:
+                return
+
+            if not self.drive_client.service and not self.drive_client.authenticate():
+                raise TransientActionError("Google Drive non autenticato")
+
+            risultati = self.drive_client.execute_batch([
+                self.drive_client.shortcut_create_request(entry['nome'], row.drive_file_id, folder_id)
+                for _, entry, row in duplicati
+            ])
+
+            for (path, entry, row), (response, error) in zip(duplicati, risultati):
+                if error is not None or not response:
+                    status = getattr(getattr(error, 'resp', None), 'status', None)
+                    if status in TARGET_GONE_STATUS:
+                        # Originale eliminato o non più accessibile: si ricarica
+                        db.delete(row)
+                    logger.warning(f"⚠️ Scorciatoia non creata per {entry['nome']}, upload completo: {error}")
+                    continue
+
+                entry.update(
+                    stato=STATO_COMPLETATO,
+                    caricati=0,
+                    session_uri=None,
+                    errore=None,
+                    deduplicato=True,
+                    origine=row.drive_file_id,
+                    # Un upload resumable costa l'avvio più una richiesta per chunk,
+                    # la scorciatoia una sola chiamata nel batch
+                    richieste_risparmiate=max(math.ceil(entry['dimensione'] / settings.DRIVE_UPLOAD_CHUNK_SIZE), 1),
+                    file=response
+                )
+                row.riusi = (row.riusi or 0) + 1
+                row.ultimo_riuso = datetime.utcnow()
+                logger.info(f"✅ File già su Drive, scorciatoia creata: {entry['nome']} (ID: {response.get('id')})")
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _register_uploads(self):
+        """Registra gli hash dei file caricati per deduplicare i prossimi upload."""
+        nuovi = {}
+        for entry in self.progress['files'].values():
+            if entry['stato'] == STATO_COMPLETATO and entry.get('sha256') and entry.get('file') and not entry.get('deduplicato'):
+                nuovi.setdefault(entry['sha256'], {
+                    'sha256': entry['sha256'],
+                    'drive_file_id': entry['file']['id'],
+                    'nome': entry['nome'][:500],
+                    'dimensione': entry['dimensione'],
+                    'created_at': datetime.utcnow(),
+                    'riusi': 0
+                })
+
+        if not nuovi:
+            return
+
+        db = SessionLocal()
+        try:
+            db.execute(insert(FileDrive).values(list(nuovi.values())).on_conflict_do_nothing(
+                index_elements=[FileDrive.sha256]
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Impossibile registrare i file caricati per la deduplicazione: {e}")
+        finally:
+            db.close()
+
+    def _upload_file(self, path: str, folder_id: str):
+        """Carica un file a chunk, salvando sessione e avanzamento dopo ogni chunk."""
+        with self._lock:
+            entry = self.progress['files'][path]
+            session_uri = entry.get('session_uri')
+
+        mimetype = mimetypes.guess_type(entry['nome'])[0] or 'application/octet-stream'
+        request = self.drive_client.resumable_upload_request(
+            path, entry['nome'], mimetype, folder_id, resumable_uri=session_uri
+        )
+        if request is None:
+            raise TransientActionError("Google Drive non autenticato")
+
+        if session_uri:
+            logger.info(f"🔄 Ripresa upload {entry['nome']} da {entry.get('caricati', 0)} byte")
+
+        response = None
+        while response is None:
+            try:
+                status, response = request.next_chunk(num_retries=settings.DRIVE_UPLOAD_RETRIES)
+            except HttpError as e:
+                if session_uri and getattr(e.resp, 'status', None) in SESSION_EXPIRED_STATUS:
+                    # Sessione scaduta (dopo circa una settimana): nuovo upload da zero
+                    logger.warning(f"⚠️ Sessione upload scaduta per {entry['nome']}, nuovo upload")
+                    session_uri = None
+                    request = self.drive_client.resumable_upload_request(path, entry['nome'], mimetype, folder_id)
+                    self._record(path, session_uri=None, caricati=0)
+                    continue
+                self._record(path, stato=STATO_ERRORE, errore=str(e))
+                raise
+
+            if status is not None:
+                self._record(path, session_uri=request.resumable_uri, caricati=status.resumable_progress)
+                self._check_lease()
+
+        self._record(
+            path,
+            stato=STATO_COMPLETATO,
+            caricati=entry['dimensione'],
+            session_uri=None,
+            errore=None,
+            file=response
+        )
+        logger.info(f"✅ File caricato: {entry['nome']} (ID: {response.get('id')})")
+
+    def _record(self, path: str, **changes):
+        """Aggiorna l'avanzamento di un file e lo salva sull'azione."""
+        with self._lock:
+            self.progress['files'][path].update(changes)
+            self._update_totals()
+        self._save_progress()
+
+    def _check_lease(self):
+        """Interrompe l'upload se la presa in carico dell'azione è stata persa."""
+        if self.lease_perso:
+            raise LeaseLostError(f"Presa in carico dell'azione {self.azione_id} scaduta durante l'upload")
+
+    def _update_totals(self):
+        """Ricalcola i byte totali e caricati."""
+        files = self.progress['files'].values()
+        self.progress['bytes_totali'] = sum(f.get('dimensione', 0) for f in files)
+        self.progress['bytes_caricati'] = sum(f.get('caricati', 0) for f in files)
+        # Banda e quota API risparmiate dai file collegati invece che ricaricati
+        self.progress['bytes_risparmiati'] = sum(f.get('dimensione', 0) for f in files if f.get('deduplicato'))
+        self.progress['richieste_risparmiate'] = sum(f.get('richieste_risparmiate', 0) for f in files)
+
+    def _save_progress(self):
+        """
+        Salva l'avanzamento su azione.risultato.
+
+        Usa una sessione dedicata: è chiamato dai thread di upload, che non
+        possono condividere la sessione dell'executor. Il salvataggio rinnova
+        il lease e avviene solo se la presa in carico è ancora di questo
+        worker, altrimenti segna il lease come perso.
+        """
+        # Snapshot e scrittura serializzati: un salvataggio più vecchio
+        # non può sovrascrivere uno più recente
+        with self._save_lock:
+            with self._lock:
+                snapshot = {
+                    **self.progress,
+                    'files': {path: dict(entry) for path, entry in self.progress['files'].items()}
+                }
+
+            db = SessionLocal()
+            try:
+                salvate = db.query(Azione).filter(lease_filter({self.azione_id: self.tentativo})).update(
+                    {Azione.risultato: snapshot, Azione.lease_scade: lease_scadenza()}, synchronize_session=False
+                )
+                db.commit()
+                if not salvate:
+                    self.lease_perso = True
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"⚠️ Impossibile salvare avanzamento upload azione {self.azione_id}: {e}")
+            finally:
+                db.close()
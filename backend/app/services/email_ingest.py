@@ -16,6 +16,7 @@ import logging
 import os
 
 from app.config import get_settings
+from app.services.raw_store import RawStore
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -200,40 +201,10 @@ SNALS Email Agent - Sistema di gestione email automatizzato
                     # Le email rimangono sul server esattamente come sono
                     response, lines, octets = conn.retr(i)
 
-                    # Parse email
-                    raw_email = b'\n'.join(lines)
-                    msg = email.message_from_bytes(raw_email)
-
-                    # Estrai informazioni
-                    message_id = msg.get('Message-ID', f'<generated-{i}@local>')
-                    subject = self._decode_header(msg.get('Subject', ''))
-                    from_addr = self._decode_header(msg.get('From', ''))
-                    to_addr = self._decode_header(msg.get('To', ''))
-                    date_str = msg.get('Date', '')
-
-                    # Parse data
-                    try:
-                        from email.utils import parsedate_to_datetime
-                        date_received = parsedate_to_datetime(date_str)
-                    except:
-                        date_received = datetime.now()
-
-                    # Estrai corpo
-                    body = self._extract_body(msg)
-
-                    # Estrai allegati (nomi e path)
-                    attachments = self._extract_attachments(msg, message_id)
-
-                    email_data = {
-                        'message_id': message_id,
-                        'mittente': from_addr,
-                        'destinatario': to_addr,
-                        'oggetto': subject,
-                        'corpo': body,
-                        'data_ricezione': date_received,
-                        'allegati_nomi': [att['filename'] for att in attachments],
-                        'allegati_path': [att['path'] for att in attachments],
-                    }
+                    # Parse email (CRLF come sul server: l'originale salvato resta verificabile)
+                    raw_email = b'\r\n'.join(lines) + b'\r\n'
+                    email_data = self.parse_message(raw_email, f'<generated-{i}@local>')
+                    subject = email_data['oggetto']
 
                     emails_data.append(email_data)
                     logger.debug(f"Scaricata email {i}/{num_messages}: {subject[:50]}")
@@ -258,6 +229,70 @@ SNALS Email Agent - Sistema di gestione email automatizzato
 
         return emails_data
 
+    def parse_message(self, raw_email: bytes, fallback_id: str) -> Dict:
+        """
+        Estrae i dati di una email dal messaggio RFC 822 e ne salva gli allegati.
+
+        Usato sia dal polling POP3 sia dall'ingest IMAP IDLE. Il messaggio
+        originale viene salvato nel RawStore.
+
+        Args:
+            raw_email: Messaggio completo
+            fallback_id: Message-ID da usare se il messaggio non ne ha uno
+
+        Returns:
+            Dict con dati email
+        """
+        data = self.parse_raw(raw_email, fallback_id)
+        data['raw_sha256'] = RawStore().salva(raw_email)
+        return data
+
+    def parse_raw(self, raw_email: bytes, fallback_id: str) -> Dict:
+        """
+        Estrae i dati di una email senza salvare l'originale.
+
+        Usato anche per riprocessare un messaggio letto dal RawStore.
+
+        Args:
+            raw_email: Messaggio completo
+            fallback_id: Message-ID da usare se il messaggio non ne ha uno
+
+        Returns:
+            Dict con dati email
+        """
+        msg = email.message_from_bytes(raw_email)
+
+        # Estrai informazioni
+        message_id = msg.get('Message-ID', fallback_id)
+        subject = self._decode_header(msg.get('Subject', ''))
+        from_addr = self._decode_header(msg.get('From', ''))
+        to_addr = self._decode_header(msg.get('To', ''))
+        date_str = msg.get('Date', '')
+
+        # Parse data
+        try:
+            from email.utils import parsedate_to_datetime
+            date_received = parsedate_to_datetime(date_str)
+        except:
+            date_received = datetime.now()
+
+        # Estrai corpo
+        body = self._extract_body(msg)
+
+        # Estrai allegati (nomi e path)
+        attachments = self._extract_attachments(msg, message_id)
+
+        return {
+            'message_id': message_id,
+            'mittente': from_addr,
+            'destinatario': to_addr,
+            'oggetto': subject,
+            'corpo': body,
+            'data_ricezione': date_received,
+            'allegati_nomi': [att['filename'] for att in attachments],
+            'allegati_path': [att['path'] for att in attachments],
+        }
+
     def _decode_header(self, header_value: str) -> str:
         """Decodifica header email"""
         if not header_value:
@@ -0,0 +1,180 @@
+"""
+Filtri SQL sui dati estratti dall'interpretazione (interpretazione_json, JSONB).
+
+Usati dalla lista email e dal rules engine per cercare email per campo
+estratto senza caricare le interpretazioni in Python:
+
+- contenimento (@>) su qualsiasi campo, servito dall'indice GIN jsonb_path_ops
+- data, scuola e luogo con indici su espressione (intervalli sulla data ISO,
+  uguaglianza senza maiuscole su scuola e luogo)
+"""
+import math
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, or_, not_, func, case, literal, false, Numeric
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.interpretazione import Interpretazione
+
+
+def campo(nome: str) -> ColumnElement:
+    """Valore testuale di un campo estratto (interpretazione_json ->> nome)."""
+    return Interpretazione.interpretazione_json[nome].astext
+
+
+def filtro_interpretazione(
+    contiene: Optional[Dict[str, Any]] = None,
+    scuola: Optional[str] = None,
+    luogo: Optional[str] = None,
+    data_da: Optional[str] = None,
+    data_a: Optional[str] = None
+) -> List[ColumnElement]:
+    """
+    Condizioni sui campi estratti, da applicare a una query con join su Interpretazione.
+
+    Args:
+        contiene: Sotto-documento che l'interpretazione deve contenere (es. {"argomento": "RSU"})
+        scuola: Scuola (uguaglianza senza maiuscole)
+        luogo: Luogo (uguaglianza senza maiuscole)
+        data_da: Data minima inclusa (AAAA-MM-GG)
+        data_a: Data massima inclusa (AAAA-MM-GG)
+
+    Returns:
+        List: Condizioni SQL (vuota se nessun filtro)
+    """
+    condizioni = []
+
+    if contiene:
+        condizioni.append(Interpretazione.interpretazione_json.contains(contiene))
+    if scuola:
+        condizioni.append(func.lower(campo('scuola')) == scuola.lower())
+    if luogo:
+        condizioni.append(func.lower(campo('luogo')) == luogo.lower())
+    if data_da:
+        condizioni.append(campo('data') >= data_da)
+    if data_a:
+        condizioni.append(campo('data') <= data_a)
+
+    return condizioni
+
+
+# Testo che float() converte e che PostgreSQL accetta anche come numeric
+NUMERO_RE = r'^[ \t\n\r\f\v]*[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?[ \t\n\r\f\v]*$'
+
+# Testo che float() potrebbe accettare ma NUMERO_RE no (inf, 1_000, cifre o spazi Unicode)
+NUMERO_DUBBIO_RE = r'inf|_|[^\x01-\x7f]'
+
+# Valori falsi per Python (RulesEngine: "not valore")
+VALORI_VUOTI = ['', 0, False, [], {}]
+
+
+def _numero(value: Any) -> Optional[float]:
+    """float(value) come nel rules engine, None se non convertibile."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def condizione_sql(nome: str, condition: str, value: Any) -> Optional[ColumnElement]:
+    """
+    Traduce una condizione del rules engine su "interpretazione.<nome>" in SQL.
+
+    Il filtro SQL è un prefiltro: deve accettare tutte le email che
+    RulesEngine._evaluate_single_condition accetta (le candidate vengono poi
+    verificate in Python). Dove str() di Python e il testo JSON di
+    PostgreSQL divergono (numeri, liste, oggetti) quei valori passano il
+    prefiltro; le condizioni non esprimibili fedelmente restituiscono None.
+
+    Args:
+        nome: Campo estratto
+        condition: Tipo condizione (uguale, contiene, regex, ...)
+        value: Valore da confrontare
+
+    Returns:
+        Optional[ColumnElement]: Condizione SQL, None se va verificata solo in Python
+
+    Raises:
+        ValueError: Condizione non riconosciuta
+    """
+    valore_json = Interpretazione.interpretazione_json[nome]
+    tipo = func.jsonb_typeof(valore_json)
+    testo = campo(nome)
+    presente = testo.isnot(None)
+    # Valori il cui str() Python differisce dal testo JSON: decide Python
+    non_testuale = tipo.in_(['number', 'array', 'object'])
+    testo_valore = str(value).lower()
+
+    if condition == 'uguale':
+        if testo_valore.startswith(('[', '{')):
+            # Confronto con il repr Python di liste e dizionari
+            return None
+        # Per scuola e luogo usa l'indice su lower(...)
+        uguale = func.lower(testo) == testo_valore
+        if _numero(value) is None:
+            return uguale
+        return or_(uguale, tipo == 'number')
+
+    if condition == 'diverso':
+        return and_(presente, or_(func.lower(testo) != testo_valore, non_testuale))
+
+    if condition in ('contiene', 'non_contiene', 'inizia_con', 'finisce_con'):
+        if condition == 'contiene':
+            filtro = testo.icontains(str(value), autoescape=True)
+        elif condition == 'non_contiene':
+            filtro = and_(presente, not_(testo.icontains(str(value), autoescape=True)))
+        elif condition == 'inizia_con':
+            filtro = testo.istartswith(str(value), autoescape=True)
+        else:
+            filtro = testo.iendswith(str(value), autoescape=True)
+        return or_(filtro, non_testuale)
+
+    if condition == 'regex':
+        # Sintassi delle regex Python e POSIX di PostgreSQL non coincidono
+        return None
+
+    if condition in ('maggiore', 'minore'):
+        numero = _numero(value)
+        if numero is None:
+            # float(value) fallisce: in Python la condizione è sempre falsa
+            return false()
+        if not math.isfinite(numero):
+            return None
+
+        # Come float(valore) in Python: numeri, booleani e testo numerico
+        valore = case(
+            (tipo == 'number', testo.cast(Numeric)),
+            (tipo == 'boolean', case((testo == 'true', 1), else_=0)),
+            (and_(tipo == 'string', testo.op('~')(NUMERO_RE)), testo.cast(Numeric)),
+            else_=None
+        )
+        # Decimal esatto del float: il confronto numeric è monotono rispetto a float()
+        soglia = literal(Decimal(numero), Numeric)
+        confronto = valore > soglia if condition == 'maggiore' else valore < soglia
+        return or_(
+            confronto,
+            and_(tipo == 'string', not_(testo.op('~')(NUMERO_RE)), testo.op('~*')(NUMERO_DUBBIO_RE))
+        )
+
+    if condition == 'in_lista':
+        valori = value if isinstance(value, list) else [value]
+        equivalenti = []
+        for v in valori:
+            equivalenti.append(v)
+            # In Python True == 1 e False == 0
+            if isinstance(v, bool):
+                equivalenti.append(int(v))
+            elif isinstance(v, (int, float)) and v in (0, 1):
+                equivalenti.append(bool(v))
+        return or_(*[Interpretazione.interpretazione_json.contains({nome: v}) for v in equivalenti])
+
+    if condition == 'vuoto':
+        # Falsi per Python: '', 0, false, [], {} (JSON null = campo assente)
+        return valore_json.in_([literal(v, JSONB) for v in VALORI_VUOTI])
+
+    if condition == 'non_vuoto':
+        return and_(presente, valore_json.notin_([literal(v, JSONB) for v in VALORI_VUOTI]))
+
+    raise ValueError(f"Condizione non riconosciuta: {condition}")
@@ -0,0 +1,353 @@
+"""
+Ingest email in push con IMAP IDLE.
+
+Alternativa al polling POP3 periodico: una connessione IMAP persistente per
+casella resta in IDLE (RFC 2177) e, appena il server annuncia nuovi messaggi
+(EXISTS), scarica i soli UID successivi all'ultimo elaborato e li passa alla
+stessa pipeline di categorizzazione/interpretazione del polling.
+
+Lo stato (UIDVALIDITY, UIDNEXT, ultimo UID) è salvato in stato_caselle, così
+un riavvio riprende da dove si era fermato senza riscaricare la casella.
+"""
+import re
+import time
+import select
+import logging
+import threading
+from imaplib import IMAP4, IMAP4_SSL
+from typing import List, Dict, Optional, Tuple
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models.email import AccountType
+from app.models.stato_casella import StatoCasella
+from app.services.email_ingest import EmailNormalClient, EmailPECClient
+from app.integrations.webmail_client import imap_account_settings
+from app.integrations.imap_pool import refresh_capabilities
+from app.tasks.email_polling import process_incoming_emails
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+EXISTS_RE = re.compile(rb'^\* \d+ EXISTS')
+FETCH_UID_RE = re.compile(rb'UID (\d+)')
+
+
+class ImapIdleIngest:
+    """Ingest IMAP IDLE di una casella."""
+
+    def __init__(self, account_type: AccountType, folder: Optional[str] = None):
+        """
+        Inizializza l'ingest.
+
+        Args:
+            account_type: Account da monitorare
+            folder: Cartella da monitorare (default IMAP_INGEST_FOLDER)
+        """
+        self.account_type = account_type
+        self.folder = folder or settings.IMAP_INGEST_FOLDER
+        self.host, self.port, self.user, self.password = imap_account_settings(account_type.value)
+
+        # Parsing messaggi e salvataggio allegati condivisi con il polling POP3
+        self.parser = EmailPECClient() if account_type == AccountType.PEC else EmailNormalClient()
+
+        self.conn: Optional[IMAP4] = None
+        self._stop = threading.Event()
+
+    def run_forever(self):
+        """Ciclo principale: connessione, recupero arretrati, IDLE; riconnette sugli errori."""
+        delay = 1
+
+        while not self._stop.is_set():
+            try:
+                self._connect()
+                delay = 1
+
+                while not self._stop.is_set():
+                    self.fetch_new()
+                    self._wait_for_changes()
+
+            except Exception as e:
+                logger.error(f"❌ Ingest IMAP {self.account_type.value} interrotto: {e}")
+                self._close()
+                self._stop.wait(delay)
+                delay = min(delay * 2, settings.IMAP_IDLE_RECONNECT_DELAY)
+
+        self._close()
+
+    def stop(self):
+        """Richiede l'arresto del ciclo (entro il prossimo timeout IDLE)."""
+        self._stop.set()
+
+    def _connect(self):
+        """Apre la connessione e seleziona la cartella in sola lettura."""
+        self.conn = IMAP4_SSL(self.host, self.port, timeout=settings.IMAP_TIMEOUT)
+        self.conn.login(self.user, self.password)
+        refresh_capabilities(self.conn)
+        self._select()
+
+        logger.info(f"✅ Ingest IMAP {self.account_type.value} connesso: {self.user}@{self.host}/{self.folder}")
+
+    def _select(self) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Seleziona la cartella in sola lettura e legge UIDVALIDITY e UIDNEXT.
+
+        I codici vengono letti subito dalla risposta di questo EXAMINE:
+        response() li consuma, quindi non si possono rileggere al giro dopo.
+
+        Returns:
+            Tuple: (UIDVALIDITY, UIDNEXT), None se il server non li annuncia
+        """
+        status, data = self.conn.select(self.folder, readonly=True)
+        if status != 'OK':
+            raise IMAP4.error(f"Cartella {self.folder} non disponibile: {data}")
+
+        uidvalidity = self._response_int('UIDVALIDITY')
+        uidnext = self._response_int('UIDNEXT')
+        # Le untagged di SELECT/NOOP (EXISTS, RECENT, FETCH) non servono oltre:
+        # sulla connessione persistente si accumulerebbero senza limite
+        self.conn.untagged_responses.clear()
+        return uidvalidity, uidnext
+
+    def _close(self):
+        """Chiude la connessione ignorando errori."""
+        if self.conn:
+            try:
+                self.conn.logout()
+            except Exception:
+                pass
+        self.conn = None
+
+    def fetch_new(self) -> int:
+        """
+        Scarica ed elabora i messaggi con UID successivo all'ultimo elaborato.
+
+        I messaggi sono scaricati ed elaborati a blocchi di IMAP_FETCH_CHUNK,
+        salvando l'ultimo UID dopo ogni blocco: dopo un fermo prolungato
+        l'arretrato non viene caricato tutto in memoria e un errore non
+        costringe a rielaborare i blocchi già salvati.
+
+        Returns:
+            int: Numero di messaggi elaborati
+        """
+        # Nuovo EXAMINE a ogni giro: UIDVALIDITY e UIDNEXT sempre aggiornati
+        uidvalidity, uidnext = self._select()
+
+        db = SessionLocal()
+        try:
+            stato = db.query(StatoCasella).filter(
+                StatoCasella.account_type == self.account_type,
+                StatoCasella.cartella == self.folder
+            ).first()
+
+            if stato is None:
+                stato = StatoCasella(account_type=self.account_type, cartella=self.folder, ultimo_uid=0)
+                db.add(stato)
+
+            if uidvalidity is not None and stato.uidvalidity != uidvalidity:
+                # Prima sincronizzazione o UID rinumerati: si riparte dagli ultimi
+                # EMAIL_FETCH_LIMIT messaggi (i duplicati sono scartati per Message-ID)
+                if stato.uidvalidity is not None:
+                    logger.warning(f"⚠️ UIDVALIDITY cambiato per {self.account_type.value}/{self.folder}")
+                stato.uidvalidity = uidvalidity
+                stato.ultimo_uid = self._initial_uid()
+
+            # Senza UIDVALIDITY dal server si usa l'ultimo noto per i Message-ID di ripiego
+            uidvalidity = stato.uidvalidity
+            uids = self._new_uids(stato.ultimo_uid or 0)
+            elaborati = 0
+
+            for start in range(0, len(uids), settings.IMAP_FETCH_CHUNK):
+                blocco = uids[start:start + settings.IMAP_FETCH_CHUNK]
+                messages = self._fetch_messages(blocco)
+
+                if messages:
+                    emails_data = [
+                        self.parser.parse_message(raw, f'<imap-{self.account_type.value}-{uidvalidity}-{uid}@local>')
+                        for uid, raw in messages
+                    ]
+                    nuove = process_incoming_emails(emails_data, self.account_type)
+                    elaborati += len(messages)
+                    logger.info(f"✅ Ingest IMAP {self.account_type.value}: {len(messages)} messaggi, {len(nuove)} nuove email")
+
+                # Anche i messaggi spariti tra SEARCH e FETCH sono superati
+                stato.ultimo_uid = blocco[-1]
+                db.commit()
+
+            stato.uidnext = max(uidnext or 0, (stato.ultimo_uid or 0) + 1)
+            db.commit()
+            return elaborati
+
+        finally:
+            db.close()
+
+    def _initial_uid(self) -> int:
+        """UID da cui partire alla prima sincronizzazione."""
+        status, data = self.conn.uid('SEARCH', None, 'ALL')
+        if status != 'OK' or not data or not data[0]:
+            return 0
+
+        uids = [int(uid) for uid in data[0].split()]
+        recenti = uids[-settings.EMAIL_FETCH_LIMIT:]
+        return recenti[0] - 1 if recenti else 0
+
+    def _new_uids(self, ultimo_uid: int) -> List[int]:
+        """
+        UID dei messaggi successivi a ultimo_uid, in ordine crescente.
+
+        Args:
+            ultimo_uid: Ultimo UID già elaborato
+
+        Returns:
+            List[int]: UID da scaricare
+        """
+        status, data = self.conn.uid('SEARCH', None, f'UID {ultimo_uid + 1}:*')
+        if status != 'OK':
+            raise IMAP4.error(f"UID SEARCH fallito: {data}")
+
+        # "N:*" comprende sempre l'ultimo messaggio, anche se già elaborato
+        uids = [int(uid) for uid in (data[0] or b'').split()] if data else []
+        return sorted(uid for uid in uids if uid > ultimo_uid)
+
+    def _fetch_messages(self, uids: List[int]) -> List[Tuple[int, bytes]]:
+        """
+        Scarica con un solo UID FETCH un blocco di messaggi.
+
+        BODY.PEEK non imposta il flag \\Seen: la casella resta invariata.
+
+        Args:
+            uids: UID da scaricare
+
+        Returns:
+            List[Tuple[int, bytes]]: (UID, messaggio) in ordine di UID
+        """
+        status, data = self.conn.uid('FETCH', ','.join(str(uid) for uid in uids), '(UID BODY.PEEK[])')
+
+        if status != 'OK':
+            raise IMAP4.error(f"UID FETCH fallito: {data}")
+
+        richiesti = set(uids)
+        messages = []
+        for item in data:
+            if not isinstance(item, tuple):
+                continue
+            match = FETCH_UID_RE.search(item[0])
+            if match and int(match.group(1)) in richiesti:
+                messages.append((int(match.group(1)), item[1]))
+
+        return sorted(messages)
+
+    def _response_int(self, code: str) -> Optional[int]:
+        """Legge (e consuma) un codice di risposta numerico (UIDVALIDITY, UIDNEXT) dell'ultimo SELECT."""
+        _, data = self.conn.response(code)
+        try:
+            return int(data[-1])
+        except (TypeError, ValueError, IndexError):
+            return None
+
+    def _wait_for_changes(self):
+        """Attende nuovi messaggi con IDLE, o con NOOP periodici se il server non lo supporta."""
+        if 'IDLE' in self.conn.capabilities:
+            self._idle(settings.IMAP_IDLE_TIMEOUT)
+        else:
+            self._stop.wait(settings.EMAIL_POLL_INTERVAL)
+
+        # NOOP aggiorna EXISTS/UIDNEXT e verifica che la connessione sia viva
+        status, _ = self.conn.noop()
+        if status != 'OK':
+            raise IMAP4.abort("NOOP fallito")
+
+    def _idle(self, timeout: float) -> bool:
+        """
+        Esegue IDLE fino a un annuncio EXISTS o al timeout, poi DONE.
+
+        imaplib non supporta IDLE (fino a Python 3.14): il comando viene
+        inviato a mano e la connessione letta direttamente dal socket, così
+        select() può attendere senza bloccare oltre il timeout.
+
+        Args:
+            timeout: Secondi massimi in IDLE
+
+        Returns:
+            bool: True se il server ha annunciato nuovi messaggi
+        """
+        conn = self.conn
+        tag = conn._new_tag()
+        conn.send(tag + b' IDLE\r\n')
+
+        buffer = bytearray()
+        line = self._read_line(buffer, time.monotonic() + settings.IMAP_TIMEOUT)
+        if line is None or not line.startswith(b'+'):
+            raise IMAP4.abort(f"IDLE rifiutato: {line!r}")
+
+        nuovi = False
+        deadline = time.monotonic() + timeout
+        while not self._stop.is_set():
+            # Risveglio periodico per controllare la richiesta di arresto
+            line = self._read_line(buffer, min(deadline, time.monotonic() + 5))
+            if line is None:
+                if time.monotonic() >= deadline:
+                    break
+                continue
+            if line.startswith(b'* BYE'):
+                raise IMAP4.abort("Il server ha chiuso la connessione")
+            if EXISTS_RE.match(line):
+                nuovi = True
+                break
+
+        conn.send(b'DONE\r\n')
+
+        # Attende la risposta taggata dell'IDLE (le untagged nel mezzo sono ignorate)
+        while True:
+            line = self._read_line(buffer, time.monotonic() + settings.IMAP_TIMEOUT)
+            if line is None:
+                raise IMAP4.abort("Nessuna risposta a DONE")
+            if line.startswith(tag + b' '):
+                conn.tagged_commands.pop(tag, None)
+                if not line[len(tag):].lstrip().startswith(b'OK'):
+                    raise IMAP4.abort(f"IDLE terminato con errore: {line!r}")
+                return nuovi
+
+    def _read_line(self, buffer: bytearray, deadline: float) -> Optional[bytes]:
+        """
+        Legge una riga dal socket entro deadline.
+
+        Args:
+            buffer: Dati già letti e non ancora consumati
+            deadline: Istante limite (time.monotonic)
+
+        Returns:
+            Optional[bytes]: Riga senza CRLF, None al timeout
+        """
+        sock = self.conn.sock
+
+        while b'\r\n' not in buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+
+            # Con TLS i dati possono essere già decifrati nel buffer SSL
+            pending = sock.pending() if hasattr(sock, 'pending') else 0
+            if not pending:
+                readable, _, _ = select.select([sock], [], [], remaining)
+                if not readable:
+                    return None
+
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise IMAP4.abort("Connessione chiusa dal server")
+            buffer.extend(chunk)
+
+        line, _, rest = bytes(buffer).partition(b'\r\n')
+        buffer[:] = rest
+        return line
+
+
+def configured_mailboxes() -> List[AccountType]:
+    """Restituisce gli account con una configurazione IMAP completa."""
+    mailboxes = []
+    for account_type in (AccountType.NORMALE, AccountType.PEC):
+        host, _, user, password = imap_account_settings(account_type.value)
+        if host and user and password:
+            mailboxes.append(account_type)
+    return mailboxes
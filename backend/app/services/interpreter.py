@@ -33,7 +33,7 @@ Allegati: {', '.join(allegati) if allegati else 'nessuno'}
 Data oggi: {data_oggi}
 
 Estrai tutte le informazioni rilevanti in formato JSON.
-Per convocazioni estrai: data, ora, luogo, scuola, argomento.
+Per convocazioni estrai: data (AAAA-MM-GG), ora (HH:MM), luogo, scuola, argomento.
 Per richieste appuntamento: disponibilità, argomento, modalità.
 
 Rispondi SOLO con JSON valido."""
@@ -0,0 +1,228 @@
+"""
+Partizioni - Partizionamento mensile per range di emails e log_sistema.
+
+Ogni tabella ha una partizione per mese (es. emails_p2026_10) più una
+partizione di default per le righe fuori range (es. header Date errati).
+Le query con filtro sulla data leggono solo le partizioni interessate e le
+liste ordinate per data partono dalle partizioni più recenti.
+
+La manutenzione periodica crea in anticipo le partizioni dei mesi futuri e
+applica la retention: le partizioni vecchie di emails vengono staccate (la
+tabella resta come archivio, fuori dalle query), quelle di log_sistema
+eliminate. Le tabelle che riferiscono le email (senza foreign key verso la
+tabella partizionata) seguono la partizione nella stessa transazione: le
+righe collegate vengono spostate in tabelle di archivio accanto alla
+partizione staccata (es. emails_p2024_01_azioni), senza lasciare azioni o
+interpretazioni orfane.
+"""
+import re
+import logging
+from typing import Dict, List
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Tabella partizionata -> colonna chiave di partizione
+TABELLE_PARTIZIONATE = {
+    'emails': 'data_ricezione',
+    'log_sistema': 'timestamp',
+}
+
+# Tabelle con le righe di ogni email (email_id), archiviate con la partizione.
+# Le righe outbox delle azioni seguono per ON DELETE CASCADE
+DIPENDENTI_EMAILS = ('interpretazioni', 'azioni', 'archivio_frammenti')
+
+# Tabelle che riferiscono le email senza dipenderne: il riferimento viene tolto
+RIFERIMENTI_EMAILS = ('eventi_calendario',)
+
+
+def inizio_mese(giorno: date) -> date:
+    """Primo giorno del mese."""
+    return date(giorno.year, giorno.month, 1)
+
+
+def aggiungi_mesi(mese: date, mesi: int) -> date:
+    """Primo giorno del mese spostato di n mesi (anche negativi)."""
+    indice = mese.year * 12 + mese.month - 1 + mesi
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def nome_partizione(tabella: str, mese: date) -> str:
+    """Nome della partizione mensile (es. emails_p2026_10)."""
+    return f"{tabella}_p{mese:%Y_%m}"
+
+
+def elenca_partizioni(db: Session, tabella: str) -> Dict[date, str]:
+    """
+    Partizioni mensili attaccate a una tabella.
+
+    Returns:
+        Dict: {primo giorno del mese: nome partizione}, esclusa la default
+    """
+    nomi = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:tabella AS regclass)"
+    ), {'tabella': tabella}).scalars()
+
+    pattern = re.compile(rf"^{tabella}_p(\d{{4}})_(\d{{2}})$")
+    partizioni = {}
+    for nome in nomi:
+        match = pattern.match(nome)
+        if match:
+            partizioni[date(int(match.group(1)), int(match.group(2)), 1)] = nome
+    return partizioni
+
+
+def crea_partizione(db: Session, tabella: str, mese: date) -> bool:
+    """
+    Crea la partizione di un mese, se manca.
+
+    Se la partizione di default contiene già righe del mese (inserite prima
+    che la partizione esistesse) vengono spostate nella nuova partizione,
+    con i trigger disattivati: i contatori statistici non cambiano.
+
+    Args:
+        db: Sessione database (commit a carico del chiamante)
+        tabella: Tabella partizionata
+        mese: Primo giorno del mese
+
+    Returns:
+        bool: True se la partizione è stata creata
+    """
+    mese = inizio_mese(mese)
+    if mese in elenca_partizioni(db, tabella):
+        return False
+
+    colonna = TABELLE_PARTIZIONATE[tabella]
+    nome = nome_partizione(tabella, mese)
+    default = f"{tabella}_default"
+    limiti = {'da': mese, 'a': aggiungi_mesi(mese, 1)}
+    valori = f"FROM ('{limiti['da']}') TO ('{limiti['a']}')"
+    nel_mese = f"{colonna} >= :da AND {colonna} < :a"
+
+    da_spostare = db.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {nel_mese})"), limiti
+    ).scalar()
+
+    if not da_spostare:
+        db.execute(text(f"CREATE TABLE {nome} PARTITION OF {tabella} FOR VALUES {valori}"))
+    else:
+        colonne = ", ".join(db.execute(text(
+            "SELECT quote_ident(column_name) FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :tabella AND is_generated = 'NEVER' "
+            "ORDER BY ordinal_position"
+        ), {'tabella': tabella}).scalars())
+
+        db.execute(text(
+            f"CREATE TABLE {nome} (LIKE {tabella} INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING CONSTRAINTS)"
+        ))
+        db.execute(text(f"ALTER TABLE {default} DISABLE TRIGGER USER"))
+        db.execute(text(
+            f"WITH spostate AS (DELETE FROM {default} WHERE {nel_mese} RETURNING {colonne}) "
+            f"INSERT INTO {nome} ({colonne}) SELECT {colonne} FROM spostate"
+        ), limiti)
+        db.execute(text(f"ALTER TABLE {default} ENABLE TRIGGER USER"))
+        db.execute(text(f"ALTER TABLE {tabella} ATTACH PARTITION {nome} FOR VALUES {valori}"))
+        logger.warning(f"⚠️ Righe di {mese:%Y-%m} spostate da {default} a {nome}")
+
+    logger.info(f"✅ Creata partizione {nome}")
+    return True
+
+
+def stacca_partizioni(db: Session, tabella: str, mesi_da_tenere: int, elimina: bool) -> List[str]:
+    """
+    Retention: stacca le partizioni più vecchie di mesi_da_tenere.
+
+    Args:
+        db: Sessione database
+        tabella: Tabella partizionata
+        mesi_da_tenere: Mesi attivi, mese corrente compreso
+        elimina: True per eliminare le partizioni staccate, False per archiviarle
+
+    Returns:
+        List[str]: Partizioni staccate
+    """
+    limite = aggiungi_mesi(inizio_mese(date.today()), 1 - mesi_da_tenere)
+    staccate = []
+
+    for mese, nome in sorted(elenca_partizioni(db, tabella).items()):
+        if mese >= limite:
+            break
+        if tabella == 'emails':
+            stacca_dipendenti(db, nome, elimina)
+        db.execute(text(f"ALTER TABLE {tabella} DETACH PARTITION {nome}"))
+        if elimina:
+            db.execute(text(f"DROP TABLE {nome}"))
+        # Commit per partizione: il lock esclusivo sulla tabella dura poco
+        db.commit()
+        staccate.append(nome)
+        logger.info(f"✅ Partizione {nome} {'eliminata' if elimina else 'staccata e archiviata'}")
+
+    return staccate
+
+
+def stacca_dipendenti(db: Session, partizione: str, elimina: bool):
+    """
+    Sposta (o elimina) le righe collegate alle email di una partizione di emails.
+
+    Va chiamata nella transazione che stacca la partizione. I trigger utente
+    sono disattivati come nello spostamento da default: i contatori
+    statistici non cambiano, come per le email staccate.
+
+    Args:
+        db: Sessione database (commit a carico del chiamante)
+        partizione: Partizione di emails da staccare
+        elimina: True per eliminare le righe, False per archiviarle in {partizione}_{tabella}
+    """
+    email_ids = f"email_id IN (SELECT id FROM {partizione})"
+
+    for dipendente in DIPENDENTI_EMAILS:
+        db.execute(text(f"ALTER TABLE {dipendente} DISABLE TRIGGER USER"))
+        if elimina:
+            db.execute(text(f"DELETE FROM {dipendente} WHERE {email_ids}"))
+        else:
+            archivio = f"{partizione}_{dipendente}"
+            db.execute(text(f"CREATE TABLE {archivio} (LIKE {dipendente} INCLUDING DEFAULTS)"))
+            db.execute(text(
+                f"WITH spostate AS (DELETE FROM {dipendente} WHERE {email_ids} RETURNING *) "
+                f"INSERT INTO {archivio} SELECT * FROM spostate"
+            ))
+        db.execute(text(f"ALTER TABLE {dipendente} ENABLE TRIGGER USER"))
+
+    for riferimento in RIFERIMENTI_EMAILS:
+        db.execute(text(f"UPDATE {riferimento} SET email_id = NULL WHERE {email_ids}"))
+
+
+def manutenzione_partizioni(db: Session) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Crea le partizioni dei prossimi mesi e applica la retention.
+
+    Returns:
+        Dict: Per tabella, partizioni create e staccate
+    """
+    corrente = inizio_mese(date.today())
+    risultato = {}
+
+    for tabella in TABELLE_PARTIZIONATE:
+        create = []
+        for offset in range(settings.PARTITION_MONTHS_AHEAD + 1):
+            mese = aggiungi_mesi(corrente, offset)
+            if crea_partizione(db, tabella, mese):
+                create.append(nome_partizione(tabella, mese))
+            db.commit()
+        risultato[tabella] = {'create': create, 'staccate': []}
+
+    if settings.EMAIL_HOT_MONTHS > 0:
+        risultato['emails']['staccate'] = stacca_partizioni(db, 'emails', settings.EMAIL_HOT_MONTHS, elimina=False)
+    if settings.LOG_RETENTION_MONTHS > 0:
+        risultato['log_sistema']['staccate'] = stacca_partizioni(
+            db, 'log_sistema', settings.LOG_RETENTION_MONTHS, elimina=True
+        )
+
+    return risultato
@@ -0,0 +1,102 @@
+"""
+Raw Store - Messaggi RFC 822 originali, compressi e indirizzati per contenuto.
+
+Ogni messaggio scaricato viene salvato una sola volta come
+{RAW_STORE_PATH}/ab/cd/<sha256>.zst: lo stesso messaggio ricevuto più volte
+(o su più caselle) occupa un solo file. La scrittura passa da un file
+temporaneo rinominato atomicamente, quindi un lettore non vede mai un file
+parziale; la lettura mappa il file in memoria e lo decomprime senza copie
+intermedie.
+
+Permette di riprocessare, riestrarre gli allegati e verificare i messaggi
+PEC senza riscaricarli dal server.
+"""
+import os
+import mmap
+import hashlib
+import logging
+import tempfile
+from typing import Optional
+
+import zstandard
+
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class RawStore:
+    """Archivio dei messaggi originali indirizzato per SHA-256."""
+
+    def __init__(self, base_path: Optional[str] = None):
+        """
+        Args:
+            base_path: Directory dello store (default RAW_STORE_PATH)
+        """
+        self.base_path = base_path or settings.RAW_STORE_PATH
+
+    def path(self, sha256: str) -> str:
+        """Path del messaggio compresso (due livelli di directory per non affollarne una)."""
+        return os.path.join(self.base_path, sha256[:2], sha256[2:4], f"{sha256}.zst")
+
+    def esiste(self, sha256: str) -> bool:
+        return os.path.isfile(self.path(sha256))
+
+    def salva(self, raw: bytes) -> str:
+        """
+        Salva un messaggio se non è già presente.
+
+        Args:
+            raw: Messaggio RFC 822 completo
+
+        Returns:
+            str: SHA-256 del messaggio (chiave per rileggerlo)
+        """
+        sha256 = hashlib.sha256(raw).hexdigest()
+        path = self.path(sha256)
+        if os.path.isfile(path):
+            return sha256
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(zstandard.ZstdCompressor(level=settings.RAW_STORE_ZSTD_LEVEL).compress(raw))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+        logger.debug(f"Salvato messaggio originale {sha256}")
+        return sha256
+
+    def leggi(self, sha256: str, verifica: bool = True) -> bytes:
+        """
+        Legge un messaggio originale.
+
+        Args:
+            sha256: Chiave restituita da salva
+            verifica: Controlla che il contenuto corrisponda all'hash
+
+        Returns:
+            bytes: Messaggio RFC 822
+
+        Raises:
+            FileNotFoundError: Messaggio non presente nello store
+            ValueError: Contenuto diverso da quello salvato
+        """
+        with open(self.path(sha256), 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as compresso:
+                raw = zstandard.ZstdDecompressor().decompress(compresso)
+
+        if verifica and hashlib.sha256(raw).hexdigest() != sha256:
+            raise ValueError(f"Messaggio originale corrotto: {sha256}")
+        return raw
@@ -6,12 +6,15 @@ FASE 7: Rules Engine
 import logging
 import re
 from typing import List, Dict, Any, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session, contains_eager, joinedload
 from datetime import datetime
 
 from app.models.regola import Regola
 from app.models.email import Email, EmailCategory
 from app.models.azione import Azione, TipoAzione, StatoAzione
+from app.models.interpretazione import Interpretazione
+from app.services.filtri_interpretazione import condizione_sql
 
 logger = logging.getLogger(__name__)
 
@@ -196,7 +199,7 @@ class RulesEngine:
             'mittente': email.mittente,
             'destinatario': email.destinatario,
             'oggetto': email.oggetto,
-            'corpo': email.corpo_testo,
+            'corpo': email.corpo,
             'categoria': email.categoria.value if email.categoria else None,
             'account_type': email.account_type.value if email.account_type else None,
             'has_allegati': len(email.allegati) > 0 if email.allegati else False,
@@ -207,7 +210,7 @@ class RulesEngine:
         # Gestisci campi interpretazione
         if field.startswith('interpretazione.') and email.interpretazione:
             int_field = field.replace('interpretazione.', '')
-            return email.interpretazione.dati_estratti.get(int_field)
+            return email.interpretazione.interpretazione_json.get(int_field)
 
         return field_map.get(field)
 
@@ -304,7 +307,7 @@ class RulesEngine:
                 'date': params.get('date'),
                 'time': params.get('time'),
                 'location': params.get('location'),
-                'description': email.corpo_testo[:500],
+                'description': (email.corpo or '')[:500],
                 'from_rule': True
             }
         )
@@ -378,13 +381,63 @@ class RulesEngine:
 
         # Sostituisci variabili interpretazione
         if email.interpretazione:
-            for key, value in email.interpretazione.dati_estratti.items():
+            for key, value in (email.interpretazione.interpretazione_json or {}).items():
                 var_name = f'{{interpretazione.{key}}}'
                 if var_name in result:
                     result = result.replace(var_name, str(value))
 
         return result
 
+    def cerca_email(self, condizioni: Dict, limite: int = 50) -> List[Email]:
+        """
+        Email (più recenti prima) che soddisfano le condizioni di una regola.
+
+        Le condizioni sui campi estratti (interpretazione.*) sono tradotte in
+        un prefiltro SQL che usa gli indici JSONB; tutte le condizioni vengono
+        poi verificate in Python sulle sole email candidate.
+
+        Args:
+            condizioni: Condizioni nel formato delle regole
+            limite: Numero massimo di email
+
+        Returns:
+            List[Email]: Email che soddisfano le condizioni
+        """
+        rules = (condizioni or {}).get('rules', [])
+        prefisso = 'interpretazione.'
+        sql = [
+            condizione_sql(rule['field'][len(prefisso):], rule.get('condition'), rule.get('value'))
+            for rule in rules if (rule.get('field') or '').startswith(prefisso)
+        ]
+
+        # Con OR il filtro SQL è valido solo se tutte le condizioni sono tradotte;
+        # con AND si tengono quelle tradotte (None = verificata solo in Python)
+        if condizioni.get('operator', 'AND') == 'OR' and (len(sql) != len(rules) or any(c is None for c in sql)):
+            sql = []
+        sql = [condizione for condizione in sql if condizione is not None]
+
+        if sql:
+            filtro = or_(*sql) if condizioni.get('operator') == 'OR' else and_(*sql)
+            stmt = select(Email).join(
+                Interpretazione, Interpretazione.email_id == Email.id
+            ).options(contains_eager(Email.interpretazione)).where(filtro)
+        else:
+            stmt = select(Email).options(joinedload(Email.interpretazione))
+
+        stmt = stmt.order_by(Email.data_ricezione.desc(), Email.id.desc())
+        trovate = []
+        result = self.db.scalars(stmt.execution_options(yield_per=200))
+        try:
+            for email in result:
+                if self._evaluate_conditions(email, condizioni):
+                    trovate.append(email)
+                    if len(trovate) >= limite:
+                        break
+        finally:
+            result.close()
+
+        return trovate
+
     def test_rule(self, regola_id: int, email_id: int) -> Dict:
         """
         Testa una regola su una email specifica (senza eseguire azioni).
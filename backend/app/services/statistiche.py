@@ -0,0 +1,156 @@
+"""
+Statistiche - Contatori giornalieri precalcolati per la dashboard.
+
+I trigger PostgreSQL su emails e azioni accodano le variazioni in
+statistiche_delta (append-only, nessun lock su righe condivise); il
+consolidamento periodico le somma in statistiche_giornaliere. Le API
+leggono contatori più variazioni pendenti (poche righe per giorno) invece
+di scansionare e raggruppare le tabelle di origine. Il rollup ricalcola
+gli ultimi giorni dalle tabelle di origine e corregge eventuali derive
+(es. modifiche fatte con i trigger disabilitati).
+"""
+import logging
+from typing import Dict, Optional
+from datetime import date, timedelta
+
+from sqlalchemy import Date, cast, func, select, text, union_all
+from sqlalchemy.orm import Session
+
+from app.models.email import Email
+from app.models.azione import Azione
+from app.models.statistica import StatisticaGiornaliera, StatisticaDelta
+
+logger = logging.getLogger(__name__)
+
+# Entità -> (modello, colonna del giorno, dimensioni); deve corrispondere
+# ai trigger della migrazione statistiche_giornaliere
+SORGENTI = {
+    'email': (Email, Email.data_ricezione, ('categoria', 'stato', 'account_type')),
+    'azione': (Azione, Azione.timestamp_inizio, ('stato', 'tipo')),
+}
+
+# Somma le variazioni pendenti nei contatori; i bucket sono scritti in
+# ordine di chiave, quindi due consolidamenti concorrenti non si incrociano
+CONSOLIDA_DELTA = text("""
+WITH consolidati AS (
+    DELETE FROM statistiche_delta RETURNING giorno, entita, dimensione, valore, delta
+)
+INSERT INTO statistiche_giornaliere (giorno, entita, dimensione, valore, conteggio)
+SELECT giorno, entita, dimensione, valore, sum(delta) FROM consolidati
+GROUP BY giorno, entita, dimensione, valore
+HAVING sum(delta) <> 0
+ORDER BY giorno, entita, dimensione, valore
+ON CONFLICT ON CONSTRAINT uq_statistica_bucket
+DO UPDATE SET conteggio = statistiche_giornaliere.conteggio + EXCLUDED.conteggio
+""")
+
+
+def contatori(db: Session, entita: str, da: Optional[date] = None, a: Optional[date] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Somma i contatori giornalieri di un'entità.
+
+    Args:
+        db: Sessione database
+        entita: 'email' o 'azione'
+        da: Primo giorno incluso (None: dall'inizio)
+        a: Ultimo giorno incluso (None: fino a oggi)
+
+    Returns:
+        Dict: {dimensione: {valore: conteggio}}, valori degli enum per nome
+    """
+    righe = []
+    for model, conteggio in (
+        (StatisticaGiornaliera, StatisticaGiornaliera.conteggio),
+        (StatisticaDelta, StatisticaDelta.delta),
+    ):
+        query = select(
+            model.dimensione, model.valore, conteggio.label('conteggio')
+        ).where(model.entita == entita)
+        if da:
+            query = query.where(model.giorno >= da)
+        if a:
+            query = query.where(model.giorno <= a)
+        righe.append(query)
+
+    # Contatori consolidati più variazioni non ancora consolidate
+    sorgente = union_all(*righe).subquery()
+    totale = func.sum(sorgente.c.conteggio)
+    query = select(sorgente.c.dimensione, sorgente.c.valore, totale.label('conteggio')).group_by(
+        sorgente.c.dimensione, sorgente.c.valore
+    ).having(totale != 0)
+
+    risultato: Dict[str, Dict[str, int]] = {}
+    for row in db.execute(query):
+        risultato.setdefault(row.dimensione, {})[row.valore] = int(row.conteggio)
+    return risultato
+
+
+def consolida_statistiche(db: Session) -> int:
+    """
+    Somma le variazioni accodate dai trigger nei contatori giornalieri.
+
+    Le variazioni consolidate sono eliminate nella stessa istruzione: quelle
+    accodate nel frattempo restano per il consolidamento successivo.
+
+    Args:
+        db: Sessione database
+
+    Returns:
+        int: Contatori aggiornati
+    """
+    aggiornati = db.execute(CONSOLIDA_DELTA).rowcount
+    db.commit()
+
+    if aggiornati:
+        logger.info(f"📊 Statistiche consolidate: {aggiornati} contatori")
+    return aggiornati
+
+
+def rollup_statistiche(db: Session, giorni: int) -> int:
+    """
+    Ricalcola dalle tabelle di origine i contatori degli ultimi giorni.
+
+    Le variazioni restano bloccate in scrittura fino al commit: i trigger
+    delle transazioni concorrenti attendono, così nessuna variazione va
+    persa o contata due volte tra il ricalcolo e la sostituzione dei
+    contatori. Le variazioni pendenti sono consolidate per prime.
+
+    Args:
+        db: Sessione database
+        giorni: Giorni da ricalcolare, oggi compreso
+
+    Returns:
+        int: Contatori riscritti
+    """
+    da = date.today() - timedelta(days=giorni - 1)
+
+    db.execute(text("LOCK TABLE statistiche_delta IN EXCLUSIVE MODE"))
+    db.execute(CONSOLIDA_DELTA)
+    db.query(StatisticaGiornaliera).filter(
+        StatisticaGiornaliera.giorno >= da
+    ).delete(synchronize_session=False)
+
+    righe = []
+    for entita, (model, colonna_giorno, dimensioni) in SORGENTI.items():
+        giorno = cast(colonna_giorno, Date)
+        for dimensione in dimensioni:
+            colonna = getattr(model, dimensione)
+            conteggi = db.query(giorno.label('giorno'), colonna, func.count()).filter(
+                colonna_giorno >= da,
+                colonna.isnot(None)
+            ).group_by(giorno, colonna).all()
+
+            righe.extend({
+                'giorno': g,
+                'entita': entita,
+                'dimensione': dimensione,
+                'valore': valore.name,
+                'conteggio': conteggio
+            } for g, valore, conteggio in conteggi)
+
+    if righe:
+        db.bulk_insert_mappings(StatisticaGiornaliera, righe)
+    db.commit()
+
+    logger.info(f"✅ Statistiche ricalcolate dal {da}: {len(righe)} contatori")
+    return len(righe)
@@ -4,6 +4,7 @@ Celery app configuration
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import after_setup_logger, worker_process_shutdown
 from app.config import get_settings
 
 settings = get_settings()
@@ -15,6 +16,10 @@ celery_app = Celery(
     include=[
         'app.tasks.email_polling',
         'app.tasks.action_tasks',
+        'app.tasks.calendar_tasks',
+        'app.tasks.stats_tasks',
+        'app.tasks.partition_tasks',
+        'app.tasks.archive_tasks',
     ]
 )
 
@@ -24,23 +29,100 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='Europe/Rome',
     enable_utc=True,
+    # Ack dopo l'esecuzione: un task perso per crash del worker torna in coda
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    # Task lunghi (upload, LLM): niente prefetch oltre il task in corso
+    worker_prefetch_multiplier=1,
 )
 
+# Code per integrazione: ogni worker pool consuma solo la propria coda,
+# così un upload Drive lento non blocca il salvataggio delle bozze IMAP
+ACTION_QUEUES = {
+    'imap': 'azioni_imap',
+    'drive': 'azioni_drive',
+    'calendar': 'azioni_calendar',
+    'llm': 'azioni_llm',
+}
+
+ACTION_POOL_CONCURRENCY = {
+    'imap': settings.ACTION_CONCURRENCY_IMAP,
+    'drive': settings.ACTION_CONCURRENCY_DRIVE,
+    'calendar': settings.ACTION_CONCURRENCY_CALENDAR,
+    'llm': settings.ACTION_CONCURRENCY_LLM,
+}
+
+celery_app.conf.task_routes = {
+    'app.tasks.action_tasks.execute_imap_action': {'queue': ACTION_QUEUES['imap']},
+    'app.tasks.action_tasks.execute_drive_action': {'queue': ACTION_QUEUES['drive']},
+    'app.tasks.action_tasks.execute_calendar_action': {'queue': ACTION_QUEUES['calendar']},
+    'app.tasks.action_tasks.execute_llm_action': {'queue': ACTION_QUEUES['llm']},
+    # La creazione azioni genera le bozze con l'LLM
+    'app.tasks.action_tasks.create_actions_for_email': {'queue': ACTION_QUEUES['llm']},
+}
+
+# Worker dedicato a un'integrazione: concorrenza dalla configurazione
+# (es. ACTION_WORKER_POOL=drive celery -A app.tasks worker -Q azioni_drive)
+if settings.ACTION_WORKER_POOL:
+    celery_app.conf.worker_concurrency = ACTION_POOL_CONCURRENCY[settings.ACTION_WORKER_POOL]
+
 celery_app.conf.beat_schedule = {
-    'poll-email-normal': {
-        'task': 'app.tasks.email_polling.poll_email_normal',
-        'schedule': settings.EMAIL_POLL_INTERVAL,
-    },
-    'poll-email-pec': {
-        'task': 'app.tasks.email_polling.poll_email_pec',
-        'schedule': settings.EMAIL_POLL_INTERVAL,
-    },
     'execute-pending-actions': {
         'task': 'app.tasks.action_tasks.execute_pending_actions',
-        'schedule': 60.0,  # Ogni 60 secondi
+        'schedule': float(settings.ACTION_SWEEP_INTERVAL),  # Sweeper: il dispatch è event-driven
     },
     'retry-failed-actions': {
         'task': 'app.tasks.action_tasks.retry_failed_actions',
-        'schedule': 600.0,  # Ogni 10 minuti
+        'schedule': float(settings.ACTION_RETRY_SCAN_INTERVAL),  # Il backoff è per azione
+    },
+    'sync-google-calendar': {
+        'task': 'app.tasks.calendar_tasks.sync_google_calendar',
+        'schedule': float(settings.GOOGLE_CALENDAR_SYNC_INTERVAL),  # Incrementale con syncToken
+    },
+    'consolida-statistiche': {
+        'task': 'app.tasks.stats_tasks.consolida_statistiche',
+        'schedule': float(settings.STATS_CONSOLIDATION_INTERVAL),  # Variazioni accodate dai trigger
+    },
+    'rollup-statistiche': {
+        'task': 'app.tasks.stats_tasks.rollup_statistiche',
+        'schedule': crontab(hour=3, minute=30),  # Riallineo notturno dalle tabelle di origine
+    },
+    'manutenzione-partizioni': {
+        'task': 'app.tasks.partition_tasks.manutenzione_partizioni',
+        'schedule': crontab(hour=2, minute=30),  # Partizioni dei prossimi mesi e retention
+    },
+    'archivia-email': {
+        'task': 'app.tasks.archive_tasks.archivia_email',
+        'schedule': crontab(hour=4, minute=0),  # Contenuti oltre ARCHIVE_AFTER_DAYS nei segmenti zstd
     },
 }
+
+# Con l'ingest IMAP IDLE le email arrivano in push (scripts/imap_idle_ingest.py):
+# il polling POP3 periodico resta attivo solo in modalità "pop3"
+if settings.EMAIL_INGEST_MODE == "pop3":
+    celery_app.conf.beat_schedule.update({
+        'poll-email-normal': {
+            'task': 'app.tasks.email_polling.poll_email_normal',
+            'schedule': settings.EMAIL_POLL_INTERVAL,
+        },
+        'poll-email-pec': {
+            'task': 'app.tasks.email_polling.poll_email_pec',
+            'schedule': settings.EMAIL_POLL_INTERVAL,
+        },
+    })
+
+
+@after_setup_logger.connect
+def setup_db_logging(logger, **kwargs):
+    """Log del worker anche in log_sistema, come per l'API."""
+    from app.core.db_log_handler import install_db_log_handler
+    install_db_log_handler(logger)
+
+
+@worker_process_shutdown.connect
+def flush_db_logging(**kwargs):
+    """Scrive i log ancora in coda prima dell'uscita del processo worker."""
+    from app.core.db_log_handler import get_db_log_handler
+    handler = get_db_log_handler()
+    if handler:
+        handler.close()
@@ -4,66 +4,140 @@ Celery Tasks per esecuzione azioni automatiche.
 FASE 4: Azioni Automatiche
 """
 import logging
+from datetime import datetime
+from celery.signals import worker_process_shutdown
 from sqlalchemy.orm import Session
+from sqlalchemy import or_
 
 from app.tasks import celery_app
 from app.database import SessionLocal
 from app.services.action_executor import ActionExecutor
+from app.services.action_dispatcher import ActionDispatcher
+from app.integrations.imap_pool import get_imap_pool
 from app.models.azione import Azione, StatoAzione
+from app.config import get_settings
 
+settings = get_settings()
 logger = logging.getLogger(__name__)
 
 
-@celery_app.task(name='app.tasks.action_tasks.execute_pending_actions', bind=True)
-def execute_pending_actions(self):
+@worker_process_shutdown.connect
+def close_imap_connections(**kwargs):
+    """Chiude le connessioni IMAP del pool allo shutdown del processo worker."""
+    get_imap_pool().close_all()
+
+
+def _run_action(azione_id: int) -> dict:
     """
-    Task periodico per eseguire azioni pending.
+    Esegue una singola azione in una sessione dedicata.
 
-    Viene eseguito ogni 60 secondi per processare le azioni in coda.
+    Args:
+        azione_id: ID dell'azione
+
+    Returns:
+        dict: Risultato task
     """
-    logger.info("🔄 Esecuzione azioni pending...")
+    logger.info(f"🔄 Esecuzione azione {azione_id}...")
 
     db = SessionLocal()
     try:
-        # Trova azioni pending
-        azioni_pending = db.query(Azione).filter(
-            Azione.stato == StatoAzione.PENDING
-        ).limit(10).all()
+        executor = ActionExecutor(db)
+        success = executor.execute_action(azione_id)
 
-        if not azioni_pending:
-            logger.info("✅ Nessuna azione pending")
-            return {
-                'status': 'success',
-                'azioni_processate': 0
-            }
+        if success:
+            logger.info(f"✅ Azione {azione_id} completata")
+        else:
+            logger.warning(f"⚠️ Azione {azione_id} fallita")
 
-        executor = ActionExecutor(db)
-        success_count = 0
-        failed_count = 0
+        return {
+            'status': 'success' if success else 'failed',
+            'azione_id': azione_id
+        }
+
+    except Exception as e:
+        logger.error(f"❌ Errore esecuzione azione {azione_id}: {e}")
+        return {
+            'status': 'error',
+            'azione_id': azione_id,
+            'error': str(e)
+        }
+    finally:
+        db.close()
+
+
+@celery_app.task(name='app.tasks.action_tasks.execute_action', bind=True)
+def execute_action(self, azione_id: int):
+    """
+    Task per eseguire una singola azione sulla coda di default.
+
+    Usato per i tipi di azione senza un worker pool dedicato.
+    """
+    return _run_action(azione_id)
+
+
+@celery_app.task(
+    name='app.tasks.action_tasks.execute_imap_action',
+    bind=True,
+    rate_limit=settings.ACTION_RATE_LIMIT_IMAP or None
+)
+def execute_imap_action(self, azione_id: int):
+    """Task per azioni IMAP (bozze, inoltri) sulla coda azioni_imap."""
+    return _run_action(azione_id)
+
+
+@celery_app.task(
+    name='app.tasks.action_tasks.execute_drive_action',
+    bind=True,
+    rate_limit=settings.ACTION_RATE_LIMIT_DRIVE or None
+)
+def execute_drive_action(self, azione_id: int):
+    """Task per upload Google Drive sulla coda azioni_drive."""
+    return _run_action(azione_id)
 
-        for azione in azioni_pending:
-            try:
-                logger.info(f"Esecuzione azione {azione.id} ({azione.tipo_azione.value})...")
-                success = executor.execute_action(azione.id)
 
-                if success:
-                    success_count += 1
-                    logger.info(f"✅ Azione {azione.id} completata")
-                else:
-                    failed_count += 1
-                    logger.warning(f"⚠️ Azione {azione.id} fallita")
+@celery_app.task(
+    name='app.tasks.action_tasks.execute_calendar_action',
+    bind=True,
+    rate_limit=settings.ACTION_RATE_LIMIT_CALENDAR or None
+)
+def execute_calendar_action(self, azione_id: int):
+    """Task per eventi Google Calendar sulla coda azioni_calendar."""
+    return _run_action(azione_id)
 
-            except Exception as e:
-                failed_count += 1
-                logger.error(f"❌ Errore esecuzione azione {azione.id}: {e}")
 
-        logger.info(f"✅ Processate {len(azioni_pending)} azioni: {success_count} successi, {failed_count} fallimenti")
+@celery_app.task(
+    name='app.tasks.action_tasks.execute_llm_action',
+    bind=True,
+    rate_limit=settings.ACTION_RATE_LIMIT_LLM or None
+)
+def execute_llm_action(self, azione_id: int):
+    """Task per azioni generate con LLM (sintesi) sulla coda azioni_llm."""
+    return _run_action(azione_id)
+
+
+@celery_app.task(name='app.tasks.action_tasks.execute_pending_actions', bind=True)
+def execute_pending_actions(self):
+    """
+    Task periodico sweeper per le azioni pending.
+
+    Le azioni sono accodate una per una al momento della creazione; questo
+    task recupera solo le righe outbox non inviate e le azioni rimaste in
+    coda troppo a lungo.
+    """
+    logger.info("🔄 Sweep azioni pending...")
+
+    db = SessionLocal()
+    try:
+        result = ActionDispatcher(db).sweep()
+
+        logger.info(
+            f"✅ Sweep completato: {result['outbox_reinviati']} outbox reinviati, "
+            f"{result['azioni_reinviate']} azioni reinviate"
+        )
 
         return {
             'status': 'success',
-            'azioni_processate': len(azioni_pending),
-            'success': success_count,
-            'failed': failed_count
+            **result
         }
 
     except Exception as e:
@@ -76,10 +150,16 @@ def execute_pending_actions(self):
         db.close()
 
 
-@celery_app.task(name='app.tasks.action_tasks.create_actions_for_email', bind=True)
+@celery_app.task(
+    name='app.tasks.action_tasks.create_actions_for_email',
+    bind=True,
+    rate_limit=settings.ACTION_RATE_LIMIT_LLM or None
+)
 def create_actions_for_email(self, email_id: int):
     """
-    Task per creare azioni per una email specifica.
+    Task per creare azioni per una email specifica sulla coda azioni_llm.
+
+    Accodato dall'outbox al salvataggio dell'email; genera le bozze con l'LLM.
 
     Args:
         email_id: ID dell'email
@@ -115,12 +195,13 @@ def create_actions_for_email(self, email_id: int):
 
 
 @celery_app.task(name='app.tasks.action_tasks.retry_failed_actions', bind=True)
-def retry_failed_actions(self, max_retries: int = 3):
+def retry_failed_actions(self):
     """
     Task per ritentare azioni fallite.
 
-    Args:
-        max_retries: Numero massimo retry per azione
+    Rimette in coda solo le azioni FALLITA il cui prossimo tentativo
+    (backoff esponenziale) è scaduto; le azioni con errori permanenti o
+    tentativi esauriti restano in dead letter.
 
     Returns:
         dict: Risultato task
@@ -129,10 +210,15 @@ def retry_failed_actions(self, max_retries: int = 3):
 
     db = SessionLocal()
     try:
-        # Trova azioni fallite con retry < max
         azioni_fallite = db.query(Azione).filter(
-            Azione.stato == StatoAzione.FALLITA
-        ).limit(10).all()
+            Azione.stato == StatoAzione.FALLITA,
+            or_(
+                Azione.prossimo_tentativo.is_(None),
+                Azione.prossimo_tentativo <= datetime.utcnow()
+            )
+        ).order_by(Azione.prossimo_tentativo).limit(
+            settings.ACTION_SWEEP_BATCH
+        ).with_for_update(skip_locked=True).all()
 
         if not azioni_fallite:
             logger.info("✅ Nessuna azione fallita da ritentare")
@@ -141,36 +227,14 @@ def retry_failed_actions(self, max_retries: int = 3):
                 'azioni_ritentate': 0
             }
 
-        executor = ActionExecutor(db)
-        retried_count = 0
-        success_count = 0
-
-        for azione in azioni_fallite:
-            try:
-                # Resetta stato a pending
-                azione.stato = StatoAzione.PENDING
-                azione.errore = None
-                db.commit()
-
-                # Riprova esecuzione
-                success = executor.execute_action(azione.id)
-
-                retried_count += 1
-                if success:
-                    success_count += 1
-                    logger.info(f"✅ Azione {azione.id} ritentata con successo")
-                else:
-                    logger.warning(f"⚠️ Azione {azione.id} ancora fallita")
-
-            except Exception as e:
-                logger.error(f"❌ Errore retry azione {azione.id}: {e}")
+        inviate = ActionDispatcher(db).requeue(azioni_fallite)
 
-        logger.info(f"✅ Ritentate {retried_count} azioni: {success_count} successi")
+        logger.info(f"✅ Rimesse in coda {len(azioni_fallite)} azioni ({inviate} inviate)")
 
         return {
             'status': 'success',
-            'azioni_ritentate': retried_count,
-            'success': success_count
+            'azioni_ritentate': len(azioni_fallite),
+            'inviate': inviate
         }
 
     except Exception as e:
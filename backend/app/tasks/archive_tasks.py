@@ -0,0 +1,39 @@
+"""
+Celery Tasks per l'archivio freddo delle email.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from app.tasks import celery_app
+from app.database import SessionLocal
+from app.services.archivio import ArchivioFreddo
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name='app.tasks.archive_tasks.archivia_email')
+def archivia_email():
+    """
+    Sposta nell'archivio freddo i contenuti delle email più vecchie di ARCHIVE_AFTER_DAYS.
+
+    Returns:
+        dict: Statistiche archiviazione
+    """
+    if settings.ARCHIVE_AFTER_DAYS <= 0:
+        return {'status': 'skipped'}
+
+    db = SessionLocal()
+    try:
+        prima_di = datetime.utcnow() - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+        stats = ArchivioFreddo(db).archivia(prima_di)
+        return {'status': 'success', **stats}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Errore archiviazione email: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+    finally:
+        db.close()
@@ -0,0 +1,44 @@
+"""
+Celery Tasks per sincronizzazione Google Calendar.
+"""
+import logging
+
+from app.tasks import celery_app
+from app.database import SessionLocal
+from app.services.calendar_sync import CalendarSync
+from app.integrations.google_calendar_client import get_calendar_client
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name='app.tasks.calendar_tasks.sync_google_calendar')
+def sync_google_calendar(full: bool = False):
+    """
+    Sincronizzazione incrementale del calendario Google configurato.
+
+    Args:
+        full: Forza una sincronizzazione completa
+
+    Returns:
+        dict: Statistiche sincronizzazione
+    """
+    gcal_client = get_calendar_client()
+
+    if not gcal_client.authenticate():
+        logger.warning("⚠️ Google Calendar non autenticato, sincronizzazione saltata")
+        return {'status': 'skipped'}
+
+    db = SessionLocal()
+    try:
+        stats = CalendarSync(db, gcal_client).sync(settings.GOOGLE_CALENDAR_ID, full=full)
+        return {'status': 'success', **stats}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Errore sincronizzazione Google Calendar: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+    finally:
+        db.close()
@@ -3,6 +3,7 @@ Task Celery per polling periodico email
 """
 
 from app.tasks import celery_app
+from app.services.action_dispatcher import ActionDispatcher
 from app.services.email_ingest import EmailNormalClient, EmailPECClient
 from app.services.categorizer import EmailCategorizer
 from app.services.interpreter import EmailInterpreter
@@ -11,12 +12,108 @@ from app.models.email import Email, AccountType, EmailStatus
 from app.models.interpretazione import Interpretazione
 from app.config import get_settings
 from datetime import datetime
+from typing import List, Dict
 import logging
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
+def process_incoming_emails(emails_data: List[Dict], account_type: AccountType) -> List[int]:
+    """
+    Pipeline comune di ingest: deduplica, categorizza, interpreta e salva.
+
+    Usata dal polling POP3 e dall'ingest IMAP IDLE. La creazione delle
+    azioni (bozze generate con l'LLM) è registrata nell'outbox insieme alle
+    email e accodata sul worker pool azioni_llm subito dopo il commit.
+
+    Args:
+        emails_data: Email scaricate (vedi EmailIngestClient.parse_message)
+        account_type: Account di provenienza
+
+    Returns:
+        List[int]: ID delle email nuove salvate
+    """
+    db = SessionLocal()
+    try:
+        categorizer = EmailCategorizer()
+        interpreter = EmailInterpreter()
+        nuove_email = []
+        
+        for email_data in emails_data:
+            existing = db.query(Email).filter(
+                Email.message_id == email_data['message_id']
+            ).first()
+            
+            if existing:
+                continue
+            
+            # Categorizza
+            categoria, confidence = categorizer.categorize(
+                mittente=email_data['mittente'],
+                oggetto=email_data['oggetto'],
+                corpo=email_data['corpo']
+            )
+            
+            # Interpreta
+            interpretazione_data = interpreter.interpret(
+                categoria=categoria,
+                mittente=email_data['mittente'],
+                oggetto=email_data['oggetto'],
+                corpo=email_data['corpo'],
+                allegati=[],
+                data_oggi=datetime.now().isoformat()
+            )
+            
+            # Salva email
+            email_record = Email(
+                message_id=email_data['message_id'],
+                account_type=account_type,
+                mittente=email_data['mittente'],
+                destinatario=email_data['destinatario'],
+                oggetto=email_data['oggetto'],
+                corpo=email_data['corpo'],
+                data_ricezione=email_data['data_ricezione'],
+                allegati_nomi=email_data.get('allegati_nomi'),
+                allegati_path=email_data.get('allegati_path'),
+                raw_sha256=email_data.get('raw_sha256'),
+                categoria=categoria,
+                categoria_confidence=confidence,
+                stato=EmailStatus.INTERPRETATA
+            )
+            
+            db.add(email_record)
+            db.flush()
+            
+            # Salva interpretazione
+            interp_record = Interpretazione(
+                email_id=email_record.id,
+                categoria=categoria.value,
+                interpretazione_json=interpretazione_data,
+                confidence=confidence,
+                richiede_revisione=(confidence < 0.7)
+            )
+            
+            db.add(interp_record)
+            nuove_email.append(email_record.id)
+            logger.info(f"Salvata email: {email_data['oggetto'][:50]}")
+        
+        # Creazione azioni salvata con le email: lo sweeper recupera gli invii falliti
+        dispatcher = ActionDispatcher(db)
+        outbox = dispatcher.enqueue_action_creation(nuove_email)
+        db.commit()
+        dispatcher.dispatch(outbox)
+
+        return nuove_email
+        
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Errore salvataggio: {e}")
+        raise
+    finally:
+        db.close()
+
+
 @celery_app.task(name='app.tasks.email_polling.poll_email_normal')
 def poll_email_normal():
     """Polling email account normale"""
@@ -30,74 +127,8 @@ def poll_email_normal():
             logger.info("Nessuna nuova email normale")
             return
         
-        db = SessionLocal()
-        try:
-            categorizer = EmailCategorizer()
-            interpreter = EmailInterpreter()
-            
-            for email_data in emails_data:
-                existing = db.query(Email).filter(
-                    Email.message_id == email_data['message_id']
-                ).first()
-                
-                if existing:
-                    continue
-                
-                # Categorizza
-                categoria, confidence = categorizer.categorize(
-                    mittente=email_data['mittente'],
-                    oggetto=email_data['oggetto'],
-                    corpo=email_data['corpo']
-                )
-                
-                # Interpreta
-                interpretazione_data = interpreter.interpret(
-                    categoria=categoria,
-                    mittente=email_data['mittente'],
-                    oggetto=email_data['oggetto'],
-                    corpo=email_data['corpo'],
-                    allegati=[],
-                    data_oggi=datetime.now().isoformat()
-                )
-                
-                # Salva email
-                email_record = Email(
-                    message_id=email_data['message_id'],
-                    account_type=AccountType.NORMALE,
-                    mittente=email_data['mittente'],
-                    destinatario=email_data['destinatario'],
-                    oggetto=email_data['oggetto'],
-                    corpo=email_data['corpo'],
-                    data_ricezione=email_data['data_ricezione'],
-                    categoria=categoria,
-                    categoria_confidence=confidence,
-                    stato=EmailStatus.INTERPRETATA
-                )
-                
-                db.add(email_record)
-                db.flush()
-                
-                # Salva interpretazione
-                interp_record = Interpretazione(
-                    email_id=email_record.id,
-                    categoria=categoria.value,
-                    interpretazione_json=interpretazione_data,
-                    confidence=confidence,
-                    richiede_revisione=(confidence < 0.7)
-                )
-                
-                db.add(interp_record)
-                logger.info(f"Salvata email: {email_data['oggetto'][:50]}")
-            
-            db.commit()
-            logger.info(f"Polling completato: {len(emails_data)} email")
-            
-        except Exception as e:
-            db.rollback()
-            logger.error(f"Errore salvataggio: {e}")
-            raise
-        finally:
-            db.close()
+        process_incoming_emails(emails_data, AccountType.NORMALE)
+        logger.info(f"Polling completato: {len(emails_data)} email")
             
     except Exception as e:
         logger.error(f"Errore polling: {e}")
@@ -0,0 +1,32 @@
+"""
+Celery Tasks per la manutenzione delle partizioni mensili.
+"""
+import logging
+
+from app.tasks import celery_app
+from app.database import SessionLocal
+from app.services.partizioni import manutenzione_partizioni
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name='app.tasks.partition_tasks.manutenzione_partizioni')
+def manutenzione_partizioni_task():
+    """
+    Crea le partizioni dei prossimi mesi e applica la retention.
+
+    Returns:
+        dict: Partizioni create e staccate per tabella
+    """
+    db = SessionLocal()
+    try:
+        risultato = manutenzione_partizioni(db)
+        return {'status': 'success', **risultato}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Errore manutenzione partizioni: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+    finally:
+        db.close()
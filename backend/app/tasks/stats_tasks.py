@@ -0,0 +1,58 @@
+"""
+Celery Tasks per le statistiche della dashboard.
+"""
+import logging
+
+from app.tasks import celery_app
+from app.database import SessionLocal
+from app.services.statistiche import consolida_statistiche, rollup_statistiche
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(name='app.tasks.stats_tasks.consolida_statistiche')
+def consolida_statistiche_task():
+    """
+    Somma nei contatori giornalieri le variazioni accodate dai trigger.
+
+    Returns:
+        dict: Numero contatori aggiornati
+    """
+    db = SessionLocal()
+    try:
+        return {'status': 'success', 'contatori': consolida_statistiche(db)}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Errore consolidamento statistiche: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+    finally:
+        db.close()
+
+
+@celery_app.task(name='app.tasks.stats_tasks.rollup_statistiche')
+def rollup_statistiche_task(giorni: int = None):
+    """
+    Riallinea i contatori giornalieri degli ultimi giorni.
+
+    Args:
+        giorni: Giorni da ricalcolare (default STATS_ROLLUP_DAYS)
+
+    Returns:
+        dict: Numero contatori riscritti
+    """
+    db = SessionLocal()
+    try:
+        contatori = rollup_statistiche(db, giorni or settings.STATS_ROLLUP_DAYS)
+        return {'status': 'success', 'contatori': contatori}
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Errore rollup statistiche: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+    finally:
+        db.close()
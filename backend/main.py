@@ -18,6 +18,10 @@ logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+# Log da DB_LOG_LEVEL in su anche in log_sistema (scrittura a batch in background)
+from app.core.db_log_handler import install_db_log_handler
+install_db_log_handler()
+
 # FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
@@ -34,6 +38,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Budget query per richiesta (individua gli N+1 in sviluppo e nei test)
+if settings.DB_QUERY_BUDGET > 0:
+    from app.core.query_guard import QueryCountMiddleware
+    app.add_middleware(
+        QueryCountMiddleware,
+        max_queries=settings.DB_QUERY_BUDGET,
+        strict=settings.DB_QUERY_BUDGET_STRICT
+    )
+
 # Health check
 @app.get("/")
 async def root():
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Ingest email in push con IMAP IDLE (EMAIL_INGEST_MODE=imap_idle).
+
+Avvia un thread per ogni casella con configurazione IMAP completa;
+in questa modalità il beat non pianifica il polling POP3.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import signal
+import logging
+import threading
+
+from app.config import get_settings
+from app.services.imap_idle_ingest import ImapIdleIngest, configured_mailboxes
+from app.core.db_log_handler import install_db_log_handler
+
+settings = get_settings()
+logging.basicConfig(level=settings.LOG_LEVEL, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+install_db_log_handler()
+logger = logging.getLogger("imap_idle_ingest")
+
+
+def main():
+    if settings.EMAIL_INGEST_MODE != "imap_idle":
+        logger.warning("⚠️ EMAIL_INGEST_MODE non è 'imap_idle': l'ingest resta affidato al polling POP3")
+        return 0
+
+    mailboxes = configured_mailboxes()
+    if not mailboxes:
+        logger.error("❌ Nessuna casella IMAP configurata (EMAIL_*_IMAP_HOST/USER/PASSWORD)")
+        return 1
+
+    ingests = [ImapIdleIngest(account_type) for account_type in mailboxes]
+    threads = [
+        threading.Thread(target=ingest.run_forever, name=f"idle-{ingest.account_type.value}")
+        for ingest in ingests
+    ]
+
+    def shutdown(signum, frame):
+        logger.info("🔄 Arresto ingest IMAP IDLE...")
+        for ingest in ingests:
+            ingest.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for thread in threads:
+        thread.start()
+    logger.info(f"✅ Ingest IMAP IDLE avviato per: {', '.join(a.value for a in mailboxes)}")
+
+    for thread in threads:
+        thread.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Presa in carico delle azioni: un worker che ha perso il lease non registra
+l'esito sopra quello del worker che ha ripreso l'azione.
+
+Richiede un database PostgreSQL con lo schema aggiornato (alembic upgrade head)
+raggiungibile con DATABASE_URL; altrimenti i test vengono saltati.
+"""
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database import SessionLocal
+from app.models.azione import Azione, TipoAzione, StatoAzione
+from app.models.email import Email, AccountType, EmailCategory, EmailStatus
+from app.services.drive_uploader import DriveUploader
+
+MESSAGE_ID = '<lease-azioni@test>'
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        session.execute(text("SELECT 1"))
+    except OperationalError:
+        session.close()
+        pytest.skip("PostgreSQL non raggiungibile")
+
+    try:
+        yield session
+    finally:
+        session.rollback()
+        email_ids = "SELECT id FROM emails WHERE message_id = :message_id"
+        session.execute(text(f"DELETE FROM azioni WHERE email_id IN ({email_ids})"), {'message_id': MESSAGE_ID})
+        session.execute(text(f"DELETE FROM emails WHERE id IN ({email_ids})"), {'message_id': MESSAGE_ID})
+        session.commit()
+        session.close()
+
+
+@pytest.fixture
+def azione(db):
+    email = Email(
+        message_id=MESSAGE_ID,
+        account_type=AccountType.NORMALE,
+        mittente='scuola@example.it',
+        destinatario='snals@example.it',
+        oggetto='Richiesta appuntamento',
+        corpo='Vorrei fissare un appuntamento',
+        data_ricezione=datetime.now(),
+        categoria=EmailCategory.RICHIESTA_APPUNTAMENTO,
+        stato=EmailStatus.INTERPRETATA
+    )
+    db.add(email)
+    db.flush()
+    azione = Azione(
+        email_id=email.id, tipo=TipoAzione.BOZZA_RISPOSTA, stato=StatoAzione.IN_CODA,
+        dettagli={'to': email.mittente, 'subject': 'Re: Richiesta appuntamento', 'body': 'Bozza'}
+    )
+    db.add(azione)
+    db.commit()
+    return azione
+
+
+def _ripresa_da_altro_worker(azione_id: int):
+    """Lo sweeper rimette in coda l'azione e un altro worker la riprende."""
+    other = SessionLocal()
+    try:
+        other.query(Azione).filter(Azione.id == azione_id).update(
+            {Azione.tentativi: Azione.tentativi + 1}, synchronize_session=False
+        )
+        other.commit()
+    finally:
+        other.close()
+
+
+def test_esito_non_registrato_con_lease_perso(db, azione):
+    from app.services.action_executor import ActionExecutor
+
+    def salva_bozze(drafts):
+        _ripresa_da_altro_worker(azione.id)
+        return [{'success': False, 'error': 'IMAP non raggiungibile'} for _ in drafts]
+
+    with patch('app.services.action_executor.get_drive_client'), \
+            patch('app.services.action_executor.get_calendar_client'), \
+            patch('app.services.action_executor.LLMClient'), \
+            patch('app.services.action_executor.WebmailClient') as webmail:
+        webmail.return_value.save_drafts_batch.side_effect = salva_bozze
+        assert ActionExecutor(db).execute_action(azione.id) is False
+
+    db.refresh(azione)
+    # Resta al worker che l'ha ripresa: nessun fallimento registrato sopra
+    assert azione.stato == StatoAzione.IN_ESECUZIONE
+    assert azione.tentativi == 2
+    assert azione.errore is None
+
+
+def test_upload_rinnova_il_lease_finché_lo_detiene(db, azione):
+    db.query(Azione).filter(Azione.id == azione.id).update(
+        {Azione.stato: StatoAzione.IN_ESECUZIONE, Azione.tentativi: 1}, synchronize_session=False
+    )
+    db.commit()
+
+    uploader = DriveUploader(None, azione.id, 1)
+    uploader._save_progress()
+    db.refresh(azione)
+    assert azione.lease_scade is not None
+    assert not uploader.lease_perso
+
+    _ripresa_da_altro_worker(azione.id)
+    uploader.progress['folder_id'] = 'cartella'
+    uploader._save_progress()
+    db.refresh(azione)
+    assert uploader.lease_perso
+    assert 'folder_id' not in azione.risultato
@@ -0,0 +1,138 @@
+"""
+Retention delle partizioni di emails: le righe collegate seguono la partizione staccata.
+
+Richiede un database PostgreSQL con lo schema aggiornato (alembic upgrade head)
+raggiungibile con DATABASE_URL; altrimenti i test vengono saltati.
+"""
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database import SessionLocal
+from app.models.azione import Azione, TipoAzione, StatoAzione
+from app.models.email import Email, AccountType
+from app.models.evento import EventoCalendario
+from app.models.frammento_archivio import FrammentoArchivio
+from app.models.interpretazione import Interpretazione
+from app.models.outbox_azione import OutboxAzione
+from app.services.partizioni import (
+    DIPENDENTI_EMAILS, aggiungi_mesi, crea_partizione, inizio_mese, nome_partizione, stacca_partizioni
+)
+
+# Abbastanza indietro da essere l'unica partizione oltre la retention del test
+MESI_FA = 60
+MESI_DA_TENERE = MESI_FA - 1
+
+TITOLO_EVENTO = 'Convocazione test retention'
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        session.execute(text("SELECT 1"))
+    except OperationalError:
+        session.close()
+        pytest.skip("PostgreSQL non raggiungibile")
+
+    mese = aggiungi_mesi(inizio_mese(date.today()), -MESI_FA)
+    nome = nome_partizione('emails', mese)
+    try:
+        yield session
+    finally:
+        session.rollback()
+        # Righe di test rimaste nelle tabelle attive se la partizione non è stata staccata
+        if session.execute(text("SELECT to_regclass(:nome)"), {'nome': nome}).scalar():
+            for tabella in DIPENDENTI_EMAILS:
+                session.execute(text(f"DELETE FROM {tabella} WHERE email_id IN (SELECT id FROM {nome})"))
+        session.execute(text("DELETE FROM eventi_calendario WHERE titolo = :titolo"), {'titolo': TITOLO_EVENTO})
+        for tabella in DIPENDENTI_EMAILS:
+            session.execute(text(f"DROP TABLE IF EXISTS {nome}_{tabella}"))
+        session.execute(text(f"DROP TABLE IF EXISTS {nome}"))
+        session.commit()
+        session.close()
+
+
+def _email_con_dipendenti(db, ricevuta: datetime) -> Email:
+    email = Email(
+        message_id=f'<retention-{ricevuta.timestamp()}@test>',
+        account_type=AccountType.NORMALE,
+        mittente='scuola@example.it',
+        destinatario='snals@example.it',
+        oggetto='Convocazione',
+        corpo='Convocazione assemblea',
+        data_ricezione=ricevuta
+    )
+    db.add(email)
+    db.flush()
+
+    azione = Azione(email_id=email.id, tipo=TipoAzione.UPLOAD_DRIVE, stato=StatoAzione.IN_CODA)
+    db.add_all([
+        Interpretazione(email_id=email.id, categoria='convocazione_scuola', interpretazione_json={'scuola': 'IC Test'}),
+        azione,
+        FrammentoArchivio(
+            email_id=email.id, tipo='contenuto', indice=0, segmento='000001.zst',
+            offset=0, lunghezza=1, dimensione=1, sha256='0' * 64
+        ),
+        EventoCalendario(email_id=email.id, titolo=TITOLO_EVENTO, data_inizio=ricevuta),
+    ])
+    db.flush()
+    db.add(OutboxAzione(azione_id=azione.id))
+    db.commit()
+    return email
+
+
+def test_partizione_staccata_archivia_righe_collegate(db):
+    mese = aggiungi_mesi(inizio_mese(date.today()), -MESI_FA)
+    nome = nome_partizione('emails', mese)
+    crea_partizione(db, 'emails', mese)
+    db.commit()
+
+    email = _email_con_dipendenti(db, datetime.combine(mese, datetime.min.time()) + timedelta(days=3))
+    email_id = email.id
+
+    staccate = stacca_partizioni(db, 'emails', MESI_DA_TENERE, elimina=False)
+    assert staccate == [nome]
+
+    # Nessuna riga orfana nelle tabelle attive
+    assert db.query(Email).filter(Email.id == email_id).count() == 0
+    assert db.query(Interpretazione).filter(Interpretazione.email_id == email_id).count() == 0
+    assert db.query(Azione).filter(Azione.email_id == email_id).count() == 0
+    assert db.query(FrammentoArchivio).filter(FrammentoArchivio.email_id == email_id).count() == 0
+    assert db.query(OutboxAzione).join(Azione).filter(Azione.email_id == email_id).count() == 0
+
+    # Le righe restano accanto alla partizione archiviata
+    for tabella in DIPENDENTI_EMAILS:
+        archiviate = db.execute(
+            text(f"SELECT count(*) FROM {nome}_{tabella} WHERE email_id = :id"), {'id': email_id}
+        ).scalar()
+        assert archiviate == 1, tabella
+
+    # Gli eventi restano in calendario senza riferimento all'email
+    evento = db.query(EventoCalendario).filter(EventoCalendario.titolo == TITOLO_EVENTO).one()
+    assert evento.email_id is None
+
+
+def test_azione_senza_email_va_in_dead_letter(db):
+    from app.services.action_executor import ActionExecutor
+
+    # Azione la cui email non esiste più
+    azione = Azione(email_id=-1, tipo=TipoAzione.UPLOAD_DRIVE, stato=StatoAzione.IN_CODA)
+    db.add(azione)
+    db.commit()
+
+    try:
+        with patch('app.services.action_executor.get_drive_client'), \
+                patch('app.services.action_executor.get_calendar_client'), \
+                patch('app.services.action_executor.LLMClient'):
+            assert ActionExecutor(db).execute_action(azione.id) is False
+
+        db.refresh(azione)
+        assert azione.stato == StatoAzione.DEAD_LETTER
+        assert 'non più disponibile' in azione.errore
+    finally:
+        db.delete(azione)
+        db.commit()
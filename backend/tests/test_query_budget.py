@@ -0,0 +1,146 @@
+"""
+Budget di query SQL: le liste e il dettaglio email, e l'esecuzione delle
+azioni, eseguono un numero di query che non cresce con le righe (niente N+1).
+
+Richiede un database PostgreSQL con lo schema aggiornato (alembic upgrade head)
+raggiungibile con DATABASE_URL; altrimenti i test vengono saltati.
+"""
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.query_guard import QueryBudgetExceeded, QueryCountMiddleware, query_budget
+from app.database import SessionLocal
+from app.models.azione import Azione, TipoAzione, StatoAzione
+from app.models.email import Email, AccountType, EmailCategory, EmailStatus
+from app.models.interpretazione import Interpretazione
+
+# Email (con interpretazione e due azioni ciascuna) create per i test
+NUMERO_EMAIL = 5
+
+PREFISSO_MESSAGE_ID = '<query-budget-'
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        session.execute(text("SELECT 1"))
+    except OperationalError:
+        session.close()
+        pytest.skip("PostgreSQL non raggiungibile")
+
+    try:
+        yield session
+    finally:
+        session.rollback()
+        email_ids = "SELECT id FROM emails WHERE message_id LIKE :prefisso"
+        params = {'prefisso': PREFISSO_MESSAGE_ID + '%'}
+        for tabella in ('azioni', 'interpretazioni'):
+            session.execute(text(f"DELETE FROM {tabella} WHERE email_id IN ({email_ids})"), params)
+        session.execute(text(f"DELETE FROM emails WHERE id IN ({email_ids})"), params)
+        session.commit()
+        session.close()
+
+
+@pytest.fixture
+def emails(db):
+    ricevuta = datetime.now()
+    create = []
+    for i in range(NUMERO_EMAIL):
+        email = Email(
+            message_id=f'{PREFISSO_MESSAGE_ID}{i}@test>',
+            account_type=AccountType.NORMALE,
+            mittente=f'scuola{i}@example.it',
+            destinatario='snals@example.it',
+            oggetto=f'Richiesta appuntamento {i}',
+            corpo='Vorrei fissare un appuntamento',
+            data_ricezione=ricevuta - timedelta(minutes=i),
+            categoria=EmailCategory.RICHIESTA_APPUNTAMENTO,
+            stato=EmailStatus.INTERPRETATA
+        )
+        db.add(email)
+        db.flush()
+        db.add_all([
+            Interpretazione(
+                email_id=email.id, categoria='richiesta_appuntamento', interpretazione_json={'scuola': 'IC Test'}
+            ),
+            Azione(
+                email_id=email.id, tipo=TipoAzione.BOZZA_RISPOSTA, stato=StatoAzione.IN_CODA,
+                dettagli={'to': email.mittente, 'subject': f"Re: {email.oggetto}", 'body': 'Bozza'}
+            ),
+            Azione(email_id=email.id, tipo=TipoAzione.EVENTO_CALENDARIO, stato=StatoAzione.COMPLETATA),
+        ])
+        create.append(email)
+    db.commit()
+    return create
+
+
+@pytest.fixture
+def client():
+    from main import app
+    return TestClient(app)
+
+
+def test_lista_email(client, emails):
+    with query_budget(2, "GET /api/emails/"):
+        response = client.get("/api/emails/", params={'limit': 100})
+    assert response.status_code == 200
+
+
+def test_dettaglio_email(client, emails):
+    with query_budget(3, "GET /api/emails/{id}"):
+        response = client.get(f"/api/emails/{emails[0].id}")
+    assert response.status_code == 200
+    assert len(response.json()['azioni']) == 2
+
+
+def test_esecuzione_batch_bozze(db, emails):
+    from app.services.action_executor import ActionExecutor
+
+    azione = db.query(Azione).filter(
+        Azione.email_id == emails[0].id, Azione.tipo == TipoAzione.BOZZA_RISPOSTA
+    ).one()
+
+    with patch('app.services.action_executor.get_drive_client'), \
+            patch('app.services.action_executor.get_calendar_client'), \
+            patch('app.services.action_executor.LLMClient'), \
+            patch('app.services.action_executor.WebmailClient') as webmail, \
+            patch('app.services.action_executor.settings.ACTION_DRAFT_BATCH_SIZE', NUMERO_EMAIL):
+        webmail.return_value.save_drafts_batch.side_effect = lambda drafts: [
+            {'success': True, 'folder': 'Drafts', 'multiappend': True} for _ in drafts
+        ]
+        executor = ActionExecutor(db)
+        with query_budget(10, "ActionExecutor.execute_action"):
+            assert executor.execute_action(azione.id) is True
+
+    completate = db.query(Azione).filter(
+        Azione.email_id.in_([e.id for e in emails]),
+        Azione.tipo == TipoAzione.BOZZA_RISPOSTA,
+        Azione.stato == StatoAzione.COMPLETATA
+    ).count()
+    assert completate == NUMERO_EMAIL
+
+
+def test_middleware_stretto_fallisce_la_richiesta(client, emails):
+    from main import app
+
+    strict = TestClient(QueryCountMiddleware(app, max_queries=0, strict=True))
+    response = strict.get(f"/api/emails/{emails[0].id}")
+    assert response.status_code == 500
+    assert int(response.headers['x-query-count']) > 0
+
+    permissivo = TestClient(QueryCountMiddleware(app, max_queries=0, strict=False))
+    response = permissivo.get(f"/api/emails/{emails[0].id}")
+    assert response.status_code == 200
+    assert int(response.headers['x-query-count']) > 0
+
+
+def test_query_budget_superato(db):
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(0):
+            db.execute(text("SELECT 1"))